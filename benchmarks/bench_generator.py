@@ -0,0 +1,256 @@
+"""
+Benchmark and statistical conformance checks for the password generators.
+
+Measures throughput of the single, batch and parallel generation paths for
+lengths 8-128 and strengths 1-4, then runs chi-square goodness-of-fit tests
+over millions of generated characters against the exact distribution each
+path is meant to produce.  Results are written as JSON so runs can be
+compared across versions; the exit status is non-zero if any uniformity
+check fails.
+
+Usage: python benchmarks/bench_generator.py -o results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import string
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src import __version__
+from src.core.password_generator import PasswordGenerator
+from src.core.password_policy import build_sampling_table, sample_chars
+from src.core.passphrase_generator import random_indices
+
+LENGTHS = (8, 16, 32, 64, 128)
+STRENGTHS = (1, 2, 3, 4)
+CLASS_SIZES = {1: (26,), 2: (26, 26), 3: (26, 26, 10), 4: (26, 26, 10, len(PasswordGenerator.SYMBOLS))}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the password generators")
+    parser.add_argument("-o", "--output", default="-", help="JSON output file, '-' for stdout")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="seconds to spend timing each single/batch case")
+    parser.add_argument("--parallel-count", type=int, default=200000,
+                        help="passwords per parallel case")
+    parser.add_argument("--workers", type=int, default=None, help="parallel workers (default: CPUs)")
+    parser.add_argument("--skip-parallel", action="store_true")
+    parser.add_argument("--samples", type=int, default=2000000,
+                        help="characters sampled per uniformity check")
+    parser.add_argument("--alpha", type=float, default=0.001,
+                        help="significance level for the uniformity checks")
+    return parser.parse_args(argv)
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def time_case(produce, min_time):
+    """Call produce() until min_time has passed; return (items, seconds)"""
+    items = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        items += produce()
+        elapsed = time.perf_counter() - start
+    return items, elapsed
+
+
+def throughput_record(path, length, strength, items, elapsed):
+    rate = items / elapsed
+    return {
+        "path": path,
+        "length": length,
+        "strength": strength,
+        "passwords": items,
+        "seconds": round(elapsed, 4),
+        "passwords_per_sec": round(rate, 1),
+        "ns_per_char": round(1e9 / (rate * length), 2),
+    }
+
+
+def run_throughput(args):
+    results = []
+    for strength in STRENGTHS:
+        for length in LENGTHS:
+            def single():
+                for _ in range(100):
+                    PasswordGenerator.generate_password(length, strength)
+                return 100
+
+            def batch():
+                return len(PasswordGenerator.generate_passwords(10000, length, strength))
+
+            for path, produce in (("single", single), ("batch", batch)):
+                items, elapsed = time_case(produce, args.min_time)
+                results.append(throughput_record(path, length, strength, items, elapsed))
+
+            if not args.skip_parallel:
+                start = time.perf_counter()
+                items = sum(1 for _ in PasswordGenerator.iter_passwords_parallel(
+                    args.parallel_count, length, strength, workers=args.workers))
+                elapsed = time.perf_counter() - start
+                results.append(throughput_record("parallel", length, strength, items, elapsed))
+
+            log(f"throughput: strength {strength}, length {length} done")
+    return results
+
+
+def chi_square_p_value(chi2, dof):
+    """Upper-tail p-value via the Wilson-Hilferty normal approximation"""
+    if dof <= 0:
+        return 1.0
+    z = ((chi2 / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def chi_square(name, counts, expected, alpha):
+    """Compare observed counts with expected probabilities (both keyed alike)"""
+    total = sum(counts.values())
+    unexpected = set(counts) - set(expected)
+    chi2 = 0.0
+    for key, probability in expected.items():
+        want = total * probability
+        chi2 += (counts.get(key, 0) - want) ** 2 / want
+    dof = len(expected) - 1
+    p_value = chi_square_p_value(chi2, dof)
+    return {
+        "name": name,
+        "samples": total,
+        "categories": len(expected),
+        "chi2": round(chi2, 3),
+        "dof": dof,
+        "p_value": p_value,
+        "passed": p_value >= alpha and not unexpected,
+    }
+
+
+def class_charsets(strength):
+    charsets = [string.ascii_lowercase, string.ascii_uppercase, string.digits, PasswordGenerator.SYMBOLS]
+    return charsets[:strength]
+
+
+def expected_batch(strength, length):
+    """Per-character distribution of passwords uniform over all valid ones
+
+    By inclusion-exclusion over the classes that are allowed to be missing,
+    count valid passwords, and valid passwords whose first character is a
+    given member of each class; by symmetry every position has the same
+    distribution.
+    """
+    sizes = CLASS_SIZES[strength]
+    total = sum(sizes)
+
+    def covering(length, classes):
+        count = 0
+        for mask in range(1 << len(classes)):
+            missing = sum(size for i, size in enumerate(classes) if mask >> i & 1)
+            count += (-1) ** bin(mask).count("1") * (total - missing) ** length
+        return count
+
+    valid = covering(length, sizes)
+    expected = {}
+    for index, charset in enumerate(class_charsets(strength)):
+        others = sizes[:index] + sizes[index + 1:]
+        probability = covering(length - 1, others) / valid
+        expected.update((c, probability) for c in charset)
+    return expected
+
+
+def expected_constructive(strength, length):
+    """Per-character distribution of the one-per-class-then-fill construction"""
+    sizes = CLASS_SIZES[strength]
+    total = sum(sizes)
+    fill = (length - strength) / length
+    expected = {}
+    for size, charset in zip(sizes, class_charsets(strength)):
+        probability = 1 / (length * size) + fill / total
+        expected.update((c, probability) for c in charset)
+    return expected
+
+
+def run_uniformity(args):
+    results = []
+    for charset in (string.ascii_lowercase, string.digits, string.ascii_letters + string.digits,
+                    PasswordGenerator._get_charset(4)):
+        table, rejected = build_sampling_table(charset)
+        counts = Counter()
+        remaining = args.samples
+        while remaining:
+            step = min(remaining, 1000000)
+            counts.update(sample_chars(table, rejected, step))
+            remaining -= step
+        expected = {c: 1 / len(charset) for c in charset}
+        results.append(chi_square(f"sampler/{len(charset)}-chars", counts, expected, args.alpha))
+
+    bound = 7776
+    indices = Counter(random_indices(bound, args.samples))
+    results.append(chi_square(f"random_indices/{bound}", indices, {i: 1 / bound for i in range(bound)},
+                              args.alpha))
+
+    for strength in STRENGTHS:
+        for length in (8, 32):
+            count = args.samples // length
+            counts = Counter()
+            for password in PasswordGenerator.iter_passwords(count, length, strength):
+                counts.update(password)
+            results.append(chi_square(f"batch/strength-{strength}/length-{length}", counts,
+                                      expected_batch(strength, length), args.alpha))
+
+            counts = Counter()
+            for _ in range(count // 10):
+                counts.update(PasswordGenerator.generate_password(length, strength))
+            results.append(chi_square(f"single/strength-{strength}/length-{length}", counts,
+                                      expected_constructive(strength, length), args.alpha))
+
+            if not args.skip_parallel:
+                counts = Counter()
+                for password in PasswordGenerator.iter_passwords_parallel(
+                        count, length, strength, workers=args.workers, ordered=False):
+                    counts.update(password)
+                results.append(chi_square(f"parallel/strength-{strength}/length-{length}", counts,
+                                          expected_batch(strength, length), args.alpha))
+
+            log(f"uniformity: strength {strength}, length {length} done")
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {
+        "version": __version__,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "throughput": run_throughput(args),
+        "uniformity": run_uniformity(args),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    failed = [check["name"] for check in report["uniformity"] if not check["passed"]]
+    if failed:
+        log(f"Uniformity checks failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Compare sealed vaults with per-entry Fernet tokens on size and load/save time.
+
+Builds vaults of 1k, 10k and 100k entries and stores each one twice: as
+Fernet tokens in the JSON and binary formats, and in the sealed format
+with each compression.  Save time covers encryption as well as writing,
+and load time covers reading and decrypting every password, so both sides
+end with the same plaintext.  Results are written as JSON.
+
+Usage: python benchmarks/bench_sealed_vault.py -o sealed-vault.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from cryptography.fernet import Fernet
+from src import __version__
+from src.core.password_generator import PasswordGenerator
+from src.core.sealed_vault import COMPRESSION
+from src.core.vault_backends import BinaryVaultBackend, JsonVaultBackend, SealedVaultBackend
+
+SIZES = (1000, 10000, 100000)
+# Per-entry Fernet formats, then sealed with each compression
+CASES = ("fernet-json", "fernet-binary") + tuple(f"sealed-{name}" for name in COMPRESSION)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark sealed vaults against per-entry Fernet")
+    parser.add_argument("-o", "--output", default="-", help="JSON output file, '-' for stdout")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="entries per vault")
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=CASES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best is kept")
+    return parser.parse_args(argv)
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def make_entries(count):
+    """count plaintext entries with 16-character passwords"""
+    passwords = PasswordGenerator.generate_passwords(count, 16, 4)
+    return [{"site": f"site-{i}.example.com", "password": password}
+            for i, password in enumerate(passwords)]
+
+
+def open_backend(case, data_dir, key):
+    kind, variant = case.split("-", 1)
+    if kind == "sealed":
+        return SealedVaultBackend(data_dir, keys=[key], compression=variant)
+    return {"json": JsonVaultBackend, "binary": BinaryVaultBackend}[variant](data_dir)
+
+
+def save(backend, entries, cipher):
+    if not backend.encrypts:
+        entries = [dict(entry, password=cipher.encrypt(entry["password"].encode()).decode())
+                   for entry in entries]
+    backend.put_many("bench", entries)
+
+
+def load(backend, cipher):
+    entries = backend.list_entries("bench")
+    if backend.encrypts:
+        return [entry["password"] for entry in entries]
+    return [cipher.decrypt(entry["password"].encode()).decode() for entry in entries]
+
+
+def run_case(case, entries, repeat):
+    key = Fernet.generate_key()
+    cipher = Fernet(key)
+    save_times = []
+    load_times = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        for _ in range(repeat):
+            backend = open_backend(case, data_dir, key)
+            path = backend.path("bench")
+            if os.path.exists(path):
+                os.remove(path)
+            start = time.perf_counter()
+            save(backend, entries, cipher)
+            save_times.append(time.perf_counter() - start)
+            backend.close()
+
+            backend = open_backend(case, data_dir, key)
+            start = time.perf_counter()
+            passwords = load(backend, cipher)
+            load_times.append(time.perf_counter() - start)
+            backend.close()
+            if passwords != [entry["password"] for entry in entries]:
+                raise RuntimeError(f"{case} vault did not round-trip")
+        size = os.path.getsize(path)
+    return {
+        "case": case,
+        "entries": len(entries),
+        "bytes": size,
+        "bytes_per_entry": round(size / len(entries), 1),
+        "save_seconds": round(min(save_times), 4),
+        "load_seconds": round(min(load_times), 4),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for count in args.sizes:
+        entries = make_entries(count)
+        for case in args.cases:
+            result = run_case(case, entries, args.repeat)
+            log(f"{case} {count:,}: {result['bytes']:,} bytes, "
+                f"save {result['save_seconds']}s, load {result['load_seconds']}s")
+            results.append(result)
+
+    report = {
+        "version": __version__,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Compare the vault file formats on size and load/save time.
+
+Builds vaults of 10k and 100k entries with real Fernet tokens, then for
+each whole-file format measures the file size, the time to write the vault
+(serialise and atomic replace) and the time for a fresh backend to load it.
+Results are written as JSON.
+
+Usage: python benchmarks/bench_vault_formats.py -o vault-formats.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from cryptography.fernet import Fernet
+from src import __version__
+from src.core.password_generator import PasswordGenerator
+from src.core.vault_backends import BACKENDS, RewriteVaultBackend
+
+SIZES = (10000, 100000)
+# Whole-file formats storing Fernet tokens; bench_sealed_vault covers "sealed"
+FORMATS = tuple(name for name, backend in BACKENDS.items()
+                if issubclass(backend, RewriteVaultBackend) and not backend.encrypts)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vault file formats")
+    parser.add_argument("-o", "--output", default="-", help="JSON output file, '-' for stdout")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="entries per vault")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best is kept")
+    return parser.parse_args(argv)
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def make_entries(count):
+    """count entries with 16-character passwords encrypted under a fresh key"""
+    cipher = Fernet(Fernet.generate_key())
+    passwords = PasswordGenerator.generate_passwords(count, 16, 4)
+    return [{"site": f"site-{i}.example.com", "password": cipher.encrypt(password.encode()).decode()}
+            for i, password in enumerate(passwords)]
+
+
+def run_case(name, entries, repeat):
+    backend_class = BACKENDS[name]
+    save_times = []
+    load_times = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        for _ in range(repeat):
+            backend = backend_class(data_dir)
+            path = backend.path("bench")
+            if os.path.exists(path):
+                os.remove(path)
+            start = time.perf_counter()
+            backend.put_many("bench", entries)
+            save_times.append(time.perf_counter() - start)
+            backend.close()
+
+            backend = backend_class(data_dir)
+            start = time.perf_counter()
+            loaded = len(backend.list_entries("bench"))
+            load_times.append(time.perf_counter() - start)
+            backend.close()
+            if loaded != len(entries):
+                raise RuntimeError(f"{name} vault lost entries")
+        size = os.path.getsize(path)
+    return {
+        "format": name,
+        "entries": len(entries),
+        "bytes": size,
+        "bytes_per_entry": round(size / len(entries), 1),
+        "save_seconds": round(min(save_times), 4),
+        "load_seconds": round(min(load_times), 4),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for count in args.sizes:
+        log(f"encrypting {count:,} entries")
+        entries = make_entries(count)
+        for name in args.formats:
+            result = run_case(name, entries, args.repeat)
+            log(f"{name} {count:,}: {result['bytes']:,} bytes, "
+                f"save {result['save_seconds']}s, load {result['load_seconds']}s")
+            results.append(result)
+
+    report = {
+        "version": __version__,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
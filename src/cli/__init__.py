@@ -0,0 +1,3 @@
+"""
+Command line tools that run without the Tkinter interface.
+"""
@@ -0,0 +1,69 @@
+"""
+Back up the data and config directories incrementally, or restore a backup.
+
+Files are split into content-defined chunks stored once each in the
+backup repository, so a backup of unchanged vaults only writes a small
+snapshot manifest.  Backups hold the encryption key next to the vaults,
+exactly like data/ itself; keep the repository somewhere private.
+
+Usage: python -m src.cli.backup_vault create --repo /mnt/backup/genpass
+       python -m src.cli.backup_vault list --repo /mnt/backup/genpass
+       python -m src.cli.backup_vault restore latest restored/ --repo /mnt/backup/genpass
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from src.core.backup import BackupRepository
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental backups of GenPass data")
+    parser.add_argument("--repo", default="backups", help="backup repository directory")
+    actions = parser.add_subparsers(dest="action", required=True)
+    create = actions.add_parser("create", help="take a snapshot")
+    create.add_argument("sources", nargs="*", default=["data", "config"],
+                        help="directories to back up (default: data config)")
+    actions.add_parser("list", help="list snapshots")
+    restore = actions.add_parser("restore", help="restore a snapshot")
+    restore.add_argument("snapshot", help="snapshot id, or 'latest'")
+    restore.add_argument("target", help="directory to restore into (e.g. . to restore in place)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    repository = BackupRepository(args.repo)
+    try:
+        if args.action == "create":
+            start = time.perf_counter()
+            manifest = repository.create_snapshot(args.sources)
+            stats = manifest["stats"]
+            print(f"Snapshot {manifest['id']}: {stats['files']} files ({stats['bytes']:,} bytes), "
+                  f"{stats['read']} read, {stats['new_chunks']} new chunks ({stats['stored_bytes']:,} bytes) "
+                  f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        elif args.action == "list":
+            for snapshot_id in repository.snapshots():
+                manifest = repository.load_snapshot(snapshot_id)
+                created = datetime.fromtimestamp(manifest["created_at"]).strftime("%Y-%m-%d %H:%M:%S")
+                print(f"{snapshot_id}  {created}  {manifest['stats']['files']} files  "
+                      f"{manifest['stats']['bytes']:,} bytes")
+        else:
+            snapshot_id = args.snapshot
+            if snapshot_id == "latest":
+                snapshots = repository.snapshots()
+                if not snapshots:
+                    print(f"Error: No snapshots in {args.repo}", file=sys.stderr)
+                    return 1
+                snapshot_id = snapshots[-1]
+            count = repository.restore(snapshot_id, args.target)
+            print(f"Restored {count} files from {snapshot_id} into {args.target}", file=sys.stderr)
+    except Exception as e:
+        print(f"Error: Backup {args.action} failed: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Convert breached-password hash dumps into a searchable corpus file.
+
+Input files hold one hex hash per line, optionally followed by ":count" as
+in the Have I Been Pwned downloads; they need not be sorted.
+
+Usage: python -m src.cli.build_breach_corpus pwned-passwords-sha1.txt -o data/breach.corpus
+Then set "breach_corpus" in config/settings.json to the output path.
+"""
+
+import argparse
+import sys
+import time
+from src.core.breach_checker import HASH_SIZES, build_corpus
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build a breached-password corpus")
+    parser.add_argument("inputs", nargs="+", help="text hash dumps")
+    parser.add_argument("-o", "--output", required=True, help="corpus file to write")
+    parser.add_argument("-t", "--hash-type", default="sha1", choices=sorted(HASH_SIZES))
+    parser.add_argument("--run-size", type=int, default=5000000,
+                        help="hashes sorted in memory at once")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+
+    def progress(lines):
+        print(f"{lines:,} lines read", file=sys.stderr)
+
+    try:
+        count = build_corpus(args.inputs, args.output, args.hash_type, args.run_size, progress)
+    except Exception as e:
+        print(f"Error: Failed to build breach corpus: {str(e)}", file=sys.stderr)
+        return 1
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {count:,} {args.hash_type} hashes to {args.output} in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
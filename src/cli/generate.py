@@ -0,0 +1,285 @@
+"""
+Stream generated passwords to a file or stdout.
+
+Usage: python generate.py --count 10000000 --length 16 --strength 4 -o out.txt
+       python generate.py --count 1000000 --passphrase --words 6 -o phrases.txt
+       python generate.py --count 1000000 --pattern "Cvcc-9999-Cvcc" -o codes.txt
+       python generate.py --count 1000000 --bloom-file seen.bloom -o batch2.txt --against batch1.txt
+"""
+
+import argparse
+import itertools
+import mmap
+import os
+import sys
+import time
+from src.core.bloom_filter import BloomFilter, Deduplicator
+from src.core.breach_checker import BreachCorpus
+from src.core.password_generator import PasswordGenerator
+from src.core.passphrase_generator import PassphraseGenerator
+
+# Passwords joined into one write() call
+DEFAULT_CHUNK_SIZE = 8192
+# Buffer size for the output file
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Rejections in a row that mean the requested space is used up
+MAX_CONSECUTIVE_REJECTIONS = 10000
+# Seconds between progress reports
+REPORT_INTERVAL = 2.0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate passwords in bulk")
+    parser.add_argument("-n", "--count", type=int, required=True, help="number of passwords")
+    parser.add_argument("-l", "--length", type=int, default=16, help="password length (1-128)")
+    parser.add_argument("-s", "--strength", type=int, default=4, choices=[1, 2, 3, 4],
+                        help="1=a-z, 2=+A-Z, 3=+0-9, 4=+symbols")
+    parser.add_argument("-t", "--pattern", default=None,
+                        help="template such as 'Cvcc-9999-Cvcc' (overrides length/strength)")
+    parser.add_argument("--pronounceable", action="store_true",
+                        help="generate pronounceable passwords from the Markov model")
+    parser.add_argument("-p", "--passphrase", action="store_true",
+                        help="generate diceware passphrases instead of passwords")
+    parser.add_argument("--words", type=int, default=PassphraseGenerator.DEFAULT_WORDS,
+                        help="words per passphrase")
+    parser.add_argument("--separator", default=PassphraseGenerator.DEFAULT_SEPARATOR,
+                        help="passphrase word separator")
+    parser.add_argument("--capitalize", action="store_true", help="capitalise passphrase words")
+    parser.add_argument("--add-digit", action="store_true",
+                        help="append a random digit to one passphrase word")
+    parser.add_argument("--wordlist", default=None, help="wordlist file for passphrases")
+    parser.add_argument("-o", "--output", default="-", help="output file, '-' for stdout")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="generator processes (0 = one per CPU)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="with several workers, write chunks as they finish")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="passwords per write")
+    parser.add_argument("-u", "--unique", action="store_true",
+                        help="guarantee no repeats, using a Bloom filter")
+    parser.add_argument("--bloom-file", default=None,
+                        help="Bloom filter file to check against and update (implies --unique)")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="items a new Bloom filter is sized for (default: --count)")
+    parser.add_argument("--error-rate", type=float, default=1e-6,
+                        help="false-positive rate of a new Bloom filter")
+    parser.add_argument("--against", nargs="*", default=[], metavar="FILE",
+                        help="previous batch files used to confirm Bloom filter hits")
+    parser.add_argument("--exclude-breached", default=None, metavar="CORPUS",
+                        help="drop passwords found in a breach corpus file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not report throughput")
+    return parser.parse_args(argv)
+
+
+def iter_chunks(passwords, chunk_size):
+    """Group a password iterator into newline-terminated byte chunks"""
+    chunk = []
+    for password in passwords:
+        chunk.append(password)
+        if len(chunk) >= chunk_size:
+            yield ("\n".join(chunk) + "\n").encode("utf-8"), len(chunk)
+            chunk = []
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode("utf-8"), len(chunk)
+
+
+def write_stream(out, passwords, chunk_size=DEFAULT_CHUNK_SIZE, report=None):
+    """Write passwords to a binary stream chunk by chunk
+
+    Only one chunk is held in memory at a time. report, if given, is called
+    with (written, elapsed_seconds) at most every REPORT_INTERVAL seconds.
+    """
+    written = 0
+    start = time.perf_counter()
+    last_report = start
+    for data, count in iter_chunks(passwords, chunk_size):
+        out.write(data)
+        written += count
+        now = time.perf_counter()
+        if report and now - last_report >= REPORT_INTERVAL:
+            report(written, now - start)
+            last_report = now
+    out.flush()
+    return written, time.perf_counter() - start
+
+
+def make_source(args, count, chunk_size=None):
+    """Return an iterator over count generated passwords or passphrases
+
+    chunk_size is the number of items per task in parallel mode.
+    """
+    if args.passphrase:
+        generator = PassphraseGenerator(args.wordlist)
+        options = (args.words, args.separator, args.capitalize, args.add_digit)
+        if args.workers == 1:
+            return generator.iter_passphrases(count, *options)
+        return generator.iter_passphrases_parallel(
+            count, *options, workers=args.workers or None, ordered=not args.unordered,
+            chunk_size=chunk_size)
+    if args.pattern is not None:
+        if args.workers == 1:
+            return PasswordGenerator.iter_pattern_passwords(count, args.pattern)
+        return PasswordGenerator.iter_pattern_passwords_parallel(
+            count, args.pattern, workers=args.workers or None, ordered=not args.unordered,
+            chunk_size=chunk_size)
+    if args.pronounceable:
+        if args.workers == 1:
+            return PasswordGenerator.iter_pronounceable(count, args.length, args.strength)
+        return PasswordGenerator.iter_pronounceable_parallel(
+            count, args.length, args.strength,
+            workers=args.workers or None, ordered=not args.unordered, chunk_size=chunk_size)
+    if args.workers == 1:
+        return PasswordGenerator.iter_passwords(count, args.length, args.strength)
+    return PasswordGenerator.iter_passwords_parallel(
+        count, args.length, args.strength,
+        workers=args.workers or None, ordered=not args.unordered, chunk_size=chunk_size)
+
+
+def iter_top_ups(args, count):
+    """Keep generating small batches to replace dropped repeats
+
+    With several workers a single pool serves the whole stream, in small
+    chunks so little is generated ahead of need.
+    """
+    size = max(1, count // 1000)
+    if args.workers == 1:
+        while True:
+            yield from make_source(args, size)
+    yield from make_source(args, sys.maxsize, chunk_size=size)
+
+
+def file_contains_line(path, line):
+    """Check whether a newline-separated file holds line, without loading it"""
+    target = line.encode("utf-8") + b"\n"
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return False
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[:len(target)] == target or mm.find(b"\n" + target) != -1
+    except FileNotFoundError:
+        return False
+
+
+def exclude_breached(passwords, corpus):
+    """Drop passwords found in a breach corpus"""
+    consecutive = 0
+    for password in passwords:
+        if corpus.is_breached(password):
+            consecutive += 1
+            if consecutive > MAX_CONSECUTIVE_REJECTIONS:
+                raise ValueError("Too many breached passwords; use a longer length or higher strength")
+            continue
+        consecutive = 0
+        yield password
+
+
+def make_verifier(out, output_path, against, prior_batches=False):
+    """Build the exact check run on Bloom filter hits
+
+    Earlier batches are searched on disk, as is this batch's own output once
+    flushed.  A hit that cannot be checked exactly is assumed to be a
+    repeat: output sent to stdout cannot be re-read, and a filter loaded
+    with items from earlier batches (prior_batches) may have hit one of
+    them, which only the --against files could rule out.
+    """
+    def verify(password):
+        if any(file_contains_line(path, password) for path in against):
+            return True
+        if output_path is None or (prior_batches and not against):
+            return True
+        out.flush()
+        return file_contains_line(output_path, password)
+    return verify
+
+
+def load_bloom_filter(args):
+    if args.bloom_file and os.path.exists(args.bloom_file):
+        return BloomFilter.load(args.bloom_file)
+    return BloomFilter(args.capacity or max(args.count, 1), args.error_rate)
+
+
+def _report(written, elapsed):
+    rate = written / elapsed if elapsed else 0.0
+    print(f"{written} passwords, {rate:,.0f}/s", file=sys.stderr)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.chunk_size <= 0:
+        print("Error: chunk size must be positive", file=sys.stderr)
+        return 2
+
+    unique = args.unique or args.bloom_file is not None
+    corpus = None
+    try:
+        # Arguments are validated here, before the output file is truncated
+        passwords = make_source(args, args.count)
+        if unique or args.exclude_breached:
+            passwords = itertools.chain(passwords, iter_top_ups(args, args.count))
+        if unique:
+            bloom = load_bloom_filter(args)
+            prior_batches = bloom.count > 0
+        if args.exclude_breached:
+            corpus = BreachCorpus(args.exclude_breached)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+
+    def run(out, output_path):
+        stream = passwords
+        if corpus is not None:
+            stream = exclude_breached(stream, corpus)
+        if unique:
+            # Items still waiting to be written are only in memory, so they
+            # are covered by the exact window rather than the file check
+            dedup = Deduplicator(bloom, make_verifier(out, output_path, args.against, prior_batches),
+                                 window=args.chunk_size, max_consecutive=MAX_CONSECUTIVE_REJECTIONS)
+            stream = dedup.filter(stream)
+        if stream is not passwords:
+            stream = itertools.islice(stream, args.count)
+        result = write_stream(out, stream, args.chunk_size, report)
+        if unique and not args.quiet:
+            print(f"Dropped {dedup.duplicates} repeats, "
+                  f"{dedup.false_positives} Bloom false positives", file=sys.stderr)
+        return result
+
+    if args.pattern is not None and not args.quiet:
+        bits = PasswordGenerator.pattern_entropy(args.pattern)
+        print(f"Pattern entropy: {bits:.1f} bits", file=sys.stderr)
+
+    report = None if args.quiet else _report
+    try:
+        if args.output == "-":
+            written, elapsed = run(sys.stdout.buffer, None)
+        else:
+            with open(args.output, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+                written, elapsed = run(f, args.output)
+    except BrokenPipeError:
+        # Downstream consumer (e.g. head) closed the pipe early; point stdout
+        # at devnull so the interpreter's final flush does not fail again
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    if unique and args.bloom_file:
+        try:
+            bloom.save(args.bloom_file)
+        except Exception as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 1
+        if bloom.saturated and not args.quiet:
+            print("Warning: Bloom filter is over capacity; its false-positive rate is rising",
+                  file=sys.stderr)
+
+    if not args.quiet:
+        rate = written / elapsed if elapsed else 0.0
+        print(f"Wrote {written} passwords in {elapsed:.2f}s ({rate:,.0f}/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
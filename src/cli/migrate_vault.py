@@ -0,0 +1,84 @@
+"""
+Copy every user's vault from one storage backend to another.
+
+Entries stay encrypted; they are copied as stored, one transaction per
+user, and then read back from the target and compared with the source.
+Moving to or from the sealed backend, which encrypts whole vaults, converts
+between its plaintext entries and per-entry tokens on the way.
+
+Usage: python -m src.cli.migrate_vault --from json --to sqlite
+Then set "storage_backend" in config/settings.json to the target.
+"""
+
+import argparse
+import sys
+from src.core.key_rotation import build_cipher, load_keys
+from src.core.vault_backends import BACKENDS, create_backend
+from src.utils.config import config
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate vaults between storage backends")
+    parser.add_argument("--from", dest="source", default="json", choices=sorted(BACKENDS))
+    parser.add_argument("--to", dest="target", required=True, choices=sorted(BACKENDS))
+    parser.add_argument("--data-dir", default="data", help="directory holding the vaults")
+    return parser.parse_args(argv)
+
+
+def convert(entries, cipher, encrypt):
+    """Entries with passwords encrypted to tokens, or decrypted from them"""
+    if encrypt:
+        return [dict(entry, password=cipher.encrypt(entry["password"].encode()).decode())
+                for entry in entries]
+    return [dict(entry, password=cipher.decrypt(entry["password"].encode()).decode())
+            for entry in entries]
+
+
+def migrate(source, target, cipher=None):
+    """Copy all vaults from source to target; return {username: entry count}
+
+    cipher is needed when exactly one of the backends encrypts vaults itself.
+    """
+    counts = {}
+    for username in source.usernames():
+        entries = source.list_entries(username)
+        if source.encrypts != target.encrypts:
+            entries = convert(entries, cipher, source.encrypts)
+        target.put_many(username, entries)
+        copied = {entry["site"]: entry for entry in target.list_entries(username)}
+        for entry in entries:
+            if copied.get(entry["site"]) != entry:
+                raise ValueError(f"Entry {entry['site']!r} of {username} did not survive migration")
+        counts[username] = len(entries)
+    return counts
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.source == args.target:
+        print("Error: Source and target backends are the same", file=sys.stderr)
+        return 1
+
+    settings = config.load_settings()
+    keys = load_keys(args.data_dir)
+    source = target = None
+    try:
+        source = create_backend(settings, args.data_dir, args.source, keys)
+        target = create_backend(settings, args.data_dir, args.target, keys)
+        counts = migrate(source, target, build_cipher(keys) if keys else None)
+    except Exception as e:
+        print(f"Error: Failed to migrate vaults: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        for backend in (source, target):
+            if backend is not None:
+                backend.close()
+
+    for username, count in counts.items():
+        print(f"{username}: {count} entries", file=sys.stderr)
+    print(f"Migrated {len(counts)} vaults from {args.source} to {args.target}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Re-encrypt every vault in the data directory under a new key.
+
+The app can stay open: until rotation finishes both keys are accepted.
+If interrupted, run the command again to resume.  Back up data/ first.
+
+Usage: python -m src.cli.rotate_key --workers 0
+"""
+
+import argparse
+import os
+import sys
+import time
+from src.core.key_rotation import rotate_keys
+from src.utils.config import config
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rotate the vault encryption key")
+    parser.add_argument("--data-dir", default="data", help="directory holding the vaults and key")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="vaults re-encrypted in parallel (0 = one per CPU)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="don't report progress")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workers = args.workers or os.cpu_count() or 1
+    if workers < 0:
+        print("Error: Workers must be a positive integer", file=sys.stderr)
+        return 1
+
+    def progress(username, entries, done, total):
+        print(f"[{done}/{total}] {username}: {entries:,} entries", file=sys.stderr)
+
+    start = time.perf_counter()
+    try:
+        count = rotate_keys(args.data_dir, config.load_settings(), workers,
+                            None if args.quiet else progress)
+    except Exception as e:
+        print(f"Error: Failed to rotate key: {str(e)}", file=sys.stderr)
+        print("Run the command again to resume.", file=sys.stderr)
+        return 1
+
+    elapsed = time.perf_counter() - start
+    print(f"Rotated {count} vaults in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Reconcile the vaults of two GenPass data directories, e.g. one on a share.
+
+Each user's entries are compared through Merkle trees, so only differing
+entries are read back and copied, in both directions.  An entry changed
+on one side since the last sync replaces the other; one changed on both
+sides is settled by the policy: the newest edit wins, and with
+conflict-copy the other edit is kept as a "site (conflict ...)" entry.
+Both directories must use the same encryption key and storage backend.
+
+Usage: python -m src.cli.sync_vault /mnt/share/genpass/data --policy conflict-copy
+"""
+
+import argparse
+import os
+import sys
+import time
+from src.core.vault_sync import SYNC_POLICIES, sync_dirs
+from src.utils.config import config
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sync vaults between two data directories")
+    parser.add_argument("other", help="data directory to sync with")
+    parser.add_argument("--data-dir", default="data", help="local directory holding the vaults")
+    parser.add_argument("--policy", default="last-writer-wins", choices=SYNC_POLICIES,
+                        help="how to settle entries changed on both sides")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if os.path.realpath(args.data_dir) == os.path.realpath(args.other):
+        print("Error: Cannot sync a data directory with itself", file=sys.stderr)
+        return 1
+    if not os.path.isdir(args.other):
+        print(f"Error: {args.other} is not a directory", file=sys.stderr)
+        return 1
+
+    def progress(username, to_local, to_other):
+        if to_local or to_other:
+            print(f"{username}: {to_local} entries updated here, {to_other} there", file=sys.stderr)
+
+    start = time.perf_counter()
+    try:
+        results = sync_dirs(config.load_settings(), args.data_dir, args.other, args.policy, progress)
+    except Exception as e:
+        print(f"Error: Failed to sync vaults: {str(e)}", file=sys.stderr)
+        return 1
+
+    changed = sum(1 for counts in results.values() if any(counts))
+    print(f"Synced {len(results)} vaults ({changed} changed) in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Import passwords from CSV exports into a GenPass vault, or export a vault.
+
+Imports understand GenPass, Chrome/Edge, Firefox, Bitwarden, LastPass,
+KeePass and 1Password CSV exports (picked from the header) and store the
+whole file in one vault write.  Exports stream one decrypted entry at a
+time; the output holds plaintext passwords, so delete it once used.
+
+Usage: python -m src.cli.transfer_vault import chrome-passwords.csv -u alice
+       python -m src.cli.transfer_vault export backup.csv -u alice
+"""
+
+import argparse
+import os
+import sys
+import time
+from src.core.storage_manager import StorageManager
+from src.core.vault_formats import EXPORT_FORMATS, IMPORT_FORMATS, iter_import_rows, write_export_rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export vault entries as CSV")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("path", help="CSV file to read or write ('-' for stdin/stdout)")
+    parser.add_argument("-u", "--username", required=True, help="vault owner")
+    parser.add_argument("-f", "--format", default=None,
+                        choices=sorted(set(IMPORT_FORMATS) | set(EXPORT_FORMATS)),
+                        help="CSV layout (import: detected from the header; export: genpass)")
+    return parser.parse_args(argv)
+
+
+def import_file(storage, username, path, format_name=None):
+    if path == "-":
+        return storage.import_passwords(username, iter_import_rows(sys.stdin, format_name))
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return storage.import_passwords(username, iter_import_rows(f, format_name))
+
+
+def export_file(storage, username, path, format_name="genpass"):
+    rows = storage.iter_passwords(username)
+    if path == "-":
+        return write_export_rows(sys.stdout, rows, format_name)
+    # Readable only by the owner, as the file holds plaintext
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with open(fd, "w", newline="", encoding="utf-8") as f:
+        return write_export_rows(f, rows, format_name)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.action == "export" and args.format not in (None,) + EXPORT_FORMATS:
+        print(f"Error: Exports support {', '.join(EXPORT_FORMATS)}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    storage = StorageManager()
+    try:
+        try:
+            if args.action == "import":
+                count = import_file(storage, args.username, args.path, args.format)
+            else:
+                count = export_file(storage, args.username, args.path, args.format or "genpass")
+        finally:
+            # Batched writes are committed here, and may fail
+            storage.close()
+    except Exception as e:
+        print(f"Error: Failed to {args.action} passwords: {str(e)}", file=sys.stderr)
+        return 1
+
+    elapsed = time.perf_counter() - start
+    verb = "Imported" if args.action == "import" else "Exported"
+    print(f"{verb} {count:,} entries in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
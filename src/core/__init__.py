@@ -3,13 +3,28 @@ Core functionality for password generation and storage.
 """
 
 from .password_generator import PasswordGenerator
+from .password_policy import PasswordPolicy
+from .passphrase_generator import PassphraseGenerator
+from .strength_estimator import StrengthEstimator
 from .storage_manager import StorageManager
 
-# Create singleton instance for storage
-storage = StorageManager()
+_storage = None
+
+def __getattr__(name):
+    # Create the storage singleton on first use so that importing the
+    # generator (e.g. from the bulk CLI) does not touch the vault directory
+    global _storage
+    if name == 'storage':
+        if _storage is None:
+            _storage = StorageManager()
+        return _storage
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     'PasswordGenerator',
+    'PasswordPolicy',
+    'PassphraseGenerator',
+    'StrengthEstimator',
     'StorageManager',
     'storage'
-]
\ No newline at end of file
+]
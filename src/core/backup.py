@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from .password_history import PasswordHistory
+from .sync_journal import TOMBSTONE_SUFFIX
+from .vault_backends import BACKENDS, SqliteVaultBackend
+from .vault_lock import VaultLock
+from .write_coordinator import atomic_write
+
+# Gear table for the rolling hash: one fixed pseudo-random 64-bit value per byte
+_GEAR = tuple(int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "little") for i in range(256))
+_MASK64 = (1 << 64) - 1
+
+
+def iter_chunks(f, min_size=2048, avg_bits=13, max_size=65536):
+    """Split a binary file object into content-defined chunks
+
+    A gear rolling hash runs over the data and a chunk ends where its top
+    avg_bits bits are all zero (about every 2**avg_bits bytes past
+    min_size), or at max_size.  Boundaries depend only on nearby bytes, so
+    an edit only changes the chunks around it and the rest of the file
+    still splits, and deduplicates, as before.
+    """
+    mask = ((1 << avg_bits) - 1) << (64 - avg_bits)
+    gear = _GEAR
+    buffer = b""
+    start = 0
+    eof = False
+    while True:
+        if not eof and len(buffer) - start < max_size:
+            data = f.read(1 << 20)
+            if data:
+                buffer = buffer[start:] + data
+                start = 0
+                continue
+            eof = True
+        if start >= len(buffer):
+            return
+        end = min(len(buffer), start + max_size)
+        cut = end
+        if end - start > min_size:
+            h = 0
+            position = start + min_size
+            for byte in buffer[position:end]:
+                h = ((h << 1) + gear[byte]) & _MASK64
+                position += 1
+                if not h & mask:
+                    cut = position
+                    break
+        yield buffer[start:cut]
+        start = cut
+
+
+def _lock_path(source, relative):
+    """The VaultLock guarding a vault, history or tombstones file, or None"""
+    if os.sep in relative:
+        return None
+    if relative.endswith(PasswordHistory.suffix):
+        return os.path.join(source, f".{relative[:-len(PasswordHistory.suffix)]}.history.lock")
+    suffixes = [backend.suffix for backend in BACKENDS.values() if backend.suffix]
+    for suffix in suffixes + [TOMBSTONE_SUFFIX]:
+        if relative.endswith(suffix):
+            return os.path.join(source, f".{relative[:-len(suffix)]}.lock")
+    return None
+
+
+@contextmanager
+def _shared_lock(source, relative):
+    """Keep writers out of the file's vault, if it belongs to one"""
+    lock_path = _lock_path(source, relative)
+    if lock_path is None:
+        yield
+        return
+    vault_lock = VaultLock(lock_path)
+    try:
+        with vault_lock.shared():
+            yield
+    finally:
+        vault_lock.close()
+
+
+def _walk(source):
+    """Files under source, as paths relative to it, skipping lock and temp files"""
+    for directory, dirnames, filenames in os.walk(source):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith("."))
+        for name in sorted(filenames):
+            # Dotfiles are vault locks and atomic_write temporaries
+            if not name.startswith("."):
+                yield os.path.relpath(os.path.join(directory, name), source)
+
+
+class BackupRepository:
+    """Deduplicating store of snapshots of the data and config directories
+
+    Files are split into content-defined chunks, each kept once under
+    chunks/ as a zlib-compressed file named by the SHA-256 of its
+    contents, so a chunk already stored by any earlier snapshot costs
+    nothing.  A snapshot is a small JSON manifest under snapshots/ listing
+    each file's chunks.  Files whose size and modification time match the
+    previous snapshot are not even read again.  Everything is written
+    with atomic_write, and a manifest only after all of its chunks.
+
+    Vault, history and tombstone files are read under their vault's
+    shared lock, so a save never leaves one half-copied.  The SQLite vault
+    is copied with SQLite's online backup instead, which takes in its
+    write-ahead log; the log files themselves are skipped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.chunks_dir = os.path.join(path, "chunks")
+        self.snapshots_dir = os.path.join(path, "snapshots")
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _put_chunk(self, data):
+        """Store a chunk unless present; return (digest, bytes written)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        compressed = zlib.compress(data, 6)
+        atomic_write(path, compressed)
+        return digest, len(compressed)
+
+    def _get_chunk(self, digest):
+        with open(self._chunk_path(digest), "rb") as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Backup chunk {digest} is corrupt")
+        return data
+
+    def _store(self, f, stats):
+        """Chunk and store a file's contents; return its [digest, size] list"""
+        chunks = []
+        for data in iter_chunks(f):
+            digest, written = self._put_chunk(data)
+            chunks.append([digest, len(data)])
+            if written:
+                stats["new_chunks"] += 1
+                stats["stored_bytes"] += written
+        stats["read"] += 1
+        return chunks
+
+    def _store_sqlite(self, filename, stats):
+        """Store a consistent copy of a live SQLite database"""
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        fd, copy_path = tempfile.mkstemp(dir=self.path, prefix=".sqlite-")
+        os.close(fd)
+        try:
+            source = sqlite3.connect(filename)
+            copy = sqlite3.connect(copy_path)
+            try:
+                source.backup(copy)
+            finally:
+                copy.close()
+                source.close()
+            with open(copy_path, "rb") as f:
+                return self._store(f, stats)
+        finally:
+            os.remove(copy_path)
+
+    def snapshots(self):
+        """Snapshot ids, oldest first"""
+        try:
+            names = os.listdir(self.snapshots_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+    def load_snapshot(self, snapshot_id):
+        try:
+            with open(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"No snapshot {snapshot_id} in {self.path}")
+
+    def create_snapshot(self, sources):
+        """Back up the files under each source directory; return the manifest
+
+        Paths in the manifest start with each source's base name, e.g.
+        "data/alice_passwords.json".  The manifest's "stats" say how many
+        files were read and how many new bytes were stored.
+        """
+        os.makedirs(self.snapshots_dir, mode=0o700, exist_ok=True)
+        previous = {}
+        snapshot_ids = self.snapshots()
+        if snapshot_ids:
+            previous = {entry["path"]: entry for entry in self.load_snapshot(snapshot_ids[-1])["files"]}
+
+        sqlite_logs = {SqliteVaultBackend.filename + suffix for suffix in ("-wal", "-shm", "-journal")}
+        files = []
+        stats = {"files": 0, "read": 0, "bytes": 0, "new_chunks": 0, "stored_bytes": 0}
+        for source in sources:
+            base = os.path.basename(os.path.normpath(source))
+            for relative in _walk(source):
+                filename = os.path.join(source, relative)
+                path = "/".join([base] + relative.split(os.sep))
+                if relative in sqlite_logs:
+                    continue
+                if relative == SqliteVaultBackend.filename:
+                    # Recent changes may only be in the log, so always copied
+                    stat = os.stat(filename)
+                    chunks = self._store_sqlite(filename, stats)
+                else:
+                    with _shared_lock(source, relative):
+                        stat = os.stat(filename)
+                        old = previous.get(path)
+                        if (old is not None and old["size"] == stat.st_size
+                                and old["mtime_ns"] == stat.st_mtime_ns
+                                and all(os.path.exists(self._chunk_path(digest))
+                                        for digest, _ in old["chunks"])):
+                            chunks = old["chunks"]
+                        else:
+                            with open(filename, "rb") as f:
+                                chunks = self._store(f, stats)
+                files.append({"path": path, "size": sum(size for _, size in chunks),
+                              "mtime_ns": stat.st_mtime_ns, "mode": stat.st_mode & 0o777,
+                              "chunks": chunks})
+                stats["files"] += 1
+                stats["bytes"] += files[-1]["size"]
+
+        created_at = time.time()
+        snapshot_id = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(created_at)) + f"-{secrets.token_hex(3)}"
+        manifest = {"id": snapshot_id, "created_at": created_at, "files": files, "stats": stats}
+        atomic_write(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"),
+                     json.dumps(manifest, separators=(",", ":")).encode())
+        return manifest
+
+    def restore(self, snapshot_id, target):
+        """Write a snapshot's files under target; return the number of files
+
+        Each file is assembled chunk by chunk into a temporary file, with
+        every chunk checked against its hash, and then renamed into place.
+        """
+        manifest = self.load_snapshot(snapshot_id)
+        for entry in manifest["files"]:
+            parts = entry["path"].split("/")
+            if any(part in ("", ".", "..") for part in parts):
+                raise ValueError(f"Unsafe path in snapshot: {entry['path']}")
+            filename = os.path.join(target, *parts)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            atomic_write(filename, (self._get_chunk(digest) for digest, _ in entry["chunks"]))
+            os.chmod(filename, entry["mode"])
+        return len(manifest["files"])
@@ -0,0 +1,156 @@
+import hashlib
+import math
+import os
+import secrets
+import struct
+from collections import deque
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, persistable to disk
+
+    Sized from an expected capacity and false-positive rate; memory use is
+    fixed at creation no matter how many items are added.  Positions come
+    from one salted BLAKE2b digest per item (double hashing).  Anyone
+    holding the file can test guesses against it, so treat a saved filter
+    with the same care as the passwords it was built from.
+    """
+
+    MAGIC = b"GPBLOOM1"
+    _HEADER = struct.Struct("<8sQIQQd16s")
+
+    def __init__(self, capacity, error_rate=1e-6):
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("Capacity must be a positive integer")
+        if not 0 < error_rate < 1:
+            raise ValueError("Error rate must be between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self.salt = secrets.token_bytes(16)
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16, salt=self.salt).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item):
+        """Add an item; return True if it was (probably) already present"""
+        bits = self._bits
+        present = True
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                present = False
+        if not present:
+            self.count += 1
+        return present
+
+    @property
+    def saturated(self):
+        """Whether more items were added than the filter was sized for"""
+        return self.count > self.capacity
+
+    def save(self, path):
+        """Write the filter to path, replacing any previous file atomically"""
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(self._HEADER.pack(self.MAGIC, self.num_bits, self.num_hashes, self.count,
+                                          self.capacity, self.error_rate, self.salt))
+                f.write(self._bits)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except Exception as e:
+            raise Exception(f"Failed to save Bloom filter: {str(e)}")
+
+    @classmethod
+    def load(cls, path):
+        """Read a filter written by save()"""
+        try:
+            with open(path, "rb") as f:
+                header = f.read(cls._HEADER.size)
+                magic, num_bits, num_hashes, count, capacity, error_rate, salt = cls._HEADER.unpack(header)
+                if magic != cls.MAGIC:
+                    raise ValueError("not a GenPass Bloom filter file")
+                bits = bytearray(f.read())
+        except Exception as e:
+            raise Exception(f"Failed to load Bloom filter: {str(e)}")
+        if len(bits) != (num_bits + 7) // 8:
+            raise Exception("Failed to load Bloom filter: file is truncated")
+
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.error_rate = error_rate
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.count = count
+        bloom.salt = salt
+        bloom._bits = bits
+        return bloom
+
+
+class Deduplicator:
+    """Drop repeated items from a stream using a Bloom filter
+
+    Items the filter has never seen pass straight through.  A filter hit
+    is checked exactly: first against the last `window` accepted items,
+    which are kept in memory, then with verify(item), which should return
+    True if the item really was emitted before.  Without verify, hits
+    outside the window are treated as duplicates, so a repeat can never
+    slip through; at worst a false positive is discarded.  If more than
+    max_consecutive items in a row are repeats, the source is assumed to be
+    exhausted and ValueError is raised instead of looping forever.
+    """
+
+    def __init__(self, bloom, verify=None, window=0, max_consecutive=None):
+        self.bloom = bloom
+        self.verify = verify
+        self.window = window
+        self.max_consecutive = max_consecutive
+        self.duplicates = 0
+        self.false_positives = 0
+        self._recent = deque()
+        self._recent_set = set()
+
+    def _remember(self, item):
+        if not self.window:
+            return
+        self._recent.append(item)
+        self._recent_set.add(item)
+        if len(self._recent) > self.window:
+            self._recent_set.discard(self._recent.popleft())
+
+    def _is_duplicate(self, item):
+        if item in self._recent_set:
+            return True
+        if self.verify is None:
+            return True
+        return bool(self.verify(item))
+
+    def filter(self, items):
+        """Yield the items not seen before, in order"""
+        consecutive = 0
+        for item in items:
+            if self.bloom.add(item):
+                if self._is_duplicate(item):
+                    self.duplicates += 1
+                    consecutive += 1
+                    if self.max_consecutive is not None and consecutive > self.max_consecutive:
+                        raise ValueError("Too many repeats; not enough unique values remain")
+                    continue
+                self.false_positives += 1
+            consecutive = 0
+            self._remember(item)
+            yield item
@@ -0,0 +1,218 @@
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+
+HASH_SIZES = {"sha1": 20, "ntlm": 16}
+
+
+def _md4(data):
+    """Pure-Python MD4, used when OpenSSL no longer provides it"""
+    def rotl(x, n):
+        x &= 0xFFFFFFFF
+        return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+
+    length = len(data)
+    data += b"\x80" + b"\x00" * ((55 - length) % 64) + struct.pack("<Q", length * 8)
+    a, b, c, d = 0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476
+    for offset in range(0, len(data), 64):
+        x = struct.unpack("<16I", data[offset:offset + 64])
+        aa, bb, cc, dd = a, b, c, d
+        for i in range(16):
+            k, s = i, (3, 7, 11, 19)[i % 4]
+            a, b, c, d = d, rotl(a + ((b & c) | (~b & d)) + x[k], s), b, c
+        for i in range(16):
+            k, s = (i % 4) * 4 + i // 4, (3, 5, 9, 13)[i % 4]
+            a, b, c, d = d, rotl(a + ((b & c) | (b & d) | (c & d)) + x[k] + 0x5A827999, s), b, c
+        for i in range(16):
+            k, s = (0, 8, 4, 12, 2, 10, 6, 14, 1, 9, 5, 13, 3, 11, 7, 15)[i], (3, 9, 11, 15)[i % 4]
+            a, b, c, d = d, rotl(a + (b ^ c ^ d) + x[k] + 0x6ED9EBA1, s), b, c
+        a = (a + aa) & 0xFFFFFFFF
+        b = (b + bb) & 0xFFFFFFFF
+        c = (c + cc) & 0xFFFFFFFF
+        d = (d + dd) & 0xFFFFFFFF
+    return struct.pack("<4I", a, b, c, d)
+
+
+def hash_password(password, hash_type):
+    """Digest a password the way breach corpora store it"""
+    if hash_type == "sha1":
+        return hashlib.sha1(password.encode("utf-8")).digest()
+    if hash_type == "ntlm":
+        data = password.encode("utf-16-le")
+        try:
+            return hashlib.new("md4", data).digest()
+        except ValueError:
+            return _md4(data)
+    raise ValueError(f"Unsupported hash type: {hash_type}")
+
+
+class BreachCorpus:
+    """Sorted binary file of breached-password hashes, searched via mmap
+
+    Layout: a fixed header, the sorted fixed-size digests, then a fan-out
+    table of 65537 record indices keyed by the first two digest bytes.  A
+    lookup reads two fan-out entries and binary-searches the few hundred
+    records sharing that prefix, so each check touches a handful of pages
+    however large the corpus is.
+    """
+
+    MAGIC = b"GPBRCH1\n"
+    # magic, hash type, record count, fan-out table offset
+    _HEADER = struct.Struct("<8s8sQQ")
+    FANOUT_ENTRIES = 65537
+    _FANOUT = struct.Struct(f"<{FANOUT_ENTRIES}Q")
+    # Two adjacent fan-out entries, little-endian whatever the host
+    _FANOUT_PAIR = struct.Struct("<QQ")
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = None
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, hash_type, count, fanout_offset = self._HEADER.unpack_from(self._map, 0)
+            if magic != self.MAGIC:
+                raise ValueError("not a GenPass breach corpus")
+            self.hash_type = hash_type.rstrip(b"\0").decode("ascii")
+            if self.hash_type not in HASH_SIZES:
+                raise ValueError(f"Unsupported hash type: {self.hash_type}")
+            self.record_size = HASH_SIZES[self.hash_type]
+            self.count = count
+            if fanout_offset + self._FANOUT.size > len(self._map):
+                raise ValueError("file is truncated")
+            self._fanout_offset = fanout_offset
+        except Exception as e:
+            if self._map is not None:
+                self._map.close()
+            self._file.close()
+            raise Exception(f"Failed to open breach corpus: {str(e)}")
+
+    def __len__(self):
+        return self.count
+
+    def contains_digest(self, digest):
+        """Check a raw digest of the corpus's hash type"""
+        prefix = digest[0] << 8 | digest[1]
+        lo, hi = self._FANOUT_PAIR.unpack_from(self._map, self._fanout_offset + prefix * 8)
+        size = self.record_size
+        base = self._HEADER.size
+        mm = self._map
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = base + mid * size
+            record = mm[offset:offset + size]
+            if record < digest:
+                lo = mid + 1
+            elif record > digest:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def is_breached(self, password):
+        """Check whether a plaintext password appears in the corpus"""
+        return self.contains_digest(hash_password(password, self.hash_type))
+
+    def close(self):
+        """Release the memory map and file handle"""
+        try:
+            self._map.close()
+        finally:
+            self._file.close()
+
+
+def _parse_hash_line(line, hex_length):
+    # Dumps hold "HASH" or "HASH:count" per line (e.g. Have I Been Pwned)
+    text = line.split(b":", 1)[0].strip()
+    if len(text) != hex_length:
+        return None
+    try:
+        return bytes.fromhex(text.decode("ascii"))
+    except ValueError:
+        return None
+
+
+def _iter_records(path, size):
+    with open(path, "rb") as f:
+        while True:
+            record = f.read(size)
+            if len(record) < size:
+                return
+            yield record
+
+
+def build_corpus(input_paths, output_path, hash_type="sha1", run_size=5000000, progress=None):
+    """Convert text hash dumps into a BreachCorpus file
+
+    Lines are parsed in runs of run_size hashes, each run sorted and spilled
+    to a temporary file, and the runs merged with duplicates dropped, so
+    memory stays bounded by run_size however large the dumps are.
+    progress, if given, is called with the number of lines read so far.
+    Returns the number of distinct hashes written.
+    """
+    if hash_type not in HASH_SIZES:
+        raise ValueError(f"Unsupported hash type: {hash_type}")
+    size = HASH_SIZES[hash_type]
+    hex_length = size * 2
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+
+    with tempfile.TemporaryDirectory(dir=out_dir) as work_dir:
+        runs = []
+        run = []
+        lines = 0
+
+        def spill():
+            run.sort()
+            run_path = os.path.join(work_dir, f"run{len(runs)}")
+            with open(run_path, "wb") as f:
+                f.write(b"".join(run))
+            runs.append(run_path)
+            run.clear()
+
+        for path in input_paths:
+            with open(path, "rb") as f:
+                for line in f:
+                    digest = _parse_hash_line(line, hex_length)
+                    if digest is not None:
+                        run.append(digest)
+                        if len(run) >= run_size:
+                            spill()
+                    lines += 1
+                    if progress and lines % 1000000 == 0:
+                        progress(lines)
+        if run or not runs:
+            spill()
+
+        header = BreachCorpus._HEADER
+        fanout = [0] * BreachCorpus.FANOUT_ENTRIES
+        count = 0
+        temp_path = f"{output_path}.tmp"
+        try:
+            with open(temp_path, "wb") as out:
+                out.write(b"\0" * header.size)
+                previous = None
+                for record in heapq.merge(*(_iter_records(path, size) for path in runs)):
+                    if record == previous:
+                        continue
+                    out.write(record)
+                    fanout[(record[0] << 8 | record[1]) + 1] += 1
+                    previous = record
+                    count += 1
+
+                for i in range(1, len(fanout)):
+                    fanout[i] += fanout[i - 1]
+                fanout_offset = header.size + count * size
+                out.write(BreachCorpus._FANOUT.pack(*fanout))
+                out.seek(0)
+                out.write(header.pack(BreachCorpus.MAGIC, hash_type.encode("ascii"), count,
+                                      fanout_offset))
+            os.replace(temp_path, output_path)
+        except BaseException:
+            # Interrupted or failed (e.g. disk full): leave no partial corpus
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return count
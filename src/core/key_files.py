@@ -0,0 +1,48 @@
+import base64
+import os
+from cryptography.fernet import Fernet, MultiFernet
+from .write_coordinator import atomic_write
+
+KEY_FILE = "encryption.key"
+# Present only while a rotation is in progress
+NEXT_KEY_FILE = "encryption.key.next"
+
+
+def read_key(path):
+    """Read a key file (a base64-encoded Fernet key), or None if missing"""
+    try:
+        with open(path, "rb") as f:
+            return base64.urlsafe_b64decode(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def write_key(path, key):
+    """Atomically write a key file (created readable only by its owner)"""
+    atomic_write(path, base64.urlsafe_b64encode(key))
+
+
+def load_keys(data_dir):
+    """Keys to accept, newest first: the rotation target, then the current key"""
+    keys = []
+    for name in (NEXT_KEY_FILE, KEY_FILE):
+        key = read_key(os.path.join(data_dir, name))
+        if key is not None and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def key_files_signature(data_dir):
+    """Cheap fingerprint of the key files, to notice another process rotating"""
+    signature = []
+    for name in (NEXT_KEY_FILE, KEY_FILE):
+        try:
+            stat = os.stat(os.path.join(data_dir, name))
+            signature.append((stat.st_ino, stat.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def build_cipher(keys):
+    return MultiFernet([Fernet(key) for key in keys])
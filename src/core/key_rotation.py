@@ -0,0 +1,159 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from cryptography.fernet import Fernet, InvalidToken
+from .key_files import KEY_FILE, NEXT_KEY_FILE, build_cipher, load_keys, read_key, write_key
+from .password_history import create_history
+from .sync_journal import rotate_tombstones, tombstone_usernames
+from .vault_backends import create_backend
+from .write_coordinator import atomic_write
+
+STATE_FILE = "key_rotation.json"
+
+
+def rotate_vault(data_dir, settings, keys, username):
+    """Re-encrypt one user's vault, password history and tombstones under keys[0]
+
+    Returns the entry count.  Runs in a worker process, with its own
+    backend.  Entries are re-encrypted without holding the vault lock, then
+    compared with the vault and written under its exclusive lock, so
+    entries changed by someone else in the meantime are left alone.
+    Backends that encrypt whole vaults are simply re-sealed with an empty
+    put_many().  Other processes commit under keys[0] from now on, but one
+    may already have committed under the old key; sweep_vault() catches
+    that before the old key is dropped.
+    """
+    cipher = build_cipher(keys)
+    history = create_history(settings, data_dir, cipher)
+    try:
+        history.rotate(username)
+    finally:
+        history.close()
+    # The write must happen while the lock is held, not in a later batch
+    backend = create_backend(dict(settings, vault_durability="commit", group_commit_window_ms=0),
+                             data_dir, keys=keys)
+    try:
+        rotate_tombstones(backend, username, cipher)
+        if backend.encrypts:
+            count = len(backend.list_metadata(username))
+            if os.path.exists(backend.path(username)):
+                backend.put_many(username, [])
+            return count
+        rotated = []
+        for entry in backend.list_entries(username):
+            token = cipher.rotate(entry["password"].encode()).decode()
+            rotated.append((entry, dict(entry, password=token)))
+        with backend.lock(username).exclusive():
+            current = [new for old, new in rotated if backend.get(username, old["site"]) == old]
+            if current:
+                backend.put_many(username, current)
+        return len(rotated)
+    finally:
+        backend.close()
+
+
+def sweep_vault(data_dir, settings, keys, username):
+    """Re-encrypt whatever of one user's data keys[0] alone cannot open
+
+    Run after rotate_vault(), with the old key still in the key files.
+    Under the vault and history locks, entries still under an older key are
+    re-encrypted (sealed vaults are re-sealed), as are the history and
+    tombstones.  Any later writer sees the new key before it commits.
+    """
+    cipher = build_cipher(keys)
+    current = Fernet(keys[0])
+    history = create_history(settings, data_dir, cipher)
+    backend = create_backend(dict(settings, vault_durability="commit", group_commit_window_ms=0),
+                             data_dir, keys=keys)
+    try:
+        with backend.lock(username).exclusive(), history.lock(username).exclusive():
+            history.rotate(username)
+            rotate_tombstones(backend, username, cipher)
+            if backend.encrypts:
+                if os.path.exists(backend.path(username)):
+                    backend.put_many(username, [])
+                return
+            stale = []
+            for entry in backend.list_entries(username):
+                try:
+                    current.decrypt(entry["password"].encode())
+                except InvalidToken:
+                    stale.append(dict(entry, password=cipher.rotate(entry["password"].encode()).decode()))
+            if stale:
+                backend.put_many(username, stale)
+    finally:
+        backend.close()
+        history.close()
+
+
+def _load_state(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"done": []}
+
+
+def rotate_keys(data_dir, settings, workers=1, progress=None):
+    """Re-encrypt every vault in data_dir under a fresh key
+
+    A new key is written to encryption.key.next first; from then on
+    StorageManager encrypts with it and decrypts with either key, so the
+    app keeps working during rotation.  Vaults are re-encrypted in
+    parallel, one per worker process, and each finished user is recorded in
+    key_rotation.json, so running this again after an interruption resumes
+    where it stopped.  Finally each user's data is swept under its locks
+    for anything another process committed under the old key meanwhile
+    (see sweep_vault()), and the new key replaces encryption.key.
+    progress, if given, is called with (username, entries, done, total).
+    Returns the number of vaults rotated in this run.
+    """
+    key_path = os.path.join(data_dir, KEY_FILE)
+    next_path = os.path.join(data_dir, NEXT_KEY_FILE)
+    state_path = os.path.join(data_dir, STATE_FILE)
+    if read_key(key_path) is None:
+        raise ValueError(f"No key to rotate in {data_dir}")
+
+    if read_key(next_path) is None:
+        write_key(next_path, Fernet.generate_key())
+        atomic_write(state_path, json.dumps({"done": []}).encode())
+    state = _load_state(state_path)
+    keys = load_keys(data_dir)
+
+    backend = create_backend(settings, data_dir, keys=keys)
+    history = create_history(settings, data_dir)
+    try:
+        # Users whose entries were all deleted may still have a history or tombstones
+        usernames = sorted(set(backend.usernames()) | set(history.usernames())
+                           | tombstone_usernames(data_dir))
+    finally:
+        history.close()
+        backend.close()
+    pending = [username for username in usernames if username not in state["done"]]
+    done = len(usernames) - len(pending)
+
+    def finished(username, entries):
+        nonlocal done
+        done += 1
+        state["done"].append(username)
+        atomic_write(state_path, json.dumps(state).encode())
+        if progress:
+            progress(username, entries, done, len(usernames))
+
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(rotate_vault, data_dir, settings, keys, username): username
+                       for username in pending}
+            for future in as_completed(futures):
+                finished(futures[future], future.result())
+    else:
+        for username in pending:
+            finished(username, rotate_vault(data_dir, settings, keys, username))
+
+    for username in usernames:
+        sweep_vault(data_dir, settings, keys, username)
+    # Every vault is readable with the new key alone; make it the only key
+    write_key(key_path, keys[0])
+    os.remove(next_path)
+    os.remove(state_path)
+    return len(pending)
@@ -0,0 +1,160 @@
+import array
+import os
+import secrets
+import string
+import struct
+from bisect import bisect_right
+from functools import lru_cache
+from .passphrase_generator import WordlistIndex, DEFAULT_WORDLIST
+
+
+class MarkovModel:
+    """Character n-gram model stored as flat cumulative-frequency tables
+
+    Symbol 0 marks a word boundary and symbols 1..n are the alphabet.  The
+    context is the last `order` symbols read as a base-(n + 1) number, and
+    row `context` of `cumulative` holds running totals of next-symbol
+    frequencies scaled to SCALE, so sampling is one bisect over a slice of
+    a flat array('I') with a 16-bit random number.  No per-context dicts or
+    lists exist at runtime.
+    """
+
+    MAGIC = b"GPMARKV1"
+    SCALE = 1 << 16
+    _HEADER = struct.Struct("<8sBB")
+
+    def __init__(self, order, alphabet, cumulative):
+        self.order = order
+        self.alphabet = alphabet
+        self.symbols = len(alphabet) + 1
+        self.contexts = self.symbols ** order
+        self.cumulative = cumulative
+        # Symbol -> character, with the boundary mapped to ''
+        self._chars = ("",) + tuple(alphabet)
+
+    @classmethod
+    def train(cls, words, order=2, alphabet=string.ascii_lowercase):
+        """Count n-gram transitions over words and build the tables"""
+        if order not in (1, 2, 3):
+            raise ValueError("Order must be 1, 2 or 3")
+        symbol_of = {c: i + 1 for i, c in enumerate(alphabet)}
+        symbols = len(alphabet) + 1
+        contexts = symbols ** order
+        counts = array.array("I", bytes(4 * contexts * symbols))
+
+        for word in words:
+            coded = [symbol_of[c] for c in word.lower() if c in symbol_of]
+            if not coded:
+                continue
+            context = 0
+            for symbol in coded + [0]:
+                counts[context * symbols + symbol] += 1
+                context = (context * symbols + symbol) % contexts
+
+        cumulative = array.array("I", bytes(4 * contexts * symbols))
+        for context in range(contexts):
+            row = counts[context * symbols:(context + 1) * symbols]
+            total = sum(row)
+            if not total:
+                continue
+            # Every observed transition keeps at least one unit of the scale
+            scaled = [max(1, c * cls.SCALE // total) if c else 0 for c in row]
+            largest = max(range(symbols), key=scaled.__getitem__)
+            scaled[largest] += cls.SCALE - sum(scaled)
+            running = 0
+            for symbol, value in enumerate(scaled):
+                running += value
+                cumulative[context * symbols + symbol] = running
+        return cls(order, alphabet, cumulative)
+
+    def save(self, path):
+        """Write the model to path"""
+        alphabet = self.alphabet.encode("ascii")
+        with open(path, "wb") as f:
+            f.write(self._HEADER.pack(self.MAGIC, self.order, len(alphabet)))
+            f.write(alphabet)
+            f.write(self.cumulative.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """Read a model written by save()"""
+        with open(path, "rb") as f:
+            magic, order, alphabet_length = cls._HEADER.unpack(f.read(cls._HEADER.size))
+            if magic != cls.MAGIC:
+                raise ValueError("not a GenPass Markov model file")
+            alphabet = f.read(alphabet_length).decode("ascii")
+            cumulative = array.array("I")
+            cumulative.frombytes(f.read())
+        model = cls(order, alphabet, cumulative)
+        if len(cumulative) != model.contexts * model.symbols:
+            raise ValueError("Markov model file is truncated")
+        return model
+
+    def iter_words(self, count, length, block_size=65536):
+        """Yield count strings of exactly length characters from the model
+
+        When the model ends a word the context resets and a new word-like
+        run starts, so output of any length stays pronounceable.
+        """
+        cumulative = self.cumulative
+        symbols = self.symbols
+        contexts = self.contexts
+        chars = self._chars
+        if count <= 0 or length <= 0:
+            yield from [""] * max(count, 0)
+            return
+
+        produced = 0
+        out = []
+        remaining = length
+        context = 0
+        for value in _iter_random_words(block_size):
+            base = context * symbols
+            symbol = bisect_right(cumulative, value, base, base + symbols) - base
+            if not symbol:
+                context = 0
+                continue
+            out.append(chars[symbol])
+            context = (context * symbols + symbol) % contexts
+            remaining -= 1
+            if not remaining:
+                yield "".join(out)
+                produced += 1
+                if produced == count:
+                    return
+                out = []
+                remaining = length
+                context = 0
+
+
+def _iter_random_words(block_size):
+    """Endless stream of uniform 16-bit integers read in bulk"""
+    while True:
+        yield from array.array("H", secrets.token_bytes(2 * block_size))
+
+
+@lru_cache(maxsize=None)
+def load_default_model(order=2):
+    """Load the model trained on the bundled wordlist, training it if needed
+
+    The trained tables are cached next to the wordlist, so training only
+    happens once per install.
+    """
+    cache_path = f"{DEFAULT_WORDLIST}.markov{order}"
+    try:
+        if os.path.getmtime(cache_path) >= os.path.getmtime(DEFAULT_WORDLIST):
+            return MarkovModel.load(cache_path)
+    except (OSError, ValueError, struct.error):
+        pass
+
+    wordlist = WordlistIndex(DEFAULT_WORDLIST)
+    try:
+        model = MarkovModel.train((wordlist[i] for i in range(len(wordlist))), order)
+    finally:
+        wordlist.close()
+    try:
+        model.save(cache_path)
+    except OSError:
+        # Read-only install location; retrain on the next start
+        pass
+    return model
@@ -0,0 +1,62 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+
+def resolve_pool_args(workers, chunk_size):
+    """Validate worker and chunk counts, defaulting workers to the CPU count"""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not isinstance(workers, int) or workers <= 0:
+        raise ValueError("Workers must be a positive integer")
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        raise ValueError("Chunk size must be a positive integer")
+    return workers, chunk_size
+
+
+def iter_chunked(task, args, count, workers, ordered, chunk_size):
+    """Yield the results of task(size, *args) run over a process pool
+
+    count items are cut into chunks of at most chunk_size; task must be a
+    picklable callable returning a list of size items.  With ordered=True
+    chunks are yielded in submission order, otherwise as soon as each one
+    finishes.  At most two chunks per worker are in flight, so memory stays
+    bounded for any count.
+    """
+    chunk_sizes = (min(chunk_size, count - start) for start in range(0, count, chunk_size))
+    max_in_flight = workers * 2
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        def submit_next(pending):
+            size = next(chunk_sizes, None)
+            if size is None:
+                return False
+            future = executor.submit(task, size, *args)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+            return True
+
+        if ordered:
+            pending = deque()
+            while len(pending) < max_in_flight and submit_next(pending):
+                pass
+            while pending:
+                batch = pending.popleft().result()
+                submit_next(pending)
+                yield from batch
+        else:
+            pending = set()
+            while len(pending) < max_in_flight and submit_next(pending):
+                pass
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    submit_next(pending)
+                for future in done:
+                    yield from future.result()
+    finally:
+        # Drop queued chunks if the consumer stopped iterating early
+        executor.shutdown(wait=True, cancel_futures=True)
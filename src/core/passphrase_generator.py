@@ -0,0 +1,235 @@
+import array
+import hashlib
+import math
+import mmap
+import os
+import re
+import secrets
+import struct
+from functools import lru_cache
+from .parallel import resolve_pool_args, iter_chunked
+from .write_coordinator import atomic_write
+
+DEFAULT_WORDLIST = os.path.join(os.path.dirname(__file__), "wordlists", "eff_large_wordlist.txt")
+
+
+class WordlistIndex:
+    """Memory-mapped wordlist with a precomputed offset index
+
+    The wordlist stays on disk behind an mmap; only an array of (start, end)
+    byte offsets is held in memory, so looking up word i is a single slice.
+    The offsets are saved in the user's cache directory and reused for as
+    long as the list's size and mtime match, so later startups never scan
+    the list.  An index whose length disagrees with its word count, or
+    whose offsets run past the list, is rebuilt.  Both plain
+    one-word-per-line files and diceware files ("11111<TAB>word") are
+    accepted.
+    """
+
+    INDEX_MAGIC = b"GPWIDX2\n"
+    # magic, wordlist size, wordlist mtime, word count
+    _HEADER = struct.Struct("<8sQQQ")
+    _WORD_PATTERN = re.compile(rb"^(?:[1-6]+[ \t]+)?(\S+)[ \t\r]*$", re.M)
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            stat = os.fstat(self._file.fileno())
+            if stat.st_size == 0:
+                raise ValueError(f"Wordlist is empty: {path}")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._offsets = self._load_or_build_index(stat)
+        except Exception:
+            self._file.close()
+            raise
+        if not self._offsets:
+            self.close()
+            raise ValueError(f"Wordlist contains no words: {path}")
+
+    def __len__(self):
+        return len(self._offsets) // 2
+
+    def __getitem__(self, index):
+        offsets = self._offsets
+        return self._map[offsets[2 * index]:offsets[2 * index + 1]].decode("utf-8")
+
+    @staticmethod
+    def index_path(path):
+        """Where the offset index of the wordlist at path is cached"""
+        cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        name = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(cache_dir, "genpass", f"wordlist-{name}.idx")
+
+    def _load_index(self, index_file, stat):
+        """The cached offsets, or None if missing, stale or damaged"""
+        try:
+            with open(index_file, "rb") as f:
+                magic, size, mtime_ns, words = self._HEADER.unpack(f.read(self._HEADER.size))
+                if (magic != self.INDEX_MAGIC or size != stat.st_size
+                        or mtime_ns != stat.st_mtime_ns):
+                    return None
+                payload = f.read()
+        except (OSError, struct.error):
+            return None
+        offsets = array.array("Q")
+        if words == 0 or len(payload) != words * 2 * offsets.itemsize:
+            return None
+        offsets.frombytes(payload)
+        if offsets[-1] > len(self._map) or offsets[-2] > offsets[-1]:
+            return None
+        return offsets
+
+    def _load_or_build_index(self, stat):
+        index_file = self.index_path(self.path)
+        offsets = self._load_index(index_file, stat)
+        if offsets is not None:
+            return offsets
+
+        offsets = array.array("Q")
+        for match in self._WORD_PATTERN.finditer(self._map):
+            offsets.append(match.start(1))
+            offsets.append(match.end(1))
+
+        try:
+            os.makedirs(os.path.dirname(index_file), mode=0o700, exist_ok=True)
+            header = self._HEADER.pack(self.INDEX_MAGIC, stat.st_size, stat.st_mtime_ns,
+                                       len(offsets) // 2)
+            # A cache: a crash only costs a rebuild, which the checks above catch
+            atomic_write(index_file, [header, offsets.tobytes()], fsync=False)
+        except OSError:
+            # No writable cache directory; rebuild the index on every start
+            pass
+        return offsets
+
+    def close(self):
+        """Release the memory map and file handle"""
+        try:
+            self._map.close()
+        except Exception:
+            pass
+        self._file.close()
+
+
+def random_indices(bound, count):
+    """Draw count uniform integers in [0, bound) from bulk OS entropy"""
+    for typecode in ("B", "H", "I", "L", "Q"):
+        width = array.array(typecode).itemsize
+        if bound <= 1 << (8 * width):
+            break
+    else:
+        raise ValueError("Bound is too large")
+
+    span = 1 << (8 * width)
+    limit = span - span % bound
+    values = []
+    while len(values) < count:
+        raw = array.array(typecode, secrets.token_bytes((count - len(values)) * width + 8 * width))
+        values.extend(v % bound for v in raw if v < limit)
+    del values[count:]
+    return values
+
+
+@lru_cache(maxsize=None)
+def _open_wordlist(path):
+    return WordlistIndex(path)
+
+
+class PassphraseGenerator:
+    """Diceware-style passphrases built from a memory-mapped wordlist"""
+
+    DEFAULT_WORDS = 6
+    DEFAULT_SEPARATOR = "-"
+
+    # Passphrases whose random indices are drawn in one entropy read
+    BATCH_BLOCK_SIZE = 4096
+
+    # Passphrases generated per task in parallel mode
+    PARALLEL_CHUNK_SIZE = 20000
+
+    def __init__(self, wordlist_path=None):
+        self.wordlist_path = os.path.abspath(wordlist_path or DEFAULT_WORDLIST)
+        try:
+            self.wordlist = _open_wordlist(self.wordlist_path)
+        except OSError as e:
+            raise Exception(f"Failed to open wordlist: {str(e)}")
+
+    def generate_passphrase(self, words=DEFAULT_WORDS, separator=DEFAULT_SEPARATOR,
+                            capitalize=False, add_digit=False):
+        """Generate one passphrase"""
+        return next(self.iter_passphrases(1, words, separator, capitalize, add_digit))
+
+    def generate_passphrases(self, count, words=DEFAULT_WORDS, separator=DEFAULT_SEPARATOR,
+                             capitalize=False, add_digit=False, workers=None):
+        """Generate a list of passphrases, across processes when workers > 1"""
+        if workers is not None and workers > 1:
+            return list(self.iter_passphrases_parallel(
+                count, words, separator, capitalize, add_digit, workers=workers))
+        return list(self.iter_passphrases(count, words, separator, capitalize, add_digit))
+
+    def iter_passphrases(self, count, words=DEFAULT_WORDS, separator=DEFAULT_SEPARATOR,
+                         capitalize=False, add_digit=False):
+        """Lazily yield passphrases
+
+        Word indices for a whole block of passphrases are drawn in a single
+        entropy read.  With add_digit, one random digit is appended to one
+        randomly chosen word of each passphrase.
+        """
+        self._validate_args(count, words, separator)
+        return self._iter_passphrases(count, words, separator, capitalize, add_digit)
+
+    def _iter_passphrases(self, count, words, separator, capitalize, add_digit):
+        wordlist = self.wordlist
+        size = len(wordlist)
+        produced = 0
+        while produced < count:
+            block = min(count - produced, self.BATCH_BLOCK_SIZE)
+            indices = random_indices(size, block * words)
+            if add_digit:
+                positions = random_indices(words, block)
+                digits = random_indices(10, block)
+
+            for n in range(block):
+                chosen = [wordlist[i] for i in indices[n * words:(n + 1) * words]]
+                if capitalize:
+                    chosen = [word.capitalize() for word in chosen]
+                if add_digit:
+                    chosen[positions[n]] += str(digits[n])
+                yield separator.join(chosen)
+            produced += block
+
+    def iter_passphrases_parallel(self, count, words=DEFAULT_WORDS, separator=DEFAULT_SEPARATOR,
+                                  capitalize=False, add_digit=False, workers=None,
+                                  ordered=True, chunk_size=None):
+        """Lazily yield passphrases generated across a process pool
+
+        Each worker maps the wordlist itself, so only chunk sizes and
+        finished passphrases cross the process boundary.
+        """
+        self._validate_args(count, words, separator)
+        workers, chunk_size = resolve_pool_args(workers, chunk_size or self.PARALLEL_CHUNK_SIZE)
+        return iter_chunked(_generate_chunk,
+                            (self.wordlist_path, words, separator, capitalize, add_digit),
+                            count, workers, ordered, chunk_size)
+
+    def entropy_bits(self, words=DEFAULT_WORDS, add_digit=False):
+        """Entropy of a passphrase, in bits, for the loaded wordlist"""
+        bits = words * math.log2(len(self.wordlist))
+        if add_digit:
+            bits += math.log2(words * 10)
+        return bits
+
+    @staticmethod
+    def _validate_args(count, words, separator):
+        if not isinstance(count, int) or count < 0:
+            raise ValueError("Count must be a non-negative integer")
+        if not isinstance(words, int) or words <= 0 or words > 64:
+            raise ValueError("Word count must be between 1 and 64")
+        if not isinstance(separator, str):
+            raise ValueError("Separator must be a string")
+
+
+def _generate_chunk(size, wordlist_path, words, separator, capitalize, add_digit):
+    # Runs in a worker process; the wordlist is mapped once per process
+    return PassphraseGenerator(wordlist_path).generate_passphrases(
+        size, words, separator, capitalize, add_digit)
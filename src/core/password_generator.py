@@ -1,9 +1,25 @@
-import random
+import secrets
 import string
-import re
+from .parallel import resolve_pool_args, iter_chunked
+from .pattern_generator import compile_pattern
+from .markov_model import load_default_model
+from .passphrase_generator import random_indices
+from .password_policy import PasswordPolicy, DEFAULT_SYMBOLS, build_sampling_table
 
 class PasswordGenerator:
-    SYMBOLS = "!@#$%^&*(),.?\":{}|<>"
+    SYMBOLS = DEFAULT_SYMBOLS
+
+    # Upper bound on a single read from the OS entropy source in batch mode
+    ENTROPY_BLOCK_SIZE = 64 * 1024
+
+    # Passwords generated per task in parallel mode
+    PARALLEL_CHUNK_SIZE = 50000
+
+    # Character class codes used to check batch candidates without regex
+    _CLASS_TABLE = bytes.maketrans(
+        (string.ascii_lowercase + string.ascii_uppercase + string.digits + SYMBOLS).encode('ascii'),
+        b'l' * 26 + b'u' * 26 + b'd' * 10 + b's' * len(SYMBOLS)
+    )
 
     @staticmethod
     def generate_password(length, strength_choice):
@@ -12,56 +28,206 @@ class PasswordGenerator:
         if strength_choice not in [1, 2, 3, 4]:
             raise ValueError("Invalid strength choice")
 
-        password = []
-        lowercase = string.ascii_lowercase
-        uppercase = string.ascii_uppercase
-        digits = string.digits
-        
-        # Add required characters based on strength
-        if strength_choice >= 1:
-            password.append(random.choice(lowercase))
-        if strength_choice >= 2:
-            password.append(random.choice(uppercase))
-        if strength_choice >= 3:
-            password.append(random.choice(digits))
-        if strength_choice == 4:
-            password.append(random.choice(PasswordGenerator.SYMBOLS))
+        return PasswordPolicy.from_strength(strength_choice).generate(length)
 
-        # Build available character set
-        available_chars = lowercase
-        if strength_choice >= 2:
-            available_chars += uppercase
-        if strength_choice >= 3:
-            available_chars += digits
-        if strength_choice == 4:
-            available_chars += PasswordGenerator.SYMBOLS
+    @staticmethod
+    def generate_pattern_password(template):
+        """Generate a password from a template such as "Cvcc-9999-Cvcc"
 
-        # Fill remaining length
-        while len(password) < length:
-            password.append(random.choice(available_chars))
+        See compile_pattern() for the template syntax.  Templates are parsed
+        once and cached.
+        """
+        return compile_pattern(template).generate()
 
-        random.shuffle(password)
-        final_password = ''.join(password)
+    @staticmethod
+    def generate_pattern_passwords(count, template, workers=None):
+        """Generate a list of passwords from a template"""
+        if workers is not None and workers > 1:
+            return list(PasswordGenerator.iter_pattern_passwords_parallel(
+                count, template, workers=workers))
+        return list(PasswordGenerator.iter_pattern_passwords(count, template))
 
-        if not PasswordGenerator._validate_password_requirements(final_password, strength_choice):
-            return PasswordGenerator.generate_password(length, strength_choice)
+    @staticmethod
+    def iter_pattern_passwords(count, template):
+        """Lazily yield passwords from a template, sampled in bulk per slot"""
+        if not isinstance(count, int) or count < 0:
+            raise ValueError("Count must be a non-negative integer")
+        return compile_pattern(template).iter_generate(count)
 
-        return final_password
+    @staticmethod
+    def iter_pattern_passwords_parallel(count, template, workers=None, ordered=True,
+                                        chunk_size=None):
+        """Lazily yield template passwords generated across a process pool"""
+        if not isinstance(count, int) or count < 0:
+            raise ValueError("Count must be a non-negative integer")
+        compile_pattern(template)
+        workers, chunk_size = resolve_pool_args(
+            workers, chunk_size or PasswordGenerator.PARALLEL_CHUNK_SIZE)
+        return iter_chunked(PasswordGenerator.generate_pattern_passwords, (template,),
+                            count, workers, ordered, chunk_size)
 
     @staticmethod
-    def _validate_password_requirements(password, strength_choice):
-        has_lower = bool(re.search(r'[a-z]', password))
-        has_upper = bool(re.search(r'[A-Z]', password))
-        has_digit = bool(re.search(r'\d', password))
-        has_symbol = bool(re.search(r'[!@#$%^&*(),.?":{}|<>]', password))
+    def pattern_entropy(template):
+        """Exact entropy in bits of passwords generated from a template"""
+        return compile_pattern(template).entropy_bits
 
-        if strength_choice >= 1 and not has_lower:
-            return False
-        if strength_choice >= 2 and not (has_lower and has_upper):
-            return False
-        if strength_choice >= 3 and not (has_lower and has_upper and has_digit):
-            return False
-        if strength_choice >= 4 and not (has_lower and has_upper and has_digit and has_symbol):
-            return False
+    @staticmethod
+    def generate_pronounceable(length, strength_choice=1):
+        """Generate one pronounceable password"""
+        return next(PasswordGenerator.iter_pronounceable(1, length, strength_choice))
+
+    @staticmethod
+    def generate_pronounceable_passwords(count, length, strength_choice=1, workers=None):
+        """Generate a list of pronounceable passwords"""
+        if workers is not None and workers > 1:
+            return list(PasswordGenerator.iter_pronounceable_parallel(
+                count, length, strength_choice, workers=workers))
+        return list(PasswordGenerator.iter_pronounceable(count, length, strength_choice))
+
+    @staticmethod
+    def iter_pronounceable(count, length, strength_choice=1):
+        """Lazily yield pronounceable passwords from the Markov model
+
+        Letters come from a character-trigram model trained on the bundled
+        wordlist.  Strength 2 capitalises one random letter, strength 3 also
+        inserts a digit and strength 4 a symbol, each at a random position,
+        so every strength level's character classes are present.
+        """
+        PasswordGenerator._validate_batch_args(count, length, strength_choice)
+        return PasswordGenerator._iter_pronounceable(count, length, strength_choice)
+
+    @staticmethod
+    def _iter_pronounceable(count, length, strength_choice):
+        extras = (strength_choice >= 3) + (strength_choice == 4)
+        letters = length - extras
+        words = load_default_model().iter_words(count, letters)
+        if strength_choice == 1:
+            yield from words
+            return
+
+        block_size = 4096
+        produced = 0
+        while produced < count:
+            block = min(count - produced, block_size)
+            capitals = random_indices(letters, block)
+            if strength_choice >= 3:
+                digits = random_indices(10, block)
+                digit_positions = random_indices(letters + 1, block)
+            if strength_choice == 4:
+                symbols = random_indices(len(PasswordGenerator.SYMBOLS), block)
+                symbol_positions = random_indices(letters + 2, block)
+
+            for n, word in zip(range(block), words):
+                i = capitals[n]
+                word = word[:i] + word[i].upper() + word[i + 1:]
+                if strength_choice >= 3:
+                    i = digit_positions[n]
+                    word = word[:i] + string.digits[digits[n]] + word[i:]
+                if strength_choice == 4:
+                    i = symbol_positions[n]
+                    word = word[:i] + PasswordGenerator.SYMBOLS[symbols[n]] + word[i:]
+                yield word
+            produced += block
+
+    @staticmethod
+    def iter_pronounceable_parallel(count, length, strength_choice=1, workers=None,
+                                    ordered=True, chunk_size=None):
+        """Lazily yield pronounceable passwords generated across a process pool"""
+        PasswordGenerator._validate_batch_args(count, length, strength_choice)
+        workers, chunk_size = resolve_pool_args(
+            workers, chunk_size or PasswordGenerator.PARALLEL_CHUNK_SIZE)
+        return iter_chunked(PasswordGenerator.generate_pronounceable_passwords,
+                            (length, strength_choice), count, workers, ordered, chunk_size)
 
-        return True
\ No newline at end of file
+    @staticmethod
+    def generate_passwords(count, length, strength_choice, workers=None):
+        """Generate a list of passwords drawn from bulk OS entropy
+
+        With workers > 1 the batch is split across that many processes.
+        """
+        if workers is not None and workers > 1:
+            return list(PasswordGenerator.iter_passwords_parallel(
+                count, length, strength_choice, workers=workers))
+        return list(PasswordGenerator.iter_passwords(count, length, strength_choice))
+
+    @staticmethod
+    def iter_passwords_parallel(count, length, strength_choice, workers=None,
+                                ordered=True, chunk_size=None):
+        """Lazily yield passwords generated across a process pool
+
+        The batch is cut into chunks of chunk_size passwords, each produced by
+        generate_passwords() in a worker process.  Every worker reads its own
+        entropy straight from the OS, so no generator state is shared or
+        forked.  With ordered=True chunks are yielded in submission order,
+        otherwise as soon as each one finishes.
+        """
+        PasswordGenerator._validate_batch_args(count, length, strength_choice)
+        workers, chunk_size = resolve_pool_args(
+            workers, chunk_size or PasswordGenerator.PARALLEL_CHUNK_SIZE)
+        return iter_chunked(PasswordGenerator.generate_passwords, (length, strength_choice),
+                            count, workers, ordered, chunk_size)
+
+    @staticmethod
+    def iter_passwords(count, length, strength_choice):
+        """Lazily yield passwords drawn from bulk OS entropy
+
+        Random bytes are read in large blocks and mapped onto the character
+        set with a single bytes.translate() call.  Bytes that would bias the
+        mapping are deleted rather than wrapped (rejection sampling), and
+        candidates missing a required character class are discarded, so
+        every password is uniform over all valid passwords.  Arguments are
+        validated eagerly, before the first password is requested.
+        """
+        PasswordGenerator._validate_batch_args(count, length, strength_choice)
+        return PasswordGenerator._iter_passwords(count, length, strength_choice)
+
+    @staticmethod
+    def _iter_passwords(count, length, strength_choice):
+        charset = PasswordGenerator._get_charset(strength_choice)
+        table, rejected = build_sampling_table(charset)
+        class_table = PasswordGenerator._CLASS_TABLE
+
+        produced = 0
+        pending = b''
+        while produced < count:
+            # Ask for roughly what the remaining passwords need, with headroom
+            # for rejected bytes and rejected candidates
+            wanted = (count - produced) * length * 2 + 64
+            block = secrets.token_bytes(min(wanted, PasswordGenerator.ENTROPY_BLOCK_SIZE))
+            pending += block.translate(table, rejected)
+
+            usable = len(pending) - len(pending) % length
+            text = pending[:usable].decode('ascii')
+            offsets = range(0, usable, length)
+            if strength_choice > 1:
+                # The charset only holds the required classes, so a candidate
+                # is valid exactly when it shows every one of them
+                marks = pending[:usable].translate(class_table)
+                offsets = [i for i in offsets if len(set(marks[i:i + length])) == strength_choice]
+            pending = pending[usable:]
+
+            batch = [text[i:i + length] for i in offsets[:count - produced]]
+            produced += len(batch)
+            yield from batch
+
+    @staticmethod
+    def _validate_batch_args(count, length, strength_choice):
+        if not isinstance(count, int) or count < 0:
+            raise ValueError("Count must be a non-negative integer")
+        if not isinstance(length, int) or length <= 0 or length > 128:
+            raise ValueError("Length must be between 1 and 128")
+        if strength_choice not in [1, 2, 3, 4]:
+            raise ValueError("Invalid strength choice")
+        if length < strength_choice:
+            raise ValueError("Length is too short for the selected strength")
+
+    @staticmethod
+    def _get_charset(strength_choice):
+        charset = string.ascii_lowercase
+        if strength_choice >= 2:
+            charset += string.ascii_uppercase
+        if strength_choice >= 3:
+            charset += string.digits
+        if strength_choice == 4:
+            charset += PasswordGenerator.SYMBOLS
+        return charset
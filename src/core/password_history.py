@@ -0,0 +1,293 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from cryptography.fernet import InvalidToken
+from .key_files import build_cipher, key_files_signature, load_keys
+from .vault_lock import VaultLock
+from .write_coordinator import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class _HistoryState:
+    """Replayed view of one user's history file"""
+
+    def __init__(self, max_versions):
+        # site -> deque of (token, replaced_at), oldest first
+        self.sites = {}
+        self.max_versions = max_versions
+        self.inode = None
+        # End of the last complete record
+        self.offset = 0
+        self.records = 0
+
+    def add(self, site, token, replaced_at):
+        versions = self.sites.get(site)
+        if versions is None:
+            versions = self.sites[site] = deque(maxlen=self.max_versions)
+        versions.append((token, replaced_at))
+
+    @property
+    def live(self):
+        return sum(map(len, self.sites.values()))
+
+
+class PasswordHistory:
+    """Previous passwords of each site, in an append-only file per user
+
+    Recording a replaced password appends one JSON line holding its
+    Fernet token, the site name encrypted the same way and when it was
+    replaced; the file is not read to do so.  Site names are decrypted
+    when the file is replayed.  What the file still reveals is its size,
+    how many passwords were replaced and when, and roughly how long each
+    site name and password is (tokens grow in 16-byte steps); versions of
+    the same site cannot be linked, since every token is randomised.
+    A user's history is only replayed when it is first asked for, keeping
+    the last max_versions values per site, and versions older than
+    max_days (if set) are hidden.  Once dropped records outnumber both
+    compact_threshold and the kept ones, the file is rewritten with the
+    kept versions only.  Writers hold a VaultLock on the history file, so
+    several processes can append at once, and move what they append to
+    the newest key if another process rotated it since.
+    """
+
+    suffix = "_history.log"
+
+    def __init__(self, data_dir, max_versions=10, max_days=0, compact_threshold=1000, cipher=None):
+        self.data_dir = data_dir
+        self.cipher = cipher
+        self.max_versions = max_versions
+        self.max_days = max_days
+        self.compact_threshold = compact_threshold
+        self._states = {}
+        # Appends to users whose history is not loaded, since the last check
+        self._blind_appends = {}
+        self._locks = {}
+        self._lock = threading.RLock()
+        self._key_signature = None
+
+    def set_cipher(self, cipher):
+        """Use a new MultiFernet (e.g. after a rotation started)"""
+        self.cipher = cipher
+        # Compared with the key files before the next append
+        self._key_signature = None
+
+    def _current_versions(self, versions):
+        """versions with their tokens under the newest key in the key files
+
+        Tokens come from the vault, and may predate a rotation another
+        process started or finished.  Call with the exclusive lock held.
+        """
+        signature = key_files_signature(self.data_dir)
+        if signature == self._key_signature:
+            return versions
+        keys = load_keys(self.data_dir)
+        self._key_signature = signature
+        if not keys:
+            return versions
+        old_cipher = self.cipher
+        self.cipher = build_cipher(keys)
+
+        def rekey(token):
+            try:
+                return self.cipher.rotate(token.encode()).decode()
+            except InvalidToken:
+                return self.cipher.encrypt(old_cipher.decrypt(token.encode())).decode()
+        return [(site, rekey(token)) for site, token in versions]
+
+    def path(self, username):
+        return os.path.join(self.data_dir, f"{username}{self.suffix}")
+
+    def _seal(self, site):
+        return self.cipher.encrypt(site.encode()).decode()
+
+    def _encode(self, site, token, replaced_at):
+        record = {"site": self._seal(site), "password": token, "replaced_at": replaced_at}
+        return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+    def lock(self, username):
+        with self._lock:
+            vault_lock = self._locks.get(username)
+            if vault_lock is None:
+                vault_lock = VaultLock(os.path.join(self.data_dir, f".{username}.history.lock"))
+                self._locks[username] = vault_lock
+            return vault_lock
+
+    def usernames(self):
+        """Users that have a history file"""
+        try:
+            names = os.listdir(self.data_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(self.suffix)] for name in names if name.endswith(self.suffix))
+
+    def _load(self, username):
+        filename = self.path(username)
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            state = self._states[username] = _HistoryState(self.max_versions)
+            return state
+        state = self._states.get(username)
+        if state is None or state.inode != stat.st_ino or stat.st_size < state.offset:
+            # First read, or compacted by another process
+            state = self._states[username] = _HistoryState(self.max_versions)
+            state.inode = stat.st_ino
+        if stat.st_size > state.offset:
+            with self.lock(username).shared():
+                self._replay(filename, state)
+        return state
+
+    def _replay(self, filename, state):
+        with open(filename, "rb") as f:
+            f.seek(state.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Torn by a crash; the next append cuts it off
+                    break
+                record = json.loads(line)
+                site = self.cipher.decrypt(record["site"].encode()).decode()
+                state.add(site, record["password"], record["replaced_at"])
+                state.offset += len(line)
+                state.records += 1
+
+    def append(self, username, site, token):
+        """Record that token was the password of site until now"""
+        self.append_many(username, [(site, token)])
+
+    def append_many(self, username, versions):
+        """Record replaced passwords, as (site, token) pairs, in one write"""
+        if self.max_versions <= 0 or not versions:
+            return
+        replaced_at = time.time()
+        filename = self.path(username)
+        with self._lock, self.lock(username).exclusive():
+            versions = self._current_versions(versions)
+            data = b"".join(self._encode(site, token, replaced_at) for site, token in versions)
+            state = self._states.get(username)
+            if state is not None:
+                # Catch up with other processes' appends
+                state = self._load(username)
+            with open(filename, "a+b") as f:
+                self._cut_torn_tail(f)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if state is not None:
+                if state.inode is None:
+                    state.inode = os.stat(filename).st_ino
+                for site, token in versions:
+                    state.add(site, token, replaced_at)
+                state.offset += len(data)
+                state.records += len(versions)
+                self._maybe_compact(username, state)
+                return
+            blind = self._blind_appends.get(username, 0) + len(versions)
+            self._blind_appends[username] = blind
+            if blind >= self.compact_threshold:
+                # Check the file now and then even if nobody reads it
+                self._blind_appends[username] = 0
+                self._maybe_compact(username, self._load(username))
+
+    @staticmethod
+    def _cut_torn_tail(f):
+        """Drop a partial last line left by a crash"""
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        cut = 0
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                cut = start + newline + 1
+                break
+            position = start
+        f.truncate(cut)
+
+    def get(self, username, site):
+        """Previous passwords of site, newest first, as (token, replaced_at)"""
+        with self._lock:
+            state = self._load(username)
+            self._maybe_compact(username, state)
+            versions = list(state.sites.get(site, ()))
+        if self.max_days:
+            cutoff = time.time() - self.max_days * 86400
+            versions = [version for version in versions if version[1] >= cutoff]
+        return versions[::-1]
+
+    def _maybe_compact(self, username, state):
+        if state.records - state.live <= max(self.compact_threshold, state.live):
+            return
+        try:
+            self.compact(username)
+        except Exception as e:
+            # The file is still intact; compaction is retried later
+            logger.error(f"Failed to compact password history for {username}: {str(e)}")
+
+    def _rewrite(self, username, state, convert=None):
+        """Replace a user's file with the versions kept in state"""
+        filename = self.path(username)
+        cutoff = time.time() - self.max_days * 86400 if self.max_days else None
+        records = []
+        for site, versions in state.sites.items():
+            kept = []
+            for token, replaced_at in versions:
+                if cutoff is not None and replaced_at < cutoff:
+                    continue
+                if convert is not None:
+                    token = convert(token)
+                kept.append((token, replaced_at))
+                records.append(self._encode(site, token, replaced_at))
+            versions.clear()
+            versions.extend(kept)
+        atomic_write(filename, b"".join(records))
+        stat = os.stat(filename)
+        state.inode = stat.st_ino
+        state.offset = stat.st_size
+        state.records = len(records)
+        return len(records)
+
+    def compact(self, username):
+        """Rewrite a user's history without dropped or expired versions"""
+        with self._lock, self.lock(username).exclusive():
+            state = self._load(username)
+            if state.inode is not None:
+                self._rewrite(username, state)
+
+    def rotate(self, username):
+        """Re-encrypt a user's history under the cipher's newest key
+
+        Returns the version count.
+        """
+        with self._lock, self.lock(username).exclusive():
+            state = self._load(username)
+            if state.inode is None:
+                return 0
+            return self._rewrite(username, state,
+                                 lambda token: self.cipher.rotate(token.encode()).decode())
+
+    def close(self):
+        with self._lock:
+            for vault_lock in self._locks.values():
+                vault_lock.close()
+            self._locks.clear()
+            self._states.clear()
+
+
+def create_history(settings, data_dir, cipher=None):
+    """PasswordHistory with the retention the settings select
+
+    cipher (a MultiFernet) encrypts site names and is required to read or
+    write histories; listing their users works without it.
+    """
+    return PasswordHistory(data_dir, settings.get("history_max_versions", 10),
+                           settings.get("history_max_days", 0), cipher=cipher)
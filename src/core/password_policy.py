@@ -0,0 +1,113 @@
+import secrets
+import string
+
+DEFAULT_SYMBOLS = "!@#$%^&*(),.?\":{}|<>"
+LOOKALIKE_CHARS = "Il1|O0o"
+
+_shuffler = secrets.SystemRandom()
+
+
+def build_sampling_table(charset):
+    """Build a bytes.translate() table for unbiased byte-to-char mapping
+
+    Only the largest multiple of len(charset) below 256 is usable; the
+    remaining byte values are returned as the deletion set.
+    """
+    size = len(charset)
+    if not 0 < size <= 256:
+        raise ValueError("Character set must contain 1 to 256 characters")
+    limit = 256 - (256 % size)
+    encoded = charset.encode('ascii')
+    table = bytes(encoded[b % size] if b < limit else 0 for b in range(256))
+    return table, bytes(range(limit, 256))
+
+
+def sample_chars(table, rejected, count):
+    """Draw count characters uniformly using a table from build_sampling_table"""
+    chars = b''
+    while len(chars) < count:
+        # Over-read slightly so a second read is rarely needed
+        chars += secrets.token_bytes((count - len(chars)) * 2 + 8).translate(table, rejected)
+    return chars[:count].decode('ascii')
+
+
+class PasswordPolicy:
+    """Composition rules for generated passwords
+
+    Each character class takes a minimum count, or None to leave the class
+    out of the password entirely.  The policy is compiled into sampling
+    tables once, on construction, and passwords are then built to satisfy
+    it directly: the required characters of each class are drawn first,
+    the rest come from the union of all enabled classes, and the result is
+    shuffled.  No candidate is ever validated or regenerated.
+    """
+
+    _strength_cache = {}
+
+    def __init__(self, min_lowercase=1, min_uppercase=None, min_digits=None,
+                 min_symbols=None, symbols=DEFAULT_SYMBOLS, exclude_chars="",
+                 exclude_lookalikes=False):
+        excluded = set(exclude_chars)
+        if exclude_lookalikes:
+            excluded.update(LOOKALIKE_CHARS)
+
+        classes = [
+            ("lowercase", string.ascii_lowercase, min_lowercase),
+            ("uppercase", string.ascii_uppercase, min_uppercase),
+            ("digits", string.digits, min_digits),
+            ("symbols", symbols, min_symbols),
+        ]
+
+        self._required = []
+        alphabet = []
+        for name, chars, minimum in classes:
+            if minimum is None:
+                continue
+            if not isinstance(minimum, int) or minimum < 0:
+                raise ValueError(f"Minimum {name} count must be a non-negative integer")
+            chars = "".join(dict.fromkeys(c for c in chars if c not in excluded))
+            if not chars:
+                raise ValueError(f"No {name} characters left after exclusions")
+            if not chars.isascii():
+                raise ValueError(f"{name.capitalize()} must be ASCII characters")
+            alphabet.append(chars)
+            if minimum:
+                self._required.append((build_sampling_table(chars), minimum))
+
+        if not alphabet:
+            raise ValueError("Policy must enable at least one character class")
+
+        self.charset = "".join(dict.fromkeys("".join(alphabet)))
+        self.min_length = sum(minimum for _, minimum in self._required)
+        self._table, self._rejected = build_sampling_table(self.charset)
+
+    @classmethod
+    def from_strength(cls, strength_choice):
+        """Get the cached policy matching a strength level from 1 to 4"""
+        if strength_choice not in [1, 2, 3, 4]:
+            raise ValueError("Invalid strength choice")
+        policy = cls._strength_cache.get(strength_choice)
+        if policy is None:
+            policy = cls(
+                min_lowercase=1,
+                min_uppercase=1 if strength_choice >= 2 else None,
+                min_digits=1 if strength_choice >= 3 else None,
+                min_symbols=1 if strength_choice == 4 else None,
+            )
+            cls._strength_cache[strength_choice] = policy
+        return policy
+
+    def generate(self, length):
+        """Build one password of the given length that satisfies the policy"""
+        if not isinstance(length, int) or length <= 0 or length > 128:
+            raise ValueError("Length must be between 1 and 128")
+        if length < self.min_length:
+            raise ValueError(f"Length must be at least {self.min_length} for this policy")
+
+        chars = []
+        for (table, rejected), minimum in self._required:
+            chars.extend(sample_chars(table, rejected, minimum))
+        chars.extend(sample_chars(self._table, self._rejected, length - len(chars)))
+
+        _shuffler.shuffle(chars)
+        return ''.join(chars)
@@ -0,0 +1,154 @@
+import itertools
+import math
+import string
+from functools import lru_cache
+from .password_policy import DEFAULT_SYMBOLS, build_sampling_table, sample_chars
+
+VOWELS = "aeiou"
+CONSONANTS = "".join(c for c in string.ascii_lowercase if c not in VOWELS)
+
+# Placeholder characters understood in templates
+PATTERN_TOKENS = {
+    "a": string.ascii_lowercase,
+    "A": string.ascii_uppercase,
+    "v": VOWELS,
+    "V": VOWELS.upper(),
+    "c": CONSONANTS,
+    "C": CONSONANTS.upper(),
+    "9": string.digits,
+    "x": string.ascii_letters + string.digits,
+    "#": DEFAULT_SYMBOLS,
+    "*": string.ascii_letters + string.digits + DEFAULT_SYMBOLS,
+}
+
+MAX_PATTERN_LENGTH = 128
+MAX_REPEAT = 128
+
+
+class CompiledPattern:
+    """A parsed template: a sequence of literal text and random slots
+
+    Each slot holds the sampling table for its character set, so generating
+    from a compiled pattern never looks at the template again.
+    """
+
+    def __init__(self, template, parts):
+        self.template = template
+        # (literal, None) or (charset, (table, rejected)) per output character
+        self.parts = parts
+        self.length = sum(len(text) if sampler is None else 1 for text, sampler in parts)
+        self.entropy_bits = sum(math.log2(len(charset)) for charset, sampler in parts
+                                if sampler is not None)
+
+    def generate(self):
+        """Build one password from the pattern"""
+        return next(self.iter_generate(1))
+
+    def iter_generate(self, count, block_size=4096):
+        """Lazily yield count passwords, sampling each slot a block at a time"""
+        produced = 0
+        while produced < count:
+            block = min(count - produced, block_size)
+            columns = [
+                itertools.repeat(text, block) if sampler is None else sample_chars(*sampler, block)
+                for text, sampler in self.parts
+            ]
+            yield from map("".join, zip(*columns))
+            produced += block
+
+
+def _parse_class(template, pos):
+    """Parse a [...] set starting after '['; return (charset, next position)"""
+    chars = []
+    while pos < len(template) and template[pos] != "]":
+        char = template[pos]
+        if char == "\\" and pos + 1 < len(template):
+            pos += 1
+            char = template[pos]
+        elif pos + 2 < len(template) and template[pos + 1] == "-" and template[pos + 2] != "]":
+            end = template[pos + 2]
+            if ord(end) < ord(char):
+                raise ValueError(f"Invalid range {char}-{end} in pattern")
+            chars.extend(chr(c) for c in range(ord(char), ord(end) + 1))
+            pos += 3
+            continue
+        chars.append(char)
+        pos += 1
+    if pos >= len(template):
+        raise ValueError("Unterminated [ in pattern")
+    charset = "".join(dict.fromkeys(chars))
+    if not charset:
+        raise ValueError("Empty [] in pattern")
+    if not charset.isascii():
+        raise ValueError("Character sets in patterns must be ASCII")
+    return charset, pos + 1
+
+
+def _parse_repeat(template, pos):
+    """Parse an optional {n} after a token; return (count, next position)"""
+    if pos >= len(template) or template[pos] != "{":
+        return 1, pos
+    end = template.find("}", pos)
+    if end == -1:
+        raise ValueError("Unterminated { in pattern")
+    try:
+        count = int(template[pos + 1:end])
+    except ValueError:
+        raise ValueError("Repeat count in pattern must be a number")
+    if not 0 <= count <= MAX_REPEAT:
+        raise ValueError(f"Repeat count must be between 0 and {MAX_REPEAT}")
+    return count, end + 1
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(template):
+    """Parse a password template into a cached CompiledPattern
+
+    Placeholders: a/A letter, v/V vowel, c/C consonant (lower/upper case),
+    9 digit, x letter or digit, # symbol, * any of those.  [...] is a custom
+    set (ranges like a-f allowed), {n} repeats the previous token, \\
+    escapes the next character, and anything else is copied literally.
+    For example "Cvcc-9999-Cvcc" or "Cvcc-9{4}-[A-F0-9]{6}".
+    """
+    if not isinstance(template, str) or not template:
+        raise ValueError("Pattern must be a non-empty string")
+
+    parts = []
+    pos = 0
+    while pos < len(template):
+        char = template[pos]
+        if char == "\\":
+            if pos + 1 >= len(template):
+                raise ValueError("Pattern ends with a dangling \\")
+            token = (template[pos + 1], None)
+            pos += 2
+        elif char == "[":
+            charset, pos = _parse_class(template, pos + 1)
+            token = (charset, charset)
+        elif char in PATTERN_TOKENS:
+            token = (PATTERN_TOKENS[char], PATTERN_TOKENS[char])
+            pos += 1
+        else:
+            token = (char, None)
+            pos += 1
+
+        count, pos = _parse_repeat(template, pos)
+        text, charset = token
+        if charset is None:
+            parts.extend([(text, None)] * count)
+        else:
+            sampler = build_sampling_table(charset)
+            parts.extend([(charset, sampler)] * count)
+
+    # Merge neighbouring literals so each becomes a single column
+    merged = []
+    for text, sampler in parts:
+        if sampler is None and merged and merged[-1][1] is None:
+            merged[-1] = (merged[-1][0] + text, None)
+        else:
+            merged.append((text, sampler))
+
+    pattern = CompiledPattern(template, merged)
+    if pattern.length == 0 or pattern.length > MAX_PATTERN_LENGTH:
+        raise ValueError(f"Pattern must produce between 1 and {MAX_PATTERN_LENGTH} characters")
+    return pattern
@@ -0,0 +1,135 @@
+import lzma
+import secrets
+import struct
+import zlib
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+MAGIC = b"GPSEAL1\n"
+VERSION = 1
+COMPRESSION = {"none": 0, "zlib": 1, "lzma": 2}
+# magic, version, compression, chunk size, random nonce prefix
+_HEADER = struct.Struct("<8sBBI8s")
+# ciphertext length, final-chunk flag
+_CHUNK = struct.Struct("<IB")
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def derive_key(fernet_key):
+    """AES-256-GCM key for sealed vaults, derived from a Fernet key"""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                info=b"GenPass sealed vault v1").derive(fernet_key)
+
+
+def _compressor(compression):
+    if compression == COMPRESSION["zlib"]:
+        return zlib.compressobj(6)
+    if compression == COMPRESSION["lzma"]:
+        return lzma.LZMACompressor()
+    return None
+
+
+def _decompressor(compression):
+    if compression == COMPRESSION["zlib"]:
+        return zlib.decompressobj()
+    if compression == COMPRESSION["lzma"]:
+        return lzma.LZMADecompressor()
+    if compression == COMPRESSION["none"]:
+        return None
+    raise ValueError(f"Unknown sealed vault compression {compression}")
+
+
+def _chunk_aad(header, index, final):
+    # Binding the header, position and final flag to every chunk stops
+    # chunks being reordered, dropped from the end or moved between files
+    return header + struct.pack("<QB", index, final)
+
+
+def iter_seal(parts, key, compression="zlib", chunk_size=65536):
+    """Compress and encrypt a stream of byte strings; yield the sealed file
+
+    The compressed stream is cut into chunk_size pieces, each encrypted
+    with AES-GCM under a nonce made of a random per-file prefix and the
+    chunk number, so neither side ever holds the whole vault ciphertext.
+    """
+    if compression not in COMPRESSION:
+        raise ValueError(f"Compression must be one of: {', '.join(COMPRESSION)}")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"Chunk size must be between 1 and {MAX_CHUNK_SIZE}")
+    aead = AESGCM(key)
+    prefix = secrets.token_bytes(8)
+    header = _HEADER.pack(MAGIC, VERSION, COMPRESSION[compression], chunk_size, prefix)
+    compressor = _compressor(COMPRESSION[compression])
+    yield header
+
+    index = 0
+
+    def seal(data, final):
+        nonce = prefix + index.to_bytes(4, "big")
+        sealed = aead.encrypt(nonce, bytes(data), _chunk_aad(header, index, final))
+        return _CHUNK.pack(len(sealed), final) + sealed
+
+    buffer = bytearray()
+    for part in parts:
+        buffer += compressor.compress(part) if compressor else part
+        while len(buffer) >= chunk_size:
+            yield seal(buffer[:chunk_size], 0)
+            del buffer[:chunk_size]
+            index += 1
+    if compressor:
+        buffer += compressor.flush()
+    while len(buffer) > chunk_size:
+        yield seal(buffer[:chunk_size], 0)
+        del buffer[:chunk_size]
+        index += 1
+    yield seal(buffer, 1)
+
+
+def iter_unseal(f, keys):
+    """Yield the decrypted, decompressed contents of a sealed file object
+
+    keys are tried in order on the first chunk, so a vault sealed under
+    any of them opens.  Raises ValueError if the file was tampered with,
+    truncated, or sealed under none of the keys.
+    """
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError("Sealed vault is truncated")
+    magic, version, compression, chunk_size, prefix = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("not a GenPass sealed vault")
+    if version != VERSION:
+        raise ValueError(f"Unsupported sealed vault version {version}")
+    decompressor = _decompressor(compression)
+    aeads = [AESGCM(key) for key in keys]
+
+    index = 0
+    final = 0
+    while not final:
+        chunk_header = f.read(_CHUNK.size)
+        if len(chunk_header) < _CHUNK.size:
+            raise ValueError("Sealed vault is truncated")
+        length, final = _CHUNK.unpack(chunk_header)
+        if length > chunk_size + 16:
+            raise ValueError("Sealed vault chunk is larger than its header allows")
+        sealed = f.read(length)
+        nonce = prefix + index.to_bytes(4, "big")
+        aad = _chunk_aad(header, index, final)
+        for aead in aeads:
+            try:
+                data = aead.decrypt(nonce, sealed, aad)
+                break
+            except InvalidTag:
+                continue
+        else:
+            raise ValueError("Sealed vault failed authentication (wrong key or damaged file)")
+        # Every later chunk uses the key that opened the first
+        aeads = [aead]
+        index += 1
+        yield decompressor.decompress(data) if decompressor else data
+    if f.read(1):
+        raise ValueError("Sealed vault has data after its final chunk")
+    if decompressor is not None and not decompressor.eof:
+        raise ValueError("Sealed vault is truncated")
@@ -0,0 +1,183 @@
+import heapq
+import math
+from bisect import bisect_left, insort
+from collections import Counter
+
+
+def trigrams(text):
+    """Trigrams of lower-cased text padded like pg_trgm ("  ab", "b ")"""
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from trigrams to keys, for fuzzy search as you type
+
+    Postings are plain lists of key ids.  Removing a key only marks its id
+    dead, and the lists are rebuilt once dead ids outnumber live ones, so
+    add and remove cost one append or dict update per trigram.  The keys
+    are also kept in a list sorted case-insensitively, so prefix matches
+    are one bisection away.
+
+    A search looks at two kinds of candidates.  Substring matches are
+    found in the posting list of the rarest trigram inside the query and
+    confirmed with `in`; when even that list is long, as for ".com", most
+    keys match, and walking the sorted keys finds the first few sooner.
+    Typos are keys sharing enough of the query's trigrams; such a key must
+    appear in one of the few rarest query trigrams' lists (prefix
+    filtering), so the long lists of common trigrams such as "com" are
+    only probed by bisection, never scanned.
+    """
+
+    # Posting entries counted in full per search before switching to
+    # bisection, and sorted keys walked looking for common substrings
+    SCAN_BUDGET = 5000
+
+    def __init__(self, keys=()):
+        self._postings = {}
+        self._ids = {}
+        self._keys = []
+        self._folded = []
+        # Trigram count per key id
+        self._sizes = []
+        self._dead = 0
+        for key in keys:
+            self._index(key)
+        # (folded key, key) of every live key, sorted
+        self._order = sorted((self._folded[key_id], key) for key, key_id in self._ids.items())
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def add(self, key):
+        """Index key (no-op if already indexed)"""
+        if key in self._ids:
+            return
+        self._index(key)
+        insort(self._order, (key.lower(), key))
+
+    def _index(self, key):
+        if key in self._ids:
+            return
+        key_id = len(self._keys)
+        self._ids[key] = key_id
+        self._keys.append(key)
+        self._folded.append(key.lower())
+        key_trigrams = trigrams(key)
+        self._sizes.append(len(key_trigrams))
+        postings = self._postings
+        for trigram in key_trigrams:
+            if trigram in postings:
+                postings[trigram].append(key_id)
+            else:
+                postings[trigram] = [key_id]
+
+    def remove(self, key):
+        """Drop key from the index (no-op if not indexed)"""
+        key_id = self._ids.pop(key, None)
+        if key_id is None:
+            return
+        position = bisect_left(self._order, (self._folded[key_id], key))
+        del self._order[position]
+        self._keys[key_id] = None
+        self._folded[key_id] = None
+        self._dead += 1
+        if self._dead > len(self._ids):
+            self._rebuild()
+
+    def _rebuild(self):
+        keys = list(self._ids)
+        self.__init__(keys)
+
+    def search(self, query, limit=20, threshold=0.5):
+        """Return up to limit keys ranked by how well they match query
+
+        An exact match ranks first, then keys starting with the query,
+        then keys containing it (each group alphabetically, ignoring
+        case), then keys holding at least `threshold` of the query's
+        trigrams, by how many they share.  Each later group is only looked for when the earlier
+        ones gave fewer than limit keys, since it could not outrank them.
+        """
+        folded = query.strip().lower()
+        if not folded:
+            return []
+        postings = self._postings
+        folded_keys = self._folded
+        keys = self._keys
+
+        # Prefixes sort right after the query itself, exact matches first
+        order = self._order
+        start = bisect_left(order, (folded,))
+        prefixed = [key for folded_key, key in order[start:start + limit]
+                    if folded_key.startswith(folded)]
+        if len(prefixed) >= limit:
+            return prefixed
+
+        ids = self._ids
+        scores = {ids[key]: 5.0 if key.lower() == folded else 4.0 for key in prefixed}
+
+        # Substrings: every key containing the query holds all of its
+        # inner trigrams, so the rarest one's list covers them
+        inner = [folded[i:i + 3] for i in range(len(folded) - 2)]
+        if inner:
+            candidates = min((postings.get(t, ()) for t in inner), key=len)
+            wanted = limit - len(scores)
+            if len(candidates) > self.SCAN_BUDGET:
+                # Common trigrams: the first matches in sorted order are
+                # all that can rank, and are usually close to the start
+                found = {}
+                for folded_key, key in order[:self.SCAN_BUDGET]:
+                    if folded in folded_key and not folded_key.startswith(folded):
+                        found[ids[key]] = 3.0
+                        if len(found) == wanted:
+                            break
+                if len(found) == wanted:
+                    candidates = ()
+                scores.update(found)
+            for key_id in candidates:
+                if key_id not in scores and folded in (folded_keys[key_id] or ""):
+                    scores[key_id] = 3.0
+
+        query_trigrams = trigrams(folded)
+        needed = max(1, math.ceil(threshold * len(query_trigrams)))
+        if len(scores) < limit and inner:
+            # Typos.  A key sharing `needed` trigrams appears in at least one
+            # of the rarest len - needed + 1 lists, so those are counted in
+            # full, as are further lists while they are short.  The long
+            # lists left over are only probed by bisection for candidates
+            # that could still reach `needed` (ids are appended in
+            # increasing order, so every list is sorted).
+            lists = sorted((postings.get(t, []) for t in query_trigrams), key=len)
+            split = len(lists) - needed + 1
+            scanned = sum(map(len, lists[:split]))
+            while split < len(lists) and scanned + len(lists[split]) <= self.SCAN_BUDGET:
+                scanned += len(lists[split])
+                split += 1
+            counts = Counter()
+            for candidates in lists[:split]:
+                counts.update(candidates)
+            probed = lists[split:]
+            sizes = self._sizes
+            for key_id, shared in counts.items():
+                if shared + len(probed) < needed or key_id in scores or folded_keys[key_id] is None:
+                    continue
+                # Rarest first, giving up once `needed` is out of reach
+                left = len(probed)
+                for other in probed:
+                    left -= 1
+                    position = bisect_left(other, key_id)
+                    if position < len(other) and other[position] == key_id:
+                        shared += 1
+                    elif shared + left < needed:
+                        break
+                if shared >= needed:
+                    # Fraction of the query found, ties broken by similarity
+                    scores[key_id] = (shared / len(query_trigrams)
+                                      + shared / (len(query_trigrams) + sizes[key_id] - shared))
+
+        best = heapq.nsmallest(limit, ((-score, folded_keys[key_id], keys[key_id])
+                                       for key_id, score in scores.items()))
+        return [key for _, _, key in best]
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SecretCache:
+    """Small LRU cache of decrypted secrets with a per-entry time to live
+
+    Values are held in bytearrays that are overwritten with zeros when an
+    entry expires, is evicted, is invalidated or the cache is cleared, so
+    at most max_size plaintexts stay resident.  Expired entries are wiped
+    by sweep() or the next get()/put(); an entry outlives its ttl until
+    then, so callers that may go idle should sweep on a timer (the main
+    window does so every second).
+
+    Each cached value is tied to the ciphertext it was decrypted from, so
+    a changed entry is never served stale.  The str returned by get() is
+    an ordinary Python string the cache cannot wipe; callers should not
+    keep it longer than needed.
+    """
+
+    def __init__(self, max_size=64, ttl=60.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (token, bytearray, expiry time)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _wipe(buffer):
+        buffer[:] = bytes(len(buffer))
+
+    def get(self, key, token):
+        """Return the cached plaintext for key if it was decrypted from token"""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                cached_token, buffer, expires = cached
+                if cached_token == token and expires > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return buffer.decode()
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, token, plaintext):
+        """Cache a decrypted value, evicting the least recently used ones"""
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (token, bytearray(plaintext.encode()), self.clock() + self.ttl)
+            self._expire()
+            while len(self._entries) > self.max_size:
+                _, (_, buffer, _) = self._entries.popitem(last=False)
+                self._wipe(buffer)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Forget and wipe one entry"""
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        """Forget and wipe every entry"""
+        with self._lock:
+            for _, buffer, _ in self._entries.values():
+                self._wipe(buffer)
+            self._entries.clear()
+
+    def sweep(self):
+        """Wipe every expired entry; return how many were removed"""
+        with self._lock:
+            return self._expire()
+
+    def stats(self):
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries)
+            }
+
+    def _discard(self, key):
+        cached = self._entries.pop(key, None)
+        if cached is not None:
+            self._wipe(cached[1])
+
+    def _expire(self):
+        now = self.clock()
+        expired = [key for key, (_, _, expires) in self._entries.items() if expires <= now]
+        for key in expired:
+            self._discard(key)
+            self.evictions += 1
+        return len(expired)
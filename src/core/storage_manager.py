@@ -1,15 +1,35 @@
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 import json
 import os
+import time
 from datetime import datetime
 import base64
+from .breach_checker import BreachCorpus
+from .key_files import build_cipher, key_files_signature, load_keys
+from .password_history import create_history
+from .search_index import TrigramIndex
+from .secret_cache import SecretCache
+from .vault_backends import create_backend
+from .vault_sync import add_tombstones
+from ..utils.config import config
 
 class StorageManager:
     def __init__(self):
         self.data_dir = os.path.join("data")
         os.makedirs(self.data_dir, exist_ok=True)
         self.key = self._load_or_create_key()
-        self.cipher_suite = Fernet(self.key)
+        self._key_signature = None
+        self.backend = None
+        self.history = None
+        self._refresh_cipher()
+        self.settings = config.load_settings()
+        self._breach_corpus = None
+        self.backend = create_backend(self.settings, self.data_dir, keys=self.keys)
+        self.history = create_history(self.settings, self.data_dir, self.cipher_suite)
+        self.secret_cache = SecretCache(self.settings.get("secret_cache_size", 64),
+                                        self.settings.get("secret_cache_ttl", 60))
+        # username -> TrigramIndex over site names, built on first search
+        self._search_indexes = {}
 
     def _generate_key(self):
         return Fernet.generate_key()
@@ -29,44 +49,92 @@ class StorageManager:
         except Exception as e:
             raise Exception(f"Failed to load encryption key: {str(e)}")
 
+    def _refresh_cipher(self):
+        """Pick up keys another process added or retired during a rotation
+
+        While a rotation runs, new values are encrypted with the new key and
+        either key decrypts.  Costs two stat calls when nothing changed.
+        """
+        signature = key_files_signature(self.data_dir)
+        if signature == self._key_signature:
+            return False
+        self.keys = load_keys(self.data_dir)
+        self.cipher_suite = build_cipher(self.keys)
+        if self.backend is not None:
+            self.backend.set_keys(self.keys)
+        if self.history is not None:
+            self.history.set_cipher(self.cipher_suite)
+        self._key_signature = signature
+        return True
+
+    def _vault(self):
+        """The backend, with current keys (for sealing and the sync journal)"""
+        self._refresh_cipher()
+        return self.backend
+
+    def _to_stored(self, password):
+        """What the backend stores for a password: a token, or the
+        plaintext for backends that encrypt the whole vault"""
+        if self.backend.encrypts:
+            return password
+        return self._encrypt(password)
+
+    def _encrypt(self, password):
+        self._refresh_cipher()
+        return self.cipher_suite.encrypt(password.encode()).decode()
+
+    def _decrypt(self, token):
+        try:
+            return self.cipher_suite.decrypt(token.encode()).decode()
+        except InvalidToken:
+            if not self._refresh_cipher():
+                raise
+            return self.cipher_suite.decrypt(token.encode()).decode()
+
     def encrypt_password(self, password):
         try:
-            return self.cipher_suite.encrypt(password.encode()).decode()
+            return self._encrypt(password)
         except Exception as e:
             raise Exception(f"Encryption failed: {str(e)}")
 
     def decrypt_password(self, encrypted_password):
         try:
-            return self.cipher_suite.decrypt(encrypted_password.encode()).decode()
+            return self._decrypt(encrypted_password)
         except Exception as e:
             raise Exception(f"Decryption failed: {str(e)}")
 
+    def _replaced_token(self, vault, username, site, password=None):
+        """Token of a site's current password if password would replace it"""
+        entry = vault.get(username, site)
+        if entry is None:
+            return None
+        if self.backend.encrypts:
+            current = entry["password"]
+            return self._encrypt(current) if current != password else None
+        token = entry["password"]
+        return token if password is None or self._decrypt(token) != password else None
+
     def save_password(self, username, site, password):
-        """Save encrypted password for a user"""
+        """Save encrypted password for a user, keeping the old one in its history"""
         try:
-            filename = os.path.join(self.data_dir, f"{username}_passwords.json")
-            data = self._load_data(filename)
-            
+            vault = self._vault()
+            replaced = self._replaced_token(vault, username, site, password)
+            if replaced is not None:
+                # Recorded first, so a crash cannot lose the old value
+                self.history.append(username, site, replaced)
+
             # Encrypt the password
-            encrypted_password = self.cipher_suite.encrypt(password.encode()).decode()
+            encrypted_password = self._to_stored(password)
             
-            # Update or add new entry
-            entry_found = False
-            for entry in data:
-                if entry["site"] == site:
-                    entry["password"] = encrypted_password
-                    entry_found = True
-                    break
-                    
-            if not entry_found:
-                data.append({
-                    "site": site,
-                    "password": encrypted_password
-                })
-            
-            # Save updated data
-            with open(filename, "w") as f:
-                json.dump(data, f, indent=4)
+            # Add or replace the entry
+            vault.put(username, {
+                "site": site,
+                "password": encrypted_password,
+                "updated_at": time.time()
+            })
+            self.secret_cache.invalidate((username, site))
+            if username in self._search_indexes:
+                self._search_indexes[username].add(site)
                 
         except Exception as e:
             raise Exception(f"Failed to save password: {str(e)}")
@@ -74,20 +142,20 @@ class StorageManager:
     def get_password(self, username, site):
         """Retrieve decrypted password for a user and site"""
         try:
-            filename = os.path.join(self.data_dir, f"{username}_passwords.json")
-            if not os.path.exists(filename):
+            entry = self._vault().get(username, site)
+            if entry is None:
                 return None
-                
-            data = self._load_data(filename)
-            
-            for entry in data:
-                if entry["site"] == site:
-                    # Decrypt the password
-                    encrypted = entry["password"].encode()
-                    decrypted = self.cipher_suite.decrypt(encrypted)
-                    return decrypted.decode()
-                    
-            return None
+            if self.backend.encrypts:
+                # Already decrypted with the rest of the vault
+                return entry["password"]
+
+            token = entry["password"]
+            password = self.secret_cache.get((username, site), token)
+            if password is None:
+                # Decrypt the password
+                password = self._decrypt(token)
+                self.secret_cache.put((username, site), token, password)
+            return password
             
         except Exception as e:
             raise Exception(f"Failed to retrieve password: {str(e)}")
@@ -95,25 +163,147 @@ class StorageManager:
     def get_all_passwords(self, username):
         """Get all password entries for a user (without decrypted passwords)"""
         try:
-            filename = os.path.join(self.data_dir, f"{username}_passwords.json")
-            return self._load_data(filename)
+            entries = self._vault().list_entries(username)
+            if self.backend.encrypts:
+                entries = [dict(entry, password=self._encrypt(entry["password"]))
+                           for entry in entries]
+            return entries
+        except Exception as e:
+            raise Exception(f"Failed to retrieve passwords: {str(e)}")
+
+    def list_sites(self, username):
+        """Get entry metadata for a user, without even the encrypted passwords"""
+        try:
+            return self._vault().list_metadata(username)
         except Exception as e:
             raise Exception(f"Failed to retrieve passwords: {str(e)}")
 
+    def search_sites(self, username, query, limit=20):
+        """Fuzzy-search a user's site names, best matches first
+
+        Matches exact names, prefixes, substrings and misspellings.  The
+        trigram index is built on the first search and then kept up to date
+        by save, delete and import.
+        """
+        try:
+            index = self._search_indexes.get(username)
+            if index is None:
+                sites = (entry["site"] for entry in self._vault().list_metadata(username))
+                index = self._search_indexes[username] = TrigramIndex(sites)
+            return index.search(query, limit)
+        except Exception as e:
+            raise Exception(f"Failed to search passwords: {str(e)}")
+
+    def poll_changes(self, username):
+        """Whether another process changed the user's vault since the last poll
+
+        Reads one small counter file; the vault itself is not touched.
+        """
+        try:
+            changed = self.backend.poll_changes(username)
+        except Exception as e:
+            raise Exception(f"Failed to check for vault changes: {str(e)}")
+        if changed:
+            # Rebuilt from the new contents on the next search
+            self._search_indexes.pop(username, None)
+        return changed
+
+    def check_writes(self):
+        """Raise if changes written in the background (batch durability) failed
+
+        They stay pending and are retried with the next change, which
+        raises if they fail again.
+        """
+        error = self.backend.write_error()
+        if error is not None:
+            raise Exception(f"Failed to save vault changes: {str(error)}")
+
+    def sweep_secrets(self):
+        """Wipe decrypted passwords whose time in the cache is up"""
+        return self.secret_cache.sweep()
+
+    def cache_stats(self):
+        """Hit/miss counters of the decrypted-secret cache"""
+        return self.secret_cache.stats()
+
+    def get_password_history(self, username, site):
+        """Previous passwords of a site, newest first, as (replaced_at, password)
+
+        replaced_at is a datetime.  The user's history file is only read
+        on the first call; listing and searching the vault never touch it.
+        """
+        try:
+            # Site names in the file may be under a key added since
+            self._refresh_cipher()
+            return [(datetime.fromtimestamp(replaced_at), self._decrypt(token))
+                    for token, replaced_at in self.history.get(username, site)]
+        except Exception as e:
+            raise Exception(f"Failed to retrieve password history: {str(e)}")
+
     def delete_password(self, username, site):
-        """Delete a password entry"""
+        """Delete a password entry; its last value is kept in the history"""
         try:
-            filename = os.path.join(self.data_dir, f"{username}_passwords.json")
-            data = self._load_data(filename)
-            
-            data = [entry for entry in data if entry["site"] != site]
-            
-            with open(filename, "w") as f:
-                json.dump(data, f, indent=4)
-                
+            self.secret_cache.invalidate((username, site))
+            vault = self._vault()
+            replaced = self._replaced_token(vault, username, site)
+            if replaced is not None:
+                self.history.append(username, site, replaced)
+            if vault.delete(username, site):
+                # Lets a sync pass the deletion on to other copies of the vault
+                add_tombstones(vault, username, {site: time.time()}, self.cipher_suite)
+            if username in self._search_indexes:
+                self._search_indexes[username].remove(site)
         except Exception as e:
             raise Exception(f"Failed to delete password: {str(e)}")
 
+    def import_passwords(self, username, rows):
+        """Encrypt (site, password) pairs and store them in one vault write
+
+        Rows are consumed lazily, so each plaintext is dropped as soon as it
+        is encrypted; later rows for the same site replace earlier ones.
+        Passwords that are replaced go to the history in one append.
+        Returns the number of entries stored.
+        """
+        try:
+            vault = self._vault()
+            entries = {}
+            replaced = {}
+            now = time.time()
+            for site, password in rows:
+                if replaced.get(site) is None:
+                    replaced[site] = self._replaced_token(vault, username, site, password)
+                entries[site] = {
+                    "site": site,
+                    "password": self._to_stored(password),
+                    "updated_at": now
+                }
+            if entries:
+                self.history.append_many(username, [(site, token) for site, token in replaced.items()
+                                                    if token is not None])
+                vault.put_many(username, list(entries.values()))
+                if username in self._search_indexes:
+                    for site in entries:
+                        self._search_indexes[username].add(site)
+            return len(entries)
+        except Exception as e:
+            raise Exception(f"Failed to import passwords: {str(e)}")
+
+    def iter_passwords(self, username):
+        """Lazily yield (site, decrypted password) for every entry of a user"""
+        try:
+            entries = self._vault().list_entries(username)
+        except Exception as e:
+            raise Exception(f"Failed to retrieve passwords: {str(e)}")
+        for entry in entries:
+            if self.backend.encrypts:
+                yield entry["site"], entry["password"]
+                continue
+            try:
+                decrypted = self._decrypt(entry["password"])
+            except Exception as e:
+                raise Exception(f"Failed to decrypt password for {entry['site']}: {str(e)}")
+            yield entry["site"], decrypted
+
     def _load_data(self, filename):
         """Load data from file or return empty list"""
         try:
@@ -139,10 +329,30 @@ class StorageManager:
         except Exception as e:
             raise Exception(f"Failed to handle encryption key: {str(e)}")
 
+    def is_password_breached(self, password):
+        """Check a password against the configured breach corpus
+
+        Returns None when no corpus is configured.
+        """
+        corpus_path = self.settings.get("breach_corpus")
+        if not corpus_path:
+            return None
+        try:
+            if self._breach_corpus is None:
+                self._breach_corpus = BreachCorpus(corpus_path)
+            return self._breach_corpus.is_breached(password)
+        except Exception as e:
+            raise Exception(f"Failed to check breach corpus: {str(e)}")
+
     def close(self):
         """Clean up resources"""
         try:
-            # Close any open file handles
-            pass
+            self.secret_cache.clear()
+            self.backend.close()
+            self.history.close()
+            if self._breach_corpus is not None:
+                self._breach_corpus.close()
+                self._breach_corpus = None
         except Exception as e:
-            print(f"Error closing storage manager: {str(e)}")
\ No newline at end of file
+            # Raised so unsaved changes are not dropped without a word
+            raise Exception(f"Failed to close storage manager: {str(e)}")
\ No newline at end of file
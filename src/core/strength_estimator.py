@@ -0,0 +1,280 @@
+import math
+import re
+from .passphrase_generator import WordlistIndex, DEFAULT_WORDLIST
+
+# Most common leaked passwords, most frequent first; rank drives the guess cost
+COMMON_PASSWORDS = (
+    "123456", "password", "123456789", "12345678", "12345", "qwerty", "1234567",
+    "111111", "1234567890", "123123", "abc123", "1234", "password1", "iloveyou",
+    "1q2w3e4r", "000000", "qwerty123", "zaq12wsx", "dragon", "sunshine", "princess",
+    "letmein", "654321", "monkey", "27653", "1qaz2wsx", "123321", "qwertyuiop",
+    "superman", "asdfghjkl", "football", "baseball", "welcome", "admin", "login",
+    "master", "hello", "freedom", "whatever", "qazwsx", "trustno1", "shadow",
+    "michael", "jennifer", "charlie", "ashley", "bailey", "passw0rd", "starwars",
+    "mustang", "access", "batman", "696969", "hottie", "loveme", "flower",
+    "hunter", "soccer", "hockey", "killer", "george", "jordan", "harley",
+    "ranger", "buster", "thomas", "tigger", "robert", "summer", "daniel",
+    "pepper", "andrew", "ginger", "joshua", "cheese", "amanda", "secret",
+    "computer", "internet", "samsung", "google", "pokemon", "naruto", "chocolate",
+    "anthony", "matrix", "yankees", "corvette", "austin", "merlin", "cookie",
+    "maggie", "jessica", "nicole", "lovely", "angel", "genpass", "changeme",
+    "default", "root", "test", "guest", "qwer1234", "abcd1234", "aa123456",
+)
+
+# Common character substitutions undone before dictionary lookups
+LEET_TABLE = str.maketrans({
+    "4": "a", "@": "a", "8": "b", "(": "c", "3": "e", "6": "g", "1": "i",
+    "!": "i", "|": "l", "0": "o", "$": "s", "5": "s", "7": "t", "+": "t", "2": "z",
+})
+
+KEYBOARD_ROWS = (
+    ("1234567890-=", "!@#$%^&*()_+"),
+    ("qwertyuiop[]\\", "QWERTYUIOP{}|"),
+    ("asdfghjkl;'", "ASDFGHJKL:\""),
+    ("zxcvbnm,./", "ZXCVBNM<>?"),
+)
+
+STRENGTH_LABELS = ("Very weak", "Weak", "Fair", "Strong", "Very strong")
+# Minimum bits of entropy for scores 1 to 4
+SCORE_THRESHOLDS = (28, 36, 60, 80)
+
+_REPEAT_PATTERN = re.compile(r"(.+?)\1+")
+_DATE_PATTERN = re.compile(
+    r"(?:19|20)\d\d[-/._]?(?:1[0-2]|0?[1-9])[-/._]?(?:3[01]|[12]\d|0?[1-9])"
+    r"|(?:3[01]|[12]\d|0?[1-9])[-/._]?(?:1[0-2]|0?[1-9])[-/._]?(?:19|20)?\d\d"
+    r"|(?:1[0-2]|0?[1-9])[-/._]?(?:3[01]|[12]\d|0?[1-9])[-/._]?(?:19|20)?\d\d"
+    r"|(?:19|20)\d\d"
+)
+# Days in a century of dates, roughly
+_DATE_BITS = math.log2(365 * 100)
+_YEAR_BITS = math.log2(120)
+
+
+def _build_keyboard_graph():
+    """Map every key to the set of keys physically adjacent to it"""
+    grid = {}
+    for row, (plain, shifted) in enumerate(KEYBOARD_ROWS):
+        for col, (a, b) in enumerate(zip(plain, shifted)):
+            # Each row sits about half a key right of the one above it, so a
+            # key touches columns col and col + 1 above, col - 1 and col below
+            grid[a] = grid[b] = (row, col)
+    graph = {}
+    for key, (row, col) in grid.items():
+        graph[key] = frozenset(
+            other for other, (r, c) in grid.items()
+            if other != key and abs(r - row) <= 1 and (c - col) in ((-1, 0, 1) if r == row else
+                                                                  ((0, 1) if r < row else (-1, 0)))
+        )
+    return graph
+
+
+KEYBOARD_GRAPH = _build_keyboard_graph()
+_KEYBOARD_DEGREE = sum(len(v) for v in KEYBOARD_GRAPH.values()) / len(KEYBOARD_GRAPH)
+
+
+def _build_dictionary():
+    """Map every prefix of every dictionary word to that word's guess cost
+
+    Prefixes that are not words themselves map to None, so a scan can
+    stop as soon as no word continues the text it has read.  Common
+    passwords cost log2(rank + 1) bits, wordlist words log2 of the list's
+    size.
+    """
+    try:
+        wordlist = WordlistIndex(DEFAULT_WORDLIST)
+        try:
+            words = {wordlist[i].lower() for i in range(len(wordlist))}
+        finally:
+            wordlist.close()
+    except (OSError, ValueError):
+        words = set()
+    costs = dict.fromkeys(words, math.log2(len(words)) if words else 0.0)
+    for rank, word in reversed(list(enumerate(COMMON_PASSWORDS, start=1))):
+        costs[word] = math.log2(rank + 1)
+
+    dictionary = {}
+    for word, bits in costs.items():
+        for end in range(1, len(word)):
+            dictionary.setdefault(word[:end], None)
+        dictionary[word] = bits
+    return dictionary
+
+
+DICTIONARY = _build_dictionary()
+
+
+class StrengthEstimator:
+    """Pattern-aware password strength estimation
+
+    A password is split into the cheapest-to-guess sequence of pieces: common
+    passwords, dictionary words (including l33t spellings and capitalised
+    forms), keyboard walks, character sequences, repeats and dates, with any
+    leftover characters priced as brute force over the character classes in
+    use.  The total is reported in bits of entropy.  Words are found by
+    walking the precomputed prefix table (DICTIONARY) from each position
+    only while some word still continues, so scoring stays linear in
+    practice and cheap enough to run on every keystroke.  Results are not
+    memoized, so no password typed into the GUI outlives the call that
+    scored it.
+    """
+
+    MIN_WORD_LENGTH = 3
+
+    @classmethod
+    def estimate(cls, password):
+        """Estimate password strength
+
+        Returns a dict with 'bits', 'score' (0-4), 'label' and 'patterns',
+        a list of (kind, token) pairs for the pieces that were recognised.
+        """
+        if not isinstance(password, str):
+            raise ValueError("Password must be a string")
+        result = cls._estimate(password)
+        return dict(result, patterns=list(result["patterns"]))
+
+    @staticmethod
+    def _estimate(password):
+        length = len(password)
+        if length == 0:
+            return {"bits": 0.0, "score": 0, "label": STRENGTH_LABELS[0], "patterns": ()}
+
+        char_bits = math.log2(StrengthEstimator._cardinality(password))
+        matches = StrengthEstimator._find_matches(password)
+        ending_at = [[] for _ in range(length + 1)]
+        for match in matches:
+            ending_at[match[1]].append(match)
+
+        # best[i] holds the cheapest guess cost for password[:i]
+        best = [0.0] * (length + 1)
+        choice = [None] * (length + 1)
+        for end in range(1, length + 1):
+            best[end] = best[end - 1] + char_bits
+            for start, _, bits, kind in ending_at[end]:
+                if best[start] + bits < best[end]:
+                    best[end] = best[start] + bits
+                    choice[end] = (start, kind)
+
+        patterns = []
+        end = length
+        while end > 0:
+            if choice[end] is None:
+                end -= 1
+                continue
+            start, kind = choice[end]
+            patterns.append((kind, password[start:end]))
+            end = start
+        patterns.reverse()
+
+        bits = round(best[length], 1)
+        score = sum(1 for threshold in SCORE_THRESHOLDS if bits >= threshold)
+        return {"bits": bits, "score": score, "label": STRENGTH_LABELS[score],
+                "patterns": tuple(patterns)}
+
+    @staticmethod
+    def _cardinality(password):
+        chars = set(password)
+        size = 0
+        if any(c.islower() for c in chars):
+            size += 26
+        if any(c.isupper() for c in chars):
+            size += 26
+        if any(c.isdigit() for c in chars):
+            size += 10
+        if any(not c.isalnum() and c.isascii() for c in chars):
+            size += 33
+        if not password.isascii():
+            size += 100
+        return size or 1
+
+    @staticmethod
+    def _find_matches(password):
+        """Return (start, end, bits, kind) for every recognised piece"""
+        matches = []
+        matches.extend(StrengthEstimator._dictionary_matches(password))
+        matches.extend(StrengthEstimator._keyboard_matches(password))
+        matches.extend(StrengthEstimator._sequence_matches(password))
+        matches.extend(StrengthEstimator._repeat_matches(password))
+        for match in _DATE_PATTERN.finditer(password):
+            bits = _YEAR_BITS if match.end() - match.start() == 4 else _DATE_BITS
+            matches.append((match.start(), match.end(), bits, "date"))
+        return matches
+
+    @staticmethod
+    def _dictionary_matches(password):
+        dictionary = DICTIONARY
+        min_length = StrengthEstimator.MIN_WORD_LENGTH
+        lowered = password.lower()
+        unleeted = lowered.translate(LEET_TABLE)
+        texts = ((lowered, False), (unleeted, True)) if unleeted != lowered else ((lowered, False),)
+        length = len(password)
+        matches = []
+
+        for start in range(length):
+            for text, leet in texts:
+                end = start + 1
+                while end <= length:
+                    candidate = text[start:end]
+                    if candidate not in dictionary:
+                        break
+                    bits = dictionary[candidate]
+                    # Leet spellings equal to the plain text were already matched
+                    if (bits is not None and end - start >= min_length
+                            and not (leet and candidate == lowered[start:end])):
+                        token = password[start:end]
+                        if token != token.lower():
+                            # First-letter capitals are the usual case and cost a bit
+                            bits += 1 if token[1:] == token[1:].lower() else 2
+                        if leet:
+                            bits += 1
+                        matches.append((start, end, bits, "dictionary"))
+                    end += 1
+        return matches
+
+    @staticmethod
+    def _keyboard_matches(password):
+        matches = []
+        start = 0
+        length = len(password)
+        while start < length - 2:
+            end = start + 1
+            while end < length and password[end] in KEYBOARD_GRAPH.get(password[end - 1], ()):
+                end += 1
+            if end - start >= 3:
+                bits = math.log2(len(KEYBOARD_GRAPH)) + (end - start - 1) * math.log2(_KEYBOARD_DEGREE)
+                matches.append((start, end, bits, "keyboard"))
+                start = end
+            else:
+                start += 1
+        return matches
+
+    @staticmethod
+    def _sequence_matches(password):
+        matches = []
+        start = 0
+        length = len(password)
+        while start < length - 2:
+            delta = ord(password[start + 1]) - ord(password[start])
+            end = start + 1
+            if delta in (-1, 1, -2, 2):
+                while end < length and ord(password[end]) - ord(password[end - 1]) == delta:
+                    end += 1
+            if end - start >= 3:
+                first = password[start]
+                base = 10 if first.isdigit() else 26
+                bits = math.log2(base) + math.log2(end - start) + (1 if delta < 0 else 0)
+                matches.append((start, end, bits, "sequence"))
+                start = end - 1
+            else:
+                start += 1
+        return matches
+
+    @staticmethod
+    def _repeat_matches(password):
+        matches = []
+        for match in _REPEAT_PATTERN.finditer(password):
+            unit = match.group(1)
+            repeats = (match.end() - match.start()) // len(unit)
+            unit_bits = StrengthEstimator._estimate(unit)["bits"] if len(unit) > 1 else \
+                math.log2(StrengthEstimator._cardinality(unit))
+            matches.append((match.start(), match.end(), unit_bits + math.log2(repeats), "repeat"))
+        return matches
@@ -0,0 +1,186 @@
+import hashlib
+import hmac
+import json
+import os
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from .write_coordinator import atomic_write
+
+TOMBSTONE_SUFFIX = "_tombstones.json"
+# A journal nobody empties is dropped at this size; the next sync rebuilds
+MAX_JOURNAL_SIZE = 1 << 20
+
+
+def digest_key(keys):
+    """Key for record digests and site ids, so they reveal nothing about (sealed) plaintext"""
+    return hashlib.sha256(b"GenPass sync\0" + keys[-1]).digest()
+
+
+def tombstones_path(data_dir, username):
+    return os.path.join(data_dir, f"{username}{TOMBSTONE_SUFFIX}")
+
+
+def tombstone_usernames(data_dir):
+    """Users with a tombstones file, including ones whose vault is gone"""
+    return {name[:-len(TOMBSTONE_SUFFIX)] for name in os.listdir(data_dir)
+            if name.endswith(TOMBSTONE_SUFFIX)}
+
+
+def _read_tombstones(data_dir, username, cipher):
+    """A user's tombstones as {site: (token, deleted_at)}
+
+    Files written before site names were encrypted map names to times;
+    their token is None.
+    """
+    try:
+        with open(tombstones_path(data_dir, username), "r") as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if not isinstance(stored.get("encrypted"), dict):
+        return {site: (None, deleted_at) for site, deleted_at in stored.items()}
+    tombstones = {}
+    for token, deleted_at in stored["encrypted"].items():
+        site = cipher.decrypt(token.encode()).decode()
+        if site not in tombstones or tombstones[site][1] < deleted_at:
+            tombstones[site] = (token, deleted_at)
+    return tombstones
+
+
+def _write_tombstones(data_dir, username, tombstones, cipher):
+    encrypted = {}
+    for site, (token, deleted_at) in tombstones.items():
+        if token is None:
+            token = cipher.encrypt(site.encode()).decode()
+        encrypted[token] = deleted_at
+    atomic_write(tombstones_path(data_dir, username), json.dumps({"encrypted": encrypted}).encode())
+
+
+def load_tombstones(data_dir, username, cipher):
+    """Deleted sites of a user, as {site: deleted_at}
+
+    Site names are stored as Fernet tokens, so the file only shows how
+    many sites were deleted and when (and roughly how long their names are).
+    """
+    tombstones = _read_tombstones(data_dir, username, cipher)
+    return {site: deleted_at for site, (_, deleted_at) in tombstones.items()}
+
+
+def add_tombstones(backend, username, deleted, cipher):
+    """Remember deleted sites ({site: deleted_at}) so a sync can pass the deletion on"""
+    with backend.lock(username).exclusive():
+        # The key may have been rotated since the caller's cipher was built
+        cipher = backend.current_cipher(cipher)
+        tombstones = _read_tombstones(backend.data_dir, username, cipher)
+        tombstones.update((site, (None, deleted_at)) for site, deleted_at in deleted.items())
+        _write_tombstones(backend.data_dir, username, tombstones, cipher)
+        backend.record_change(username, list(deleted))
+
+
+def rotate_tombstones(backend, username, cipher):
+    """Re-encrypt a user's tombstones under the cipher's first key"""
+    with backend.lock(username).exclusive():
+        tombstones = _read_tombstones(backend.data_dir, username, cipher)
+        if tombstones:
+            _write_tombstones(backend.data_dir, username,
+                              {site: (None, deleted_at) for site, (_, deleted_at) in tombstones.items()},
+                              cipher)
+            backend.record_change(username, [])
+
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+def vault_signature(backend, username):
+    """Changes whenever a user's vault or tombstones file is rewritten"""
+    signature = backend.signature(username)
+    return [list(signature) if signature is not None else None,
+            _stat_signature(tombstones_path(backend.data_dir, username))]
+
+
+class SiteCodec:
+    """Deterministic, reversible encryption of site names into ids
+
+    An id is a 16-byte HMAC-SHA256 of the name followed by the name
+    encrypted with AES-CTR under that HMAC as nonce (the SIV construction),
+    in hex.  The same name always gives the same id, so ids can be
+    compared and bucketed like names, but only the key reads them back.
+    Ids still reveal each name's length.
+    """
+
+    def __init__(self, key):
+        self._mac_key = hashlib.sha256(b"site mac\0" + key).digest()
+        self._enc_key = hashlib.sha256(b"site enc\0" + key).digest()
+        self.key_id = hashlib.sha256(b"key id\0" + key).hexdigest()[:16]
+
+    def _crypt(self, iv, data):
+        cryptor = Cipher(algorithms.AES(self._enc_key), modes.CTR(iv)).encryptor()
+        return cryptor.update(data) + cryptor.finalize()
+
+    def encode(self, site):
+        data = site.encode()
+        iv = hmac.new(self._mac_key, data, hashlib.sha256).digest()[:16]
+        return (iv + self._crypt(iv, data)).hex()
+
+    def decode(self, site_id):
+        raw = bytes.fromhex(site_id)
+        iv = raw[:16]
+        data = self._crypt(iv, raw[16:])
+        if not hmac.compare_digest(iv, hmac.new(self._mac_key, data, hashlib.sha256).digest()[:16]):
+            raise ValueError("Site id was encrypted with another key")
+        return data.decode()
+
+
+class SyncJournal:
+    """Per-user list of the sites each write changed, for syncing
+
+    Backends append a line per commit while holding the vault's exclusive
+    lock: the generation the commit produced, the ids of the sites it
+    wrote and the vault's signature afterwards.  A sync reads the lines
+    since its cached Merkle tree to re-hash just those sites, then empties
+    the journal.  A generation missing from the journal means a write that
+    was not journaled, and the tree is rebuilt from the whole vault.
+    """
+
+    def __init__(self, key):
+        self.codec = SiteCodec(key)
+
+    @staticmethod
+    def path(data_dir, username):
+        return os.path.join(data_dir, f".{username}.journal")
+
+    def record(self, backend, username, sites, generation):
+        line = json.dumps({"generation": generation, "key": self.codec.key_id,
+                           "sites": [self.codec.encode(site) for site in sites],
+                           "signature": vault_signature(backend, username)},
+                          separators=(",", ":")).encode() + b"\n"
+        with open(self.path(backend.data_dir, username), "ab") as f:
+            if f.tell() + len(line) > MAX_JOURNAL_SIZE:
+                f.truncate(0)
+            f.write(line)
+
+    def read(self, data_dir, username):
+        """Journaled commits, oldest first, up to any torn last line"""
+        try:
+            with open(self.path(data_dir, username), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        commits = []
+        for line in data.split(b"\n")[:-1]:
+            try:
+                commits.append(json.loads(line))
+            except ValueError:
+                break
+        return commits
+
+    def clear(self, data_dir, username):
+        """Empty a user's journal; call with the exclusive lock held"""
+        path = self.path(data_dir, username)
+        if os.path.exists(path):
+            with open(path, "wb"):
+                pass
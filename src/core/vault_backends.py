@@ -0,0 +1,760 @@
+import json
+import logging
+import os
+import sqlite3
+import struct
+import threading
+from .key_files import build_cipher, key_files_signature, load_keys
+from .sealed_vault import derive_key, iter_seal, iter_unseal
+from .sync_journal import SyncJournal, digest_key
+from .vault_lock import VaultLock
+from .write_coordinator import WriteCoordinator, atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class VaultBackend:
+    """Where StorageManager keeps each user's encrypted entries
+
+    Entries are dicts with at least "site" and "password" (a Fernet token
+    string); backends store them as given and never see plaintext, except
+    those with `encrypts` set, which take plaintext passwords and encrypt
+    the whole vault themselves.  Entries returned by get() belong to the
+    backend and must not be modified.
+    Each user's vault has a VaultLock, which serialises writers across
+    processes and counts their changes.  Given the keys, every write is
+    also noted in the user's SyncJournal, so a sync can re-hash only the
+    sites that changed.  Writers compare the keys with the key files under
+    the exclusive lock and re-encrypt what they commit if another process
+    rotated the key, so nothing lands under a key a rotation has retired.
+    """
+
+    name = None
+    suffix = None
+    encrypts = False
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self._vault_locks = {}
+        self._vault_locks_guard = threading.Lock()
+        self.keys = None
+        self.journal = None
+        self._key_signature = None
+
+    def set_keys(self, keys):
+        """Use new Fernet keys, newest first (e.g. after a rotation started)"""
+        self.keys = list(keys)
+        self.journal = SyncJournal(digest_key(keys))
+        # Compared with the key files before the next write
+        self._key_signature = None
+
+    def _reload_keys(self):
+        """Switch to keys another process wrote to the key files since
+        set_keys(); call with the exclusive lock held, before committing"""
+        if self.journal is None:
+            return
+        signature = key_files_signature(self.data_dir)
+        if signature == self._key_signature:
+            return
+        keys = load_keys(self.data_dir)
+        if keys and keys != self.keys:
+            self.set_keys(keys)
+        self._key_signature = signature
+
+    def _current_entries(self, entries):
+        """entries with their tokens under the newest key; call with the exclusive lock held"""
+        old_keys = self.keys
+        self._reload_keys()
+        if self.encrypts or not old_keys or old_keys[0] == self.keys[0]:
+            return entries
+        return _rekey(entries, old_keys, self.keys)
+
+    def current_cipher(self, cipher):
+        """A MultiFernet of the newest keys, or cipher for a backend without
+        keys; call with the exclusive lock held"""
+        self._reload_keys()
+        return build_cipher(self.keys) if self.keys else cipher
+
+    def write_error(self):
+        """Why a write made in the background failed, once, or None"""
+        return None
+
+    def path(self, username):
+        return os.path.join(self.data_dir, f"{username}{self.suffix}")
+
+    def signature(self, username):
+        """Changes whenever a user's vault file is rewritten"""
+        return _file_signature(self.path(username))
+
+    def lock(self, username):
+        """The VaultLock of a user's vault"""
+        with self._vault_locks_guard:
+            vault_lock = self._vault_locks.get(username)
+            if vault_lock is None:
+                vault_lock = VaultLock(os.path.join(self.data_dir, f".{username}.lock"))
+                self._vault_locks[username] = vault_lock
+            return vault_lock
+
+    def record_change(self, username, sites):
+        """Count a write to sites of a user's vault; call with the exclusive lock held"""
+        generation = self.lock(username).bump()
+        if self.journal is not None:
+            try:
+                self.journal.record(self, username, sites, generation)
+            except Exception as e:
+                # The gap in the journal makes the next sync rebuild its tree
+                logger.error(f"Failed to journal vault change for {username}: {str(e)}")
+
+    def poll_changes(self, username):
+        """Whether another process changed a user's vault since the last poll"""
+        return self.lock(username).poll()
+
+    def usernames(self):
+        """Users that have a vault in this backend"""
+        try:
+            names = os.listdir(self.data_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(self.suffix)] for name in names if name.endswith(self.suffix))
+
+    def get(self, username, site):
+        raise NotImplementedError
+
+    def list_entries(self, username):
+        raise NotImplementedError
+
+    def list_metadata(self, username):
+        """Entries without their "password" token"""
+        return [{key: value for key, value in entry.items() if key != "password"}
+                for entry in self.list_entries(username)]
+
+    def put(self, username, entry):
+        self.put_many(username, [entry])
+
+    def put_many(self, username, entries):
+        raise NotImplementedError
+
+    def delete(self, username, site):
+        """Remove a site; return whether it existed"""
+        raise NotImplementedError
+
+    def close(self):
+        with self._vault_locks_guard:
+            for vault_lock in self._vault_locks.values():
+                vault_lock.close()
+            self._vault_locks.clear()
+
+
+def _rekey(entries, old_keys, keys):
+    """entries with tokens made under any of old_keys re-encrypted under keys[0]"""
+    cipher = build_cipher(keys + [key for key in old_keys if key not in keys])
+    return [dict(entry, password=cipher.rotate(entry["password"].encode()).decode())
+            for entry in entries]
+
+
+def _file_signature(filename):
+    """(inode, mtime_ns, size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class RewriteVaultBackend(VaultBackend):
+    """Base for formats that store each user's vault as one file
+
+    Each user's entries are cached as a site -> entry dict keyed on the
+    file's signature, so the file is only re-parsed when something else
+    changed it.  Files are replaced atomically, and a WriteCoordinator
+    groups changes into commits according to the durability setting.
+    Changes not yet written are also kept as a list of operations; if
+    another process replaced the file in the meantime, the write reloads
+    it under the exclusive lock and replays them, so no update is lost.
+    New keys, from set_keys() or the key files at write time, re-encrypt
+    the pending tokens (or re-seal the vault), so a late batch is
+    committed under the newest key.
+    Subclasses provide _serialize(entries), returning bytes or an iterable
+    of bytes, and _parse(data) or _parse_file(f).
+    """
+
+    def __init__(self, data_dir, durability="commit", window=0.0):
+        super().__init__(data_dir)
+        # username -> (signature, {site: entry})
+        self._cache = {}
+        # username -> [("put", entry) or ("del", site)] not yet written
+        self._pending = {}
+        self._lock = threading.RLock()
+        self.coordinator = WriteCoordinator(self._write, window, durability)
+
+    def _read(self, username):
+        """Parse a user's file under the shared lock; return (signature, index)"""
+        filename = self.path(username)
+        with self.lock(username).shared():
+            signature = _file_signature(filename)
+            entries = []
+            if signature is not None:
+                with open(filename, "rb") as f:
+                    entries = self._parse_file(f)
+        return signature, {entry["site"]: entry for entry in entries}
+
+    def _parse_file(self, f):
+        return self._parse(f.read())
+
+    def _load(self, username):
+        with self._lock:
+            filename = self.path(username)
+            cached = self._cache.get(username)
+            if cached is not None and self.coordinator.is_dirty(username):
+                # Unwritten changes are newer than the file
+                return cached[1]
+            if cached is not None and cached[0] == _file_signature(filename):
+                return cached[1]
+
+            self._cache[username] = self._read(username)
+            return self._cache[username][1]
+
+    def _write(self, username, fsync):
+        with self._lock, self.lock(username).exclusive():
+            # A batch may be written long after its tokens were made
+            self._reload_keys()
+            filename = self.path(username)
+            signature, index = self._cache[username]
+            operations = self._pending.pop(username, [])
+            try:
+                if _file_signature(filename) != signature:
+                    # Written by another process since we loaded it
+                    _, index = self._read(username)
+                    for operation, value in operations:
+                        if operation == "put":
+                            index[value["site"]] = value
+                        else:
+                            index.pop(value, None)
+                atomic_write(filename, self._serialize(list(index.values())), fsync)
+                self._cache[username] = (_file_signature(filename), index)
+                self.record_change(username, [value["site"] if operation == "put" else value
+                                              for operation, value in operations])
+            except Exception:
+                self._pending[username] = operations + self._pending.get(username, [])
+                raise
+
+    def set_keys(self, keys):
+        with self._lock:
+            old_keys = self.keys
+            super().set_keys(keys)
+            if self.encrypts or not old_keys or old_keys[0] == self.keys[0]:
+                return
+            # Unwritten tokens may be under a key the rotation is retiring
+            for username, operations in self._pending.items():
+                self._pending[username] = self._rekey_operations(username, operations, old_keys)
+
+    def _rekey_operations(self, username, operations, old_keys):
+        index = self._cache[username][1]
+        puts = [value for operation, value in operations if operation == "put"]
+        rekeyed = iter(_rekey(puts, old_keys, self.keys))
+        result = []
+        for operation, value in operations:
+            if operation == "put":
+                entry = next(rekeyed)
+                if index.get(value["site"]) is value:
+                    index[value["site"]] = entry
+                value = entry
+            result.append((operation, value))
+        return result
+
+    def write_error(self):
+        return self.coordinator.take_error()
+
+    def get(self, username, site):
+        with self._lock:
+            return self._load(username).get(site)
+
+    def list_entries(self, username):
+        with self._lock:
+            return [dict(entry) for entry in self._load(username).values()]
+
+    def put_many(self, username, entries):
+        with self._lock:
+            index = self._load(username)
+            operations = self._pending.setdefault(username, [])
+            for entry in entries:
+                entry = dict(entry)
+                index[entry["site"]] = entry
+                operations.append(("put", entry))
+        self.coordinator.mark_dirty(username)
+
+    def delete(self, username, site):
+        with self._lock:
+            if self._load(username).pop(site, None) is None:
+                return False
+            self._pending.setdefault(username, []).append(("del", site))
+        self.coordinator.mark_dirty(username)
+        return True
+
+    def close(self):
+        self.coordinator.close()
+        super().close()
+
+
+class JsonVaultBackend(RewriteVaultBackend):
+    """One pretty-printed JSON list per user"""
+
+    name = "json"
+    suffix = "_passwords.json"
+
+    def _serialize(self, entries):
+        return json.dumps(entries, indent=4).encode()
+
+    def _parse(self, data):
+        return json.loads(data)
+
+
+class BinaryVaultBackend(RewriteVaultBackend):
+    """Compact binary vault file per user
+
+    Layout: a little-endian header (magic, format version byte, entry
+    count and the byte length of each of the three tables that follow),
+    then the site table, the token table and the extra-field table.  Each
+    table holds one UTF-8 string per entry separated by NUL bytes: the site
+    name, the Fernet token text as stored in JSON, and any extra fields as
+    a JSON object (usually empty).  Loading decodes and splits each table
+    with one C-level call on a memoryview slice, with no JSON or base64
+    parsing per entry.  Readers reject versions they do not know, so the
+    layout can change.
+    """
+
+    name = "binary"
+    suffix = "_passwords.gpv"
+    MAGIC = b"GPVAULT"
+    VERSION = 1
+    _HEADER = struct.Struct("<7sBIQQQ")
+
+    def _serialize(self, entries):
+        sites = []
+        tokens = []
+        extras = []
+        for entry in entries:
+            if "\0" in entry["site"]:
+                raise ValueError("Site names in binary vaults cannot contain NUL characters")
+            sites.append(entry["site"])
+            tokens.append(entry["password"])
+            extra = {key: value for key, value in entry.items() if key not in ("site", "password")}
+            # JSON escapes control characters, so an encoded object never holds NUL
+            extras.append(json.dumps(extra) if extra else "")
+        tables = ["\0".join(column).encode() for column in (sites, tokens, extras)]
+        header = self._HEADER.pack(self.MAGIC, self.VERSION, len(entries), *map(len, tables))
+        return b"".join([header] + tables)
+
+    def _parse(self, data):
+        view = memoryview(data)
+        magic, version, count, *sizes = self._HEADER.unpack_from(view)
+        if magic != self.MAGIC:
+            raise ValueError("not a GenPass binary vault")
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported binary vault version {version}")
+        if self._HEADER.size + sum(sizes) != len(view):
+            raise ValueError("Binary vault is truncated or has trailing data")
+        if not count:
+            return []
+
+        columns = []
+        offset = self._HEADER.size
+        for size in sizes:
+            columns.append(str(view[offset:offset + size], "utf-8").split("\0"))
+            offset += size
+        sites, tokens, extras = columns
+        if not len(sites) == len(tokens) == len(extras) == count:
+            raise ValueError("Binary vault tables do not match its entry count")
+
+        entries = [{"site": site, "password": token} for site, token in zip(sites, tokens)]
+        if sizes[2] > count - 1:
+            # At least one entry has extra fields
+            for entry, extra in zip(entries, extras):
+                if extra:
+                    entry.update(json.loads(extra))
+        return entries
+
+
+class SealedVaultBackend(RewriteVaultBackend):
+    """Whole-vault AES-GCM container per user, compressed before sealing
+
+    Entries are stored as JSON lines with plaintext passwords, compressed
+    (zlib, lzma or not at all) and encrypted in chunk_size pieces by
+    sealed_vault, so the file reveals nothing but its approximate size and
+    a change anywhere re-seals the vault.  Saving and loading stream
+    through the chunks.  The AES keys are derived from the Fernet keys:
+    the first seals, and any of them opens a vault, which lets key
+    rotation work as for the other formats.  Unlike them, this backend
+    holds decrypted passwords in memory while a vault is cached.
+    """
+
+    name = "sealed"
+    suffix = "_passwords.gpse"
+    encrypts = True
+    # Entries compressed per call when sealing
+    BATCH = 1024
+
+    def __init__(self, data_dir, durability="commit", window=0.0, keys=None,
+                 compression="zlib", chunk_size=65536):
+        super().__init__(data_dir, durability, window)
+        if not keys:
+            raise ValueError("Sealed vaults need the encryption keys")
+        self.compression = compression
+        self.chunk_size = chunk_size
+        self.set_keys(keys)
+
+    def set_keys(self, keys):
+        super().set_keys(keys)
+        self._keys = [derive_key(key) for key in keys]
+
+    def _serialize(self, entries):
+        def lines():
+            for start in range(0, len(entries), self.BATCH):
+                yield b"".join(json.dumps(entry, separators=(",", ":")).encode() + b"\n"
+                               for entry in entries[start:start + self.BATCH])
+        return iter_seal(lines(), self._keys[0], self.compression, self.chunk_size)
+
+    def _parse_file(self, f):
+        entries = []
+        tail = b""
+        for data in iter_unseal(f, self._keys):
+            lines = (tail + data).split(b"\n")
+            tail = lines.pop()
+            if lines:
+                entries.extend(json.loads(b"[" + b",".join(lines) + b"]"))
+        if tail:
+            raise ValueError("Sealed vault ends in the middle of an entry")
+        return entries
+
+
+class _LogState:
+    """Replayed view of one user's log"""
+
+    def __init__(self):
+        self.index = {}
+        self.inode = None
+        # End of the last complete record
+        self.offset = 0
+        self.records = 0
+
+    @property
+    def dead(self):
+        return self.records - len(self.index)
+
+
+class LogVaultBackend(VaultBackend):
+    """Append-only per-user log of put/delete records, one JSON line each
+
+    A mutation appends a single line, so its cost does not depend on the
+    vault size.  Reads replay the log into a site -> entry index once and
+    then only replay lines appended since.  A crash can at worst leave a
+    torn final line, which replay ignores and the next append cuts off.
+    Once dead (overwritten or deleted) records outnumber both
+    compact_threshold and the live entries, the log is rewritten with only
+    live entries in a background thread, which keeps compaction amortised
+    O(1) per write.
+    """
+
+    name = "log"
+    suffix = "_passwords.log"
+
+    def __init__(self, data_dir, compact_threshold=1000, fsync=True):
+        super().__init__(data_dir)
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self._states = {}
+        self._lock = threading.RLock()
+        self._compactions = {}
+
+    def _load(self, username):
+        filename = self.path(username)
+        state = self._states.get(username)
+        signature = _file_signature(filename)
+        if (state is not None and signature is not None
+                and signature[0] == state.inode and signature[2] == state.offset):
+            # Nothing appended since the last replay
+            return state
+        # Stat again under the lock: a compaction finishing in between
+        # would otherwise have the replay seek into its new file
+        with self.lock(username).shared():
+            signature = _file_signature(filename)
+            if signature is None:
+                state = self._states[username] = _LogState()
+                return state
+            inode, _, size = signature
+            if state is None or state.inode != inode or size < state.offset:
+                # New file, or replaced by a compaction elsewhere
+                state = self._states[username] = _LogState()
+                state.inode = inode
+            if size > state.offset:
+                self._replay(filename, state)
+        return state
+
+    @staticmethod
+    def _replay(filename, state):
+        index = state.index
+        with open(filename, "rb") as f:
+            f.seek(state.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                if record["op"] == "put":
+                    entry = record["entry"]
+                    index[entry["site"]] = entry
+                elif record["op"] == "del":
+                    index.pop(record["site"], None)
+                else:
+                    raise ValueError(f"Unknown vault log record: {record['op']}")
+                state.offset += len(line)
+                state.records += 1
+
+    def _append(self, username, state, records):
+        filename = self.path(username)
+        data = b"".join(json.dumps(record, separators=(",", ":")).encode() + b"\n"
+                        for record in records)
+        try:
+            with open(filename, "ab") as f:
+                if f.tell() != state.offset:
+                    # Drop a torn record left by a crash
+                    f.truncate(state.offset)
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception:
+            self._states.pop(username, None)
+            raise
+        if state.inode is None:
+            state.inode = os.stat(filename).st_ino
+        state.offset += len(data)
+        state.records += len(records)
+        self._maybe_compact(username, state)
+
+    def get(self, username, site):
+        with self._lock:
+            return self._load(username).index.get(site)
+
+    def list_entries(self, username):
+        with self._lock:
+            return [dict(entry) for entry in self._load(username).index.values()]
+
+    def put_many(self, username, entries):
+        vault_lock = self.lock(username)
+        with self._lock, vault_lock.exclusive():
+            entries = self._current_entries(entries)
+            # Catch up with other processes' records before appending
+            state = self._load(username)
+            records = []
+            for entry in entries:
+                entry = dict(entry)
+                records.append({"op": "put", "entry": entry})
+                state.index[entry["site"]] = entry
+            self._append(username, state, records)
+            self.record_change(username, [entry["site"] for entry in entries])
+
+    def delete(self, username, site):
+        vault_lock = self.lock(username)
+        with self._lock, vault_lock.exclusive():
+            state = self._load(username)
+            if state.index.pop(site, None) is None:
+                return False
+            self._append(username, state, [{"op": "del", "site": site}])
+            self.record_change(username, [site])
+            return True
+
+    def _maybe_compact(self, username, state):
+        if state.dead <= max(self.compact_threshold, len(state.index)):
+            return
+        running = self._compactions.get(username)
+        if running is not None and running.is_alive():
+            return
+        thread = threading.Thread(target=self._compact_in_background, args=(username,), daemon=True)
+        self._compactions[username] = thread
+        thread.start()
+
+    def _compact_in_background(self, username):
+        try:
+            self.compact(username)
+        except Exception as e:
+            # The log is still intact; compaction is retried after later writes
+            logger.error(f"Failed to compact vault log for {username}: {str(e)}")
+
+    def compact(self, username):
+        """Rewrite a user's log with one record per live entry"""
+        with self._lock, self.lock(username).exclusive():
+            state = self._load(username)
+            filename = self.path(username)
+            atomic_write(filename, b"".join(
+                json.dumps({"op": "put", "entry": entry}, separators=(",", ":")).encode() + b"\n"
+                for entry in state.index.values()))
+            stat = os.stat(filename)
+            state.inode = stat.st_ino
+            state.offset = stat.st_size
+            state.records = len(state.index)
+            # Nothing changed, but the file did
+            self.record_change(username, [])
+
+    def close(self):
+        for thread in list(self._compactions.values()):
+            thread.join()
+        self._compactions.clear()
+        super().close()
+
+
+class SqliteVaultBackend(VaultBackend):
+    """All users' entries in one SQLite table indexed on (username, site)
+
+    The database runs in WAL mode so readers never block the writer, every
+    statement is a fixed parameterised query (cached by sqlite3), and each
+    put_many() is a single transaction.  SQLite does its own locking; the
+    vault locks here only order the generation counters.  Fields other than site and
+    password are kept as a JSON object in the extra column.
+    """
+
+    name = "sqlite"
+    filename = "vault.db"
+
+    def __init__(self, data_dir, fsync=True):
+        super().__init__(data_dir)
+        self.db_path = os.path.join(data_dir, self.filename)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._create_tables()
+        # FULL syncs the WAL on every commit; NORMAL only at checkpoints
+        self.conn.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+
+    def _create_tables(self):
+        """Create the entries table and index if they don't exist"""
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    username TEXT NOT NULL,
+                    site TEXT NOT NULL,
+                    password TEXT NOT NULL,
+                    extra TEXT
+                )
+            ''')
+            self.conn.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS entries_user_site
+                ON entries (username, site)
+            ''')
+            self.conn.commit()
+
+    def path(self, username):
+        return self.db_path
+
+    def signature(self, username):
+        # Shared by all users and touched by checkpoints; the generation
+        # counters already track each user's changes
+        return None
+
+    def usernames(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT DISTINCT username FROM entries ORDER BY username")
+            return [row[0] for row in rows]
+
+    @staticmethod
+    def _to_entry(row):
+        site, password, extra = row
+        entry = {"site": site, "password": password}
+        if extra:
+            entry.update(json.loads(extra))
+        return entry
+
+    @staticmethod
+    def _to_row(username, entry):
+        extra = {key: value for key, value in entry.items() if key not in ("site", "password")}
+        return (username, entry["site"], entry["password"], json.dumps(extra) if extra else None)
+
+    def get(self, username, site):
+        query = "SELECT site, password, extra FROM entries WHERE username = ? AND site = ?"
+        with self._lock:
+            row = self.conn.execute(query, (username, site)).fetchone()
+        return self._to_entry(row) if row else None
+
+    def list_entries(self, username):
+        query = "SELECT site, password, extra FROM entries WHERE username = ? ORDER BY rowid"
+        with self._lock:
+            rows = self.conn.execute(query, (username,)).fetchall()
+        return [self._to_entry(row) for row in rows]
+
+    def list_metadata(self, username):
+        query = "SELECT site, extra FROM entries WHERE username = ? ORDER BY rowid"
+        with self._lock:
+            rows = self.conn.execute(query, (username,)).fetchall()
+        entries = []
+        for site, extra in rows:
+            entry = {"site": site}
+            if extra:
+                entry.update(json.loads(extra))
+            entries.append(entry)
+        return entries
+
+    def put_many(self, username, entries):
+        # Updating in place keeps the rowid, so listing order stays insertion order
+        query = '''
+            INSERT INTO entries (username, site, password, extra) VALUES (?, ?, ?, ?)
+            ON CONFLICT (username, site) DO UPDATE
+            SET password = excluded.password, extra = excluded.extra
+        '''
+        vault_lock = self.lock(username)
+        with self._lock, vault_lock.exclusive():
+            entries = self._current_entries(entries)
+            with self.conn:
+                self.conn.executemany(query, (self._to_row(username, entry) for entry in entries))
+            self.record_change(username, [entry["site"] for entry in entries])
+
+    def delete(self, username, site):
+        query = "DELETE FROM entries WHERE username = ? AND site = ?"
+        vault_lock = self.lock(username)
+        with self._lock, vault_lock.exclusive():
+            with self.conn:
+                deleted = self.conn.execute(query, (username, site)).rowcount > 0
+            if deleted:
+                self.record_change(username, [site])
+            return deleted
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+        super().close()
+
+
+BACKENDS = {
+    JsonVaultBackend.name: JsonVaultBackend,
+    BinaryVaultBackend.name: BinaryVaultBackend,
+    SealedVaultBackend.name: SealedVaultBackend,
+    LogVaultBackend.name: LogVaultBackend,
+    SqliteVaultBackend.name: SqliteVaultBackend,
+}
+
+
+def create_backend(settings, data_dir, name=None, keys=None):
+    """Instantiate a backend, by default the one the settings select
+
+    keys (Fernet keys, newest first) are required by backends that encrypt,
+    and turn on the sync journal for the others.
+    """
+    name = name or settings.get("storage_backend") or "json"
+    durability = settings.get("vault_durability", "commit")
+    window = settings.get("group_commit_window_ms", 0) / 1000
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {name}")
+    if backend_class is SealedVaultBackend:
+        return SealedVaultBackend(data_dir, durability, window, keys,
+                                  settings.get("sealed_compression", "zlib"),
+                                  settings.get("sealed_chunk_size", 65536))
+    if issubclass(backend_class, RewriteVaultBackend):
+        backend = backend_class(data_dir, durability, window)
+    elif backend_class is LogVaultBackend:
+        backend = LogVaultBackend(data_dir, settings.get("log_compact_threshold", 1000),
+                                  durability == "commit")
+    else:
+        backend = backend_class(data_dir, durability == "commit")
+    if keys:
+        backend.set_keys(keys)
+    return backend
@@ -0,0 +1,92 @@
+import csv
+from urllib.parse import urlsplit
+
+# Column names per export format.  Formats are tried in order and the
+# first whose required columns are all in the header is used, so the more
+# specific layouts come first.
+IMPORT_FORMATS = {
+    "bitwarden": {"required": {"login_uri", "login_password"}, "site": "name",
+                  "url": "login_uri", "password": "login_password"},
+    "keepass": {"required": {"Account", "Password"}, "site": "Account",
+                "url": "Web Site", "password": "Password"},
+    "1password": {"required": {"Title", "Password"}, "site": "Title",
+                  "url": "Url", "password": "Password"},
+    "firefox": {"required": {"url", "password", "httpRealm"}, "site": None,
+                "url": "url", "password": "password"},
+    "lastpass": {"required": {"url", "password", "grouping"}, "site": "name",
+                 "url": "url", "password": "password"},
+    # Also Edge, Brave, Opera and Safari
+    "chrome": {"required": {"name", "url", "password"}, "site": "name",
+               "url": "url", "password": "password"},
+    "genpass": {"required": {"site", "password"}, "site": "site",
+                "url": None, "password": "password"},
+}
+
+EXPORT_FORMATS = ("genpass", "chrome")
+
+
+def detect_format(header):
+    """Name of the import format matching a CSV header row"""
+    columns = {column.strip() for column in header}
+    for name, spec in IMPORT_FORMATS.items():
+        if spec["required"] <= columns:
+            return name
+    raise ValueError("Unrecognised CSV export; expected a header with site/name and password columns")
+
+
+def _site_from_url(url):
+    host = urlsplit(url if "//" in url else f"//{url}").hostname or url
+    return host[4:] if host.startswith("www.") else host
+
+
+def iter_import_rows(f, format_name=None):
+    """Lazily yield (site, password) from an open CSV export
+
+    The header picks the format unless format_name is given.  Sites fall
+    back to the URL's host name when the export has no name column or it is
+    empty, and rows without a site or password are skipped.
+    """
+    reader = csv.reader(f)
+    header = [column.strip() for column in next(reader, [])]
+    if not header:
+        return
+    format_name = format_name or detect_format(header)
+    try:
+        spec = IMPORT_FORMATS[format_name]
+    except KeyError:
+        raise ValueError(f"Unknown import format: {format_name}")
+    if not spec["required"] <= set(header):
+        raise ValueError(f"CSV header does not match the {format_name} format")
+
+    column = {name: i for i, name in enumerate(header)}
+    site_at = column.get(spec["site"])
+    url_at = column.get(spec["url"])
+    password_at = column[spec["password"]]
+    for row in reader:
+        if len(row) <= password_at or not row[password_at]:
+            continue
+        site = row[site_at].strip() if site_at is not None and site_at < len(row) else ""
+        if not site and url_at is not None and url_at < len(row) and row[url_at].strip():
+            site = _site_from_url(row[url_at].strip())
+        if site:
+            yield site, row[password_at]
+
+
+def write_export_rows(f, rows, format_name="genpass"):
+    """Stream (site, password) pairs to f as CSV; return the row count"""
+    if format_name not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format_name}")
+    writer = csv.writer(f)
+    count = 0
+    if format_name == "genpass":
+        writer.writerow(["site", "password"])
+        for site, password in rows:
+            writer.writerow([site, password])
+            count += 1
+    else:
+        writer.writerow(["name", "url", "username", "password"])
+        for site, password in rows:
+            url = f"https://{site}" if "." in site and " " not in site else ""
+            writer.writerow([site, url, "", password])
+            count += 1
+    return count
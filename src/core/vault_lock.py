@@ -0,0 +1,82 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (Windows); only threads are serialised
+    fcntl = None
+
+
+class VaultLock:
+    """Reader-writer lock on one vault, shared between processes
+
+    Backed by flock() on a small lock file, which also holds the vault's
+    generation: a counter every writer increments under the exclusive lock.
+    Polling the counter is one 8-byte read, so a process can tell whether
+    anyone else changed the vault without looking at the vault itself.
+    Within a process, threads take turns and re-entry is allowed; a thread
+    holding the shared lock must not ask for the exclusive one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        # Last generation this process knows the vault contents for
+        self.seen = self.generation()
+
+    @contextmanager
+    def _locked(self, operation):
+        with self._thread_lock:
+            if self._depth == 0 and fcntl is not None:
+                fcntl.flock(self._fd, operation)
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def shared(self):
+        """Hold the lock for reading; other readers may hold it too"""
+        return self._locked(fcntl.LOCK_SH if fcntl else None)
+
+    def exclusive(self):
+        """Hold the lock for writing, excluding readers and writers"""
+        return self._locked(fcntl.LOCK_EX if fcntl else None)
+
+    def _read(self):
+        with self._thread_lock:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            data = os.read(self._fd, 8)
+        return int.from_bytes(data, "little") if len(data) == 8 else 0
+
+    def generation(self):
+        """Current generation of the vault"""
+        return self._read()
+
+    def bump(self):
+        """Record a change made by this process; call with the exclusive lock held"""
+        with self._thread_lock:
+            value = self._read()
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            os.write(self._fd, (value + 1).to_bytes(8, "little"))
+            # Only count the change as seen if nothing else changed the
+            # vault since this process last looked
+            if value == self.seen:
+                self.seen = value + 1
+            return value + 1
+
+    def poll(self):
+        """Whether another process changed the vault since the last poll"""
+        value = self._read()
+        changed = value != self.seen
+        self.seen = value
+        return changed
+
+    def close(self):
+        os.close(self._fd)
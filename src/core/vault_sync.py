@@ -0,0 +1,476 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import shutil
+import time
+from .key_rotation import build_cipher, load_keys
+from .sync_journal import (SiteCodec, add_tombstones, digest_key, load_tombstones, tombstone_usernames,
+                           vault_signature)
+from .vault_backends import create_backend
+from .write_coordinator import atomic_write
+
+SYNC_POLICIES = ("last-writer-wins", "conflict-copy")
+# Hex digits of the site id per leaf bucket: 16**3 = 4096 buckets
+DEPTH = 3
+
+
+def record_digest(record, key):
+    """Keyed hash of an entry or tombstone, identical for identical contents"""
+    data = json.dumps(record, sort_keys=True, separators=(",", ":")).encode()
+    return hmac.new(key, data, hashlib.sha256).hexdigest()[:32]
+
+
+def _timestamp(record):
+    return record.get("deleted_at", record.get("updated_at", 0))
+
+
+def leaf_hash(leaf):
+    """Hash of one bucket's {site id: digest}, or None if it is empty"""
+    if not leaf:
+        return None
+    lines = sorted(f"{site_id}\0{digest}" for site_id, digest in leaf.items())
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+class StaleTreeError(Exception):
+    """A cached leaf does not match the tree saved with it"""
+
+
+class MerkleTree:
+    """Hash tree over one user's entries and tombstones
+
+    Sites are bucketed by the first DEPTH hex digits of their id (see
+    SiteCodec), and each tree node hashes the hashes of its (up to 16)
+    children, so two trees are compared by walking down only the nodes
+    that differ: the work grows with the number of differing buckets, not
+    the vault size.  The leaves keep each site's record digest, so a
+    changed site only re-hashes its bucket and the nodes above it.  A tree
+    loaded from disk reads a bucket's leaf only when it is first used,
+    through load_leaf(bucket, expected node hash).
+    """
+
+    def __init__(self, nodes=None, load_leaf=None):
+        # hex prefix ("" is the root) -> node hash, for non-empty nodes
+        self.nodes = nodes if nodes is not None else {}
+        # bucket -> {site id: record digest}, for the buckets read so far
+        self.leaves = {}
+        self._load_leaf = load_leaf
+        self._dirty = set()
+        # Buckets whose leaves changed since the tree was loaded
+        self.changed = set()
+
+    @classmethod
+    def build(cls, digests):
+        """Tree over {site id: record digest}"""
+        tree = cls()
+        for site_id, digest in digests.items():
+            tree.set(site_id, digest)
+        tree.rehash()
+        return tree
+
+    def buckets(self):
+        """Non-empty leaf buckets"""
+        return [prefix for prefix in self.nodes if len(prefix) == DEPTH]
+
+    def leaf(self, bucket):
+        leaf = self.leaves.get(bucket)
+        if leaf is None:
+            leaf = self._load_leaf(bucket, self.nodes.get(bucket)) if self._load_leaf else {}
+            self.leaves[bucket] = leaf
+        return leaf
+
+    def get(self, site_id):
+        return self.leaf(site_id[:DEPTH]).get(site_id)
+
+    def set(self, site_id, digest):
+        """Change a site's digest (None removes it); call rehash() before comparing"""
+        bucket = site_id[:DEPTH]
+        leaf = self.leaf(bucket)
+        if digest is None:
+            leaf.pop(site_id, None)
+        else:
+            leaf[site_id] = digest
+        self._dirty.add(bucket)
+        self.changed.add(bucket)
+
+    def rehash(self):
+        """Recompute the hashes of changed buckets and of the nodes above them"""
+        level = self._dirty
+        for bucket in level:
+            digest = leaf_hash(self.leaves[bucket])
+            if digest is not None:
+                self.nodes[bucket] = digest
+            else:
+                self.nodes.pop(bucket, None)
+        for _ in range(DEPTH):
+            level = {prefix[:-1] for prefix in level}
+            for prefix in level:
+                children = [digit + self.nodes[prefix + digit] for digit in "0123456789abcdef"
+                            if prefix + digit in self.nodes]
+                if children:
+                    self.nodes[prefix] = hashlib.sha256("".join(children).encode()).hexdigest()
+                else:
+                    self.nodes.pop(prefix, None)
+        self._dirty = set()
+
+    @property
+    def root(self):
+        return self.nodes.get("")
+
+    def diff(self, other):
+        """Leaf buckets whose contents differ between the two trees"""
+        buckets = []
+        pending = [""]
+        while pending:
+            prefix = pending.pop()
+            if self.nodes.get(prefix) == other.nodes.get(prefix):
+                continue
+            if len(prefix) == DEPTH:
+                buckets.append(prefix)
+            else:
+                pending.extend(prefix + digit for digit in "0123456789abcdef")
+        return set(buckets)
+
+
+class SyncSide:
+    """One data directory taking part in a sync
+
+    Besides the vault itself it keeps, as dotfiles that backups skip, each
+    user's Merkle tree as of its last use, and per peer the digests that
+    sites changed here since the last sync with that peer had then (its
+    base), which tell a one-sided change from a conflict.  The tree is
+    brought up to date from the vault's SyncJournal, re-reading only the
+    sites written since, and every change to a leaf is noted in the bases
+    of all peers first.  Each bucket's leaf is kept in its own file, so
+    only the buckets those sites fall in are read and rewritten.  Site
+    names appear only as SiteCodec ids.
+    """
+
+    def __init__(self, settings, data_dir, keys):
+        self.data_dir = data_dir
+        # Changes must be on disk before the tree cache records them
+        self.backend = create_backend(dict(settings, vault_durability="commit"), data_dir, keys=keys)
+        self.cipher = build_cipher(keys)
+        self.key = digest_key(keys)
+        self.codec = SiteCodec(self.key)
+        self.id = self._load_id()
+
+    def _load_id(self):
+        path = os.path.join(self.data_dir, ".sync_id")
+        try:
+            with open(path, "r") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            sync_id = secrets.token_hex(8)
+            atomic_write(path, sync_id.encode())
+            return sync_id
+
+    def usernames(self):
+        return set(self.backend.usernames()) | tombstone_usernames(self.data_dir)
+
+    def _tree_path(self, username):
+        return os.path.join(self.data_dir, f".{username}.merkle.json")
+
+    def _leaf_dir(self, username):
+        return os.path.join(self.data_dir, f".{username}.merkle")
+
+    def _leaf_path(self, username, bucket):
+        return os.path.join(self._leaf_dir(username), f"{bucket}.json")
+
+    def _base_path(self, username, peer_id):
+        return os.path.join(self.data_dir, f".{username}.sync-{peer_id}.json")
+
+    def _peer_ids(self, username):
+        prefix = f".{username}.sync-"
+        return [name[len(prefix):-len(".json")] for name in os.listdir(self.data_dir)
+                if name.startswith(prefix) and name.endswith(".json")]
+
+    def record(self, username, site, tombstones):
+        """A site's entry, its tombstone if it was deleted, or None"""
+        entry = self.backend.get(username, site)
+        if entry is not None:
+            return dict(entry)
+        if site in tombstones:
+            return {"site": site, "deleted_at": tombstones[site]}
+        return None
+
+    def _digests(self, username):
+        """Digest of every entry and tombstone, by site id"""
+        records = {entry["site"]: entry for entry in self.backend.list_entries(username)}
+        for site, deleted_at in load_tombstones(self.data_dir, username, self.cipher).items():
+            if site not in records:
+                records[site] = {"site": site, "deleted_at": deleted_at}
+        return {self.codec.encode(site): record_digest(record, self.key)
+                for site, record in records.items()}
+
+    def _load_tree(self, username):
+        try:
+            with open(self._tree_path(username), "r") as f:
+                cached = json.load(f)
+            if cached["key"] == self.codec.key_id and cached["backend"] == self.backend.name:
+                return cached
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        return None
+
+    def _load_leaf(self, username, bucket, expected):
+        try:
+            with open(self._leaf_path(username, bucket), "r") as f:
+                leaf = json.load(f)
+        except FileNotFoundError:
+            leaf = {}
+        except ValueError:
+            leaf = None
+        if not isinstance(leaf, dict) or leaf_hash(leaf) != expected:
+            # Left by an interrupted save; the next tree() starts over
+            try:
+                os.remove(self._tree_path(username))
+            except FileNotFoundError:
+                pass
+            raise StaleTreeError(f"Merkle tree leaf {bucket} of {username} is out of date")
+        return leaf
+
+    def _journaled_sites(self, username, cached):
+        """Site ids written since the cached tree, or None if some write was not journaled"""
+        commits = self.backend.journal.read(self.data_dir, username)
+        generation = cached["generation"]
+        signature = cached["signature"]
+        sites = set()
+        for commit in commits:
+            if commit["generation"] <= cached["generation"]:
+                continue
+            if commit["generation"] != generation + 1 or commit["key"] != self.codec.key_id:
+                return None
+            generation = commit["generation"]
+            signature = commit["signature"]
+            sites.update(commit["sites"])
+        if (generation != self.backend.lock(username).generation()
+                or signature != vault_signature(self.backend, username)):
+            return None
+        return sites
+
+    def tree(self, username):
+        """The user's Merkle tree, updated for writes since it was last used
+
+        Call with the vault's exclusive lock held.
+        """
+        cached = self._load_tree(username)
+        if cached is not None:
+            tree = MerkleTree(cached["nodes"],
+                              lambda bucket, expected: self._load_leaf(username, bucket, expected))
+            try:
+                sites = self._journaled_sites(username, cached)
+                if sites is not None:
+                    tombstones = load_tombstones(self.data_dir, username, self.cipher) if sites else {}
+                    changes = {}
+                    for site_id in sites:
+                        record = self.record(username, self.codec.decode(site_id), tombstones)
+                        changes[site_id] = record_digest(record, self.key) if record is not None else None
+                else:
+                    changes = dict.fromkeys(site_id for bucket in tree.buckets()
+                                            for site_id in tree.leaf(bucket))
+                    changes.update(self._digests(username))
+                self._apply_changes(username, tree, changes)
+                if sites is None or sites:
+                    self._save_tree(username, tree)
+                return tree
+            except StaleTreeError:
+                pass
+
+        # What changed since the last sync is unknown
+        for peer_id in self._peer_ids(username):
+            os.remove(self._base_path(username, peer_id))
+        shutil.rmtree(self._leaf_dir(username), ignore_errors=True)
+        tree = MerkleTree.build(self._digests(username))
+        self._save_tree(username, tree)
+        return tree
+
+    def _apply_changes(self, username, tree, changes):
+        """Set {site id: digest}, noting old digests in every peer's base first"""
+        changed = {site_id: digest for site_id, digest in changes.items() if tree.get(site_id) != digest}
+        if not changed:
+            return
+        for peer_id in self._peer_ids(username):
+            base = self._read_base(username, peer_id)
+            if base is not None:
+                for site_id in changed:
+                    base.setdefault(site_id, tree.get(site_id))
+                self._write_base(username, peer_id, base)
+        for site_id, digest in changed.items():
+            tree.set(site_id, digest)
+        tree.rehash()
+
+    def _save_tree(self, username, tree):
+        """Write the changed leaves, then the nodes they hash to"""
+        os.makedirs(self._leaf_dir(username), mode=0o700, exist_ok=True)
+        for bucket in tree.changed:
+            path = self._leaf_path(username, bucket)
+            leaf = tree.leaves[bucket]
+            if leaf:
+                atomic_write(path, json.dumps(leaf, separators=(",", ":")).encode(), fsync=False)
+            elif os.path.exists(path):
+                os.remove(path)
+        tree.changed = set()
+        cached = {"key": self.codec.key_id, "backend": self.backend.name,
+                  "generation": self.backend.lock(username).generation(),
+                  "signature": vault_signature(self.backend, username),
+                  "nodes": tree.nodes}
+        atomic_write(self._tree_path(username), json.dumps(cached, separators=(",", ":")).encode(),
+                     fsync=False)
+        self.backend.journal.clear(self.data_dir, username)
+
+    def _read_base(self, username, peer_id):
+        try:
+            with open(self._base_path(username, peer_id), "r") as f:
+                return json.load(f)["changed"]
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_base(self, username, peer_id, base):
+        atomic_write(self._base_path(username, peer_id),
+                     json.dumps({"changed": base}, separators=(",", ":")).encode())
+
+    def load_base(self, username, peer):
+        """Digests at the last sync with peer of the sites changed here since,
+        as {site id: digest or None}, or None if never synced"""
+        return self._read_base(username, peer.id)
+
+    def save_base(self, username, peer, base):
+        self._write_base(username, peer.id, base)
+
+    def apply(self, username, records):
+        """Store records (entries, or tombstones for deletions)"""
+        entries = [record for record in records if "deleted_at" not in record]
+        deleted = {record["site"]: record["deleted_at"] for record in records if "deleted_at" in record}
+        if entries:
+            self.backend.put_many(username, entries)
+        for site in deleted:
+            self.backend.delete(username, site)
+        if deleted:
+            add_tombstones(self.backend, username, deleted, self.cipher)
+
+    def close(self):
+        self.backend.close()
+
+
+def _conflict_copy(record):
+    stamp = time.strftime("%Y-%m-%d %H%M%S", time.localtime(_timestamp(record)))
+    return dict(record, site=f"{record['site']} (conflict {stamp})")
+
+
+def _resolve(record_a, record_b, base_digest, key, policy):
+    """Records both sides should hold for one site that differs between them"""
+    digest_a = record_digest(record_a, key) if record_a else None
+    digest_b = record_digest(record_b, key) if record_b else None
+    if record_b is None or (base_digest is not None and digest_b == base_digest):
+        return [record_a]
+    if record_a is None or (base_digest is not None and digest_a == base_digest):
+        return [record_b]
+    # Changed on both sides (or never synced): newest wins, ties by digest
+    if (_timestamp(record_a), digest_a) >= (_timestamp(record_b), digest_b):
+        winner, loser = record_a, record_b
+    else:
+        winner, loser = record_b, record_a
+    if policy == "conflict-copy" and "deleted_at" not in loser:
+        return [winner, _conflict_copy(loser)]
+    return [winner]
+
+
+def _differing_leaves(side_a, side_b, username):
+    """Both trees and the buckets that differ, with their leaves read"""
+    tree_a = side_a.tree(username)
+    tree_b = side_b.tree(username)
+    buckets = tree_a.diff(tree_b)
+    for bucket in buckets:
+        tree_a.leaf(bucket)
+        tree_b.leaf(bucket)
+    return tree_a, tree_b, buckets
+
+
+def sync_user(side_a, side_b, username, policy="last-writer-wins"):
+    """Bring one user's vault to the same state on both sides
+
+    Only the sites in buckets whose hashes differ are read.  Returns
+    (records copied to a, records copied to b).
+    """
+    # Both vaults are locked for the whole sync, in a fixed order so two
+    # syncs of the same pair in opposite directions cannot deadlock
+    locks = sorted((side_a.backend.lock(username), side_b.backend.lock(username)),
+                   key=lambda vault_lock: os.path.realpath(vault_lock.path))
+    with locks[0].exclusive(), locks[1].exclusive():
+        try:
+            tree_a, tree_b, buckets = _differing_leaves(side_a, side_b, username)
+        except StaleTreeError:
+            # The stale cache was dropped; tree() now rebuilds it
+            tree_a, tree_b, buckets = _differing_leaves(side_a, side_b, username)
+        base_a = side_a.load_base(username, side_b)
+        base_b = side_b.load_base(username, side_a)
+        if not buckets and base_a == {} and base_b == {}:
+            return 0, 0
+
+        tombstones_a = load_tombstones(side_a.data_dir, username, side_a.cipher) if buckets else {}
+        tombstones_b = load_tombstones(side_b.data_dir, username, side_b.cipher) if buckets else {}
+        to_a = {}
+        to_b = {}
+        for bucket in buckets:
+            leaf_a = tree_a.leaf(bucket)
+            leaf_b = tree_b.leaf(bucket)
+            for site_id in set(leaf_a) | set(leaf_b):
+                if leaf_a.get(site_id) == leaf_b.get(site_id):
+                    continue
+                site = side_a.codec.decode(site_id)
+                record_a = side_a.record(username, site, tombstones_a)
+                record_b = side_b.record(username, site, tombstones_b)
+                # Without a base every difference counts as a conflict
+                base_digest = None
+                if base_a is not None and base_b is not None:
+                    base_digest = base_a[site_id] if site_id in base_a else base_b.get(site_id)
+                for record in _resolve(record_a, record_b, base_digest, side_a.key, policy):
+                    if record["site"] != site:
+                        # A conflict copy; the name is new to both sides
+                        to_a[record["site"]] = to_b[record["site"]] = record
+                        continue
+                    if record_a != record:
+                        to_a[site] = record
+                    if record_b != record:
+                        to_b[site] = record
+
+        side_a.apply(username, list(to_a.values()))
+        side_b.apply(username, list(to_b.values()))
+
+        # Fold in the writes just made; both sides now hold the same records
+        side_a.tree(username)
+        side_b.tree(username)
+        side_a.save_base(username, side_b, {})
+        side_b.save_base(username, side_a, {})
+        return len(to_a), len(to_b)
+
+
+def sync_dirs(settings, dir_a, dir_b, policy="last-writer-wins", progress=None):
+    """Sync every user's vault between two data directories
+
+    Both must use the same encryption key, since entries are copied as
+    stored.  progress, if given, is called with (username, to_a, to_b).
+    Returns {username: (records copied to a, records copied to b)}.
+    """
+    if policy not in SYNC_POLICIES:
+        raise ValueError(f"Policy must be one of: {', '.join(SYNC_POLICIES)}")
+    keys = load_keys(dir_a)
+    if not keys or keys != load_keys(dir_b):
+        raise ValueError("Both data directories must use the same encryption key")
+    side_a = SyncSide(settings, dir_a, keys)
+    try:
+        side_b = SyncSide(settings, dir_b, keys)
+        try:
+            results = {}
+            for username in sorted(side_a.usernames() | side_b.usernames()):
+                results[username] = sync_user(side_a, side_b, username, policy)
+                if progress:
+                    progress(username, *results[username])
+            return results
+        finally:
+            side_b.close()
+    finally:
+        side_a.close()
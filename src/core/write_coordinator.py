@@ -0,0 +1,167 @@
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("commit", "batch", "none")
+
+
+def atomic_write(path, data, fsync=True):
+    """Replace path with data so readers see either the old or new file
+
+    data (bytes, or an iterable of bytes written as it is produced) goes
+    to a temporary file in the same directory, which is fsynced (with the
+    directory, after the rename) when fsync is set, so a crash at any
+    point leaves one complete version on disk.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with open(fd, "wb") as f:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                f.write(data)
+            else:
+                for part in data:
+                    f.write(part)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class WriteCoordinator:
+    """Group commit for vaults that are rewritten as a whole
+
+    Backends change their in-memory state and then call mark_dirty(key);
+    the coordinator calls write(key, fsync) to persist it.  Changes made
+    within `window` seconds of each other share one write.
+
+    durability:
+      "commit"  mark_dirty() returns once the change is written and fsynced;
+                callers arriving during a window wait for the same commit
+      "batch"   mark_dirty() returns at once and the batch is written and
+                fsynced `window` seconds later (or on flush()), so a crash
+                loses at most the last window of changes
+      "none"    like "commit" but without fsync, leaving it to the OS
+
+    A failed background commit keeps its changes pending: the next
+    mark_dirty() commits at once, raising if it fails again, and
+    take_error() hands the failure to whoever can report it.
+    """
+
+    def __init__(self, write, window=0.0, durability="commit"):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Durability must be one of: {', '.join(DURABILITY_MODES)}")
+        self.write = write
+        self.window = window
+        self.durability = durability
+        self.commits = 0
+        self._dirty = set()
+        self._requested = 0
+        self._committed = 0
+        self._flushing = False
+        self._timer = None
+        # Failure of the last background commit, until a commit succeeds
+        self._error = None
+        self._unreported = None
+        self._cond = threading.Condition()
+
+    def is_dirty(self, key):
+        """Whether key has changes not yet written"""
+        with self._cond:
+            return key in self._dirty or self._flushing
+
+    def mark_dirty(self, key):
+        """Record a change to key and commit it according to the durability mode"""
+        with self._cond:
+            self._dirty.add(key)
+            self._requested += 1
+            ticket = self._requested
+            if self.durability == "batch":
+                if self._error is not None:
+                    self._flush_locked()
+                    return
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self._flush_in_background)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            while self._committed < ticket:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                if self.window > 0:
+                    # Let other writers join this commit
+                    self._flushing = True
+                    self._cond.wait(self.window)
+                    self._flushing = False
+                self._commit_locked()
+
+    def flush(self):
+        """Write every pending change now"""
+        with self._cond:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._flushing:
+            self._cond.wait()
+        if self._dirty:
+            self._commit_locked()
+
+    def _flush_in_background(self):
+        with self._cond:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Failed to commit vault changes: {str(e)}")
+            with self._cond:
+                self._error = self._unreported = e
+
+    def take_error(self):
+        """The failure of a background commit not yet reported, or None"""
+        with self._cond:
+            error = self._unreported
+            self._unreported = None
+            return error
+
+    def _commit_locked(self):
+        keys = self._dirty
+        ticket = self._requested
+        self._dirty = set()
+        self._flushing = True
+        self._cond.release()
+        try:
+            for key in keys:
+                self.write(key, self.durability != "none")
+                keys = keys - {key}
+        finally:
+            self._cond.acquire()
+            self._flushing = False
+            if keys:
+                self._dirty |= keys
+            else:
+                self._committed = max(self._committed, ticket)
+                self.commits += 1
+                self._error = self._unreported = None
+            self._cond.notify_all()
+
+    def close(self):
+        self.flush()
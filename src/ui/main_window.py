@@ -3,6 +3,7 @@ from tkinter import ttk, messagebox
 import pyperclip
 from src.core.password_generator import PasswordGenerator
 from src.core.storage_manager import StorageManager
+from src.core.strength_estimator import StrengthEstimator
 from src.ui.theme_manager import ThemeManager
 import sys
 from src.auth.user_auth import UserAuth
@@ -14,6 +15,11 @@ import json
 logger = logging.getLogger(__name__)
 
 class MainWindow:
+    # Most search results shown in the password list
+    SEARCH_LIMIT = 100
+    # How often to check whether another GenPass process changed the vault
+    POLL_INTERVAL_MS = 1000
+
     def __init__(self, root):
         self.root = root
         self.root.title("GenPass")
@@ -105,6 +111,11 @@ class MainWindow:
         pass_label.pack(pady=5)
         self.password_entry = ttk.Entry(entry_frame)
         self.password_entry.pack(pady=5)
+        self.password_entry.bind("<KeyRelease>", lambda event: self.update_strength_feedback())
+
+        # Strength Feedback
+        self.strength_label = ttk.Label(entry_frame, text="")
+        self.strength_label.pack(pady=2)
 
         # Save Button
         save_btn = ttk.Button(
@@ -118,6 +129,18 @@ class MainWindow:
         saved_frame = ttk.LabelFrame(self.root, text="Saved Passwords")
         saved_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
+        # Search Entry
+        search_frame = ttk.Frame(saved_frame)
+        search_frame.pack(fill=tk.X, pady=5)
+
+        search_label = ttk.Label(search_frame, text="Search:")
+        search_label.pack(side=tk.LEFT, padx=5)
+
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.search_entry.bind("<KeyRelease>", lambda event: self.update_password_list())
+
         # Create Treeview
         self.password_tree = ttk.Treeview(
             saved_frame,
@@ -146,15 +169,35 @@ class MainWindow:
         )
         delete_btn.pack(side=tk.LEFT, padx=5)
 
+        history_btn = ttk.Button(
+            button_frame,
+            text="Password History",
+            command=self.show_password_history
+        )
+        history_btn.pack(side=tk.LEFT, padx=5)
+
     def generate_password(self):
         """Generate a password based on selected criteria"""
         try:
             length = int(self.length_var.get())
             strength = self.strength_var.get()
             
-            password = PasswordGenerator.generate_password(length, strength)
+            # A known-breached result is discarded; a few draws always suffice
+            # unless the length/strength space itself is tiny
+            for _ in range(10):
+                password = PasswordGenerator.generate_password(length, strength)
+                if not self.storage.is_password_breached(password):
+                    break
+            else:
+                messagebox.showerror(
+                    "Error",
+                    "Every generated password appears in a known data breach. "
+                    "Use a longer length or higher strength."
+                )
+                return
             self.password_entry.delete(0, tk.END)
             self.password_entry.insert(0, password)
+            self.update_strength_feedback()
             
         except ValueError as e:
             messagebox.showerror("Error", str(e))
@@ -170,15 +213,48 @@ class MainWindow:
             messagebox.showerror("Error", "Please enter both site and password")
             return
 
+        try:
+            breached = self.storage.is_password_breached(password)
+        except Exception as e:
+            logger.error(str(e))
+            breached = None
+        if breached and not messagebox.askyesno(
+            "Breached Password",
+            "This password appears in a known data breach. Save anyway?"
+        ):
+            return
+
+        strength = StrengthEstimator.estimate(password)
+        if strength['score'] < 2 and not messagebox.askyesno(
+            "Weak Password",
+            f"This password is {strength['label'].lower()} (~{strength['bits']:.0f} bits). Save anyway?"
+        ):
+            return
+
         try:
             self.storage.save_password(self.username, site, password)
             self.password_entry.delete(0, tk.END)
             self.site_entry.delete(0, tk.END)
+            self.update_strength_feedback()
             self.update_password_list()
             messagebox.showinfo("Success", "Password saved successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save password: {str(e)}")
 
+    def update_strength_feedback(self):
+        """Show the estimated strength of the password being entered"""
+        password = self.password_entry.get()
+        if not password:
+            self.strength_label.config(text="")
+            return
+
+        strength = StrengthEstimator.estimate(password)
+        text = f"Strength: {strength['label']} (~{strength['bits']:.0f} bits)"
+        if strength['patterns']:
+            kinds = sorted({kind for kind, _ in strength['patterns']})
+            text += f" - contains {', '.join(kinds)} patterns"
+        self.strength_label.config(text=text)
+
     def copy_password(self):
         """Copy selected password to clipboard"""
         selection = self.password_tree.selection()
@@ -213,27 +289,106 @@ class MainWindow:
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to delete password: {str(e)}")
 
+    def show_password_history(self):
+        """Show the previous passwords of the selected site"""
+        selection = self.password_tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a password to show its history")
+            return
+
+        try:
+            site = self.password_tree.item(selection[0])['values'][0]
+            history = self.storage.get_password_history(self.username, site)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load password history: {str(e)}")
+            return
+        if not history:
+            messagebox.showinfo("Password History", f"No previous passwords for {site}")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"Password History - {site}")
+        dialog.geometry("400x300")
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        theme = ThemeManager.get_theme(self.is_dark_mode)
+        dialog.configure(bg=theme['bg'])
+
+        frame = ttk.Frame(dialog)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        tree = ttk.Treeview(frame, columns=("replaced", "password"), show="headings")
+        tree.heading("replaced", text="Replaced")
+        tree.heading("password", text="Password")
+        tree.pack(fill=tk.BOTH, expand=True, pady=5)
+        passwords = {}
+        for replaced_at, password in history:
+            item = tree.insert('', 'end', values=(replaced_at.strftime("%Y-%m-%d %H:%M"), '*' * 12))
+            passwords[item] = password
+
+        def copy_selected():
+            selected = tree.selection()
+            if not selected:
+                messagebox.showwarning("Warning", "Please select a password to copy", parent=dialog)
+                return
+            pyperclip.copy(passwords[selected[0]])
+            messagebox.showinfo("Success", "Password copied to clipboard!", parent=dialog)
+
+        buttons = ttk.Frame(frame)
+        buttons.pack(fill=tk.X, pady=5)
+        ttk.Button(buttons, text="Copy Password", command=copy_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Close", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
+
     def update_password_list(self):
         """Update the password list display"""
         for item in self.password_tree.get_children():
             self.password_tree.delete(item)
             
         try:
-            passwords = self.storage.get_all_passwords(self.username)
-            for entry in passwords:
-                self.password_tree.insert('', 'end', values=(entry['site'], '*' * 12))
+            query = self.search_var.get().strip()
+            if query:
+                sites = self.storage.search_sites(self.username, query, limit=self.SEARCH_LIMIT)
+            else:
+                sites = [entry['site'] for entry in self.storage.list_sites(self.username)]
+            for site in sites:
+                self.password_tree.insert('', 'end', values=(site, '*' * 12))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update password list: {str(e)}")
 
+    def poll_vault_changes(self):
+        """Refresh the password list when another process changed the vault
+
+        Also wipes expired decrypted passwords, which would otherwise stay
+        in memory until the cache is next used.
+        """
+        try:
+            self.storage.sweep_secrets()
+            if self.username and self.storage.poll_changes(self.username):
+                self.update_password_list()
+        except Exception as e:
+            logger.error(f"Failed to check for vault changes: {str(e)}")
+        try:
+            self.storage.check_writes()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+        self.root.after(self.POLL_INTERVAL_MS, self.poll_vault_changes)
+
     def run(self):
         """Start the application"""
         self.update_password_list()
+        self.root.after(self.POLL_INTERVAL_MS, self.poll_vault_changes)
         self.root.mainloop()
 
     def on_closing(self):
         """Handle window closing"""
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
             self.save_theme_preference()
+            try:
+                self.storage.close()
+            except Exception as e:
+                if not messagebox.askyesno("Error", f"{str(e)}\n\nQuit anyway and lose unsaved changes?"):
+                    return
             self.root.destroy()
 
     def load_theme_preference(self):
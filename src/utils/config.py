@@ -62,6 +62,47 @@ class Config:
             "sender_password": ""
         }
 
+    def load_settings(self) -> Dict[str, Any]:
+        """Load application settings, filling in defaults for missing keys"""
+        settings = self._get_default_settings()
+        settings_path = os.path.join(self.config_dir, 'settings.json')
+        try:
+            with open(settings_path, 'r') as f:
+                settings.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            raise ValueError("Invalid settings format")
+        return settings
+
+    def _get_default_settings(self) -> Dict[str, Any]:
+        """Get default application settings"""
+        return {
+            # Path to a corpus built with src.cli.build_breach_corpus
+            "breach_corpus": None,
+            # "json" (one file rewritten per change), "binary" (compact
+            # file per user), "sealed" (compressed file encrypted as a
+            # whole), "log" (append-only) or "sqlite" (data/vault.db)
+            "storage_backend": "json",
+            # Dead log records tolerated before a log vault is compacted
+            "log_compact_threshold": 1000,
+            # Sealed vaults: "zlib", "lzma" or "none", and bytes per chunk
+            "sealed_compression": "zlib",
+            "sealed_chunk_size": 65536,
+            # Decrypted passwords kept in memory, and for how many seconds
+            "secret_cache_size": 64,
+            "secret_cache_ttl": 60,
+            # Previous passwords kept per site (0 = no history), and
+            # for how many days (0 = until pushed out by newer ones)
+            "history_max_versions": 10,
+            "history_max_days": 0,
+            # "commit" (fsync each change), "batch" (fsync once per window)
+            # or "none" (leave flushing to the OS)
+            "vault_durability": "commit",
+            # Changes within this many milliseconds share one vault write
+            "group_commit_window_ms": 0
+        }
+
     def get_data_file_path(self, filename: str) -> str:
         """Get full path for a data file"""
         return os.path.join(self.data_dir, filename)
@@ -0,0 +1,55 @@
+import os
+
+from cryptography.fernet import Fernet
+
+from src.core.backup import BackupRepository
+from src.core.vault_backends import create_backend
+
+KEYS = [Fernet.generate_key()]
+
+
+def snapshot_and_restore(tmp_path, data_dir):
+    repository = BackupRepository(str(tmp_path / "repo"))
+    manifest = repository.create_snapshot([data_dir])
+    repository.restore(manifest["id"], str(tmp_path / "restored"))
+    return manifest, str(tmp_path / "restored" / "data")
+
+
+def test_sqlite_vault_is_copied_with_its_log(tmp_path):
+    data_dir = str(tmp_path / "data")
+    os.makedirs(data_dir)
+    backend = create_backend({}, data_dir, "sqlite")
+    try:
+        # The connection stays open, so the entries are still in the WAL
+        backend.put_many("alice", [{"site": f"site{i}.com", "password": "token"} for i in range(100)])
+        manifest, restored = snapshot_and_restore(tmp_path, data_dir)
+    finally:
+        backend.close()
+
+    assert sorted(entry["path"] for entry in manifest["files"]) == ["data/vault.db"]
+    restored_backend = create_backend({}, restored, "sqlite")
+    try:
+        assert len(restored_backend.list_entries("alice")) == 100
+    finally:
+        restored_backend.close()
+
+
+def test_vault_files_round_trip(tmp_path):
+    data_dir = str(tmp_path / "data")
+    os.makedirs(data_dir)
+    for name in ("json", "log", "sealed"):
+        backend = create_backend({}, data_dir, name, keys=KEYS)
+        try:
+            backend.put_many("alice", [{"site": f"{name}{i}.com", "password": "token"} for i in range(10)])
+        finally:
+            backend.close()
+
+    manifest, restored = snapshot_and_restore(tmp_path, data_dir)
+
+    assert manifest["stats"]["read"] == 3
+    for name in ("json", "log", "sealed"):
+        backend = create_backend({}, restored, name, keys=KEYS)
+        try:
+            assert len(backend.list_entries("alice")) == 10
+        finally:
+            backend.close()
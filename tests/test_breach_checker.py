@@ -0,0 +1,60 @@
+import hashlib
+import os
+
+import pytest
+
+from src.core import breach_checker
+from src.core.breach_checker import BreachCorpus, build_corpus
+
+
+def write_dump(path, passwords):
+    with open(path, "w") as f:
+        for password in passwords:
+            f.write(hashlib.sha1(password.encode()).hexdigest().upper() + ":3\n")
+
+
+def test_lookup(tmp_path):
+    dump = str(tmp_path / "dump.txt")
+    corpus_path = str(tmp_path / "corpus.bin")
+    breached = [f"password{i}" for i in range(1000)]
+    write_dump(dump, breached + breached[:10])
+
+    assert build_corpus([dump], corpus_path, run_size=300) == 1000
+    corpus = BreachCorpus(corpus_path)
+    try:
+        assert all(corpus.is_breached(password) for password in breached)
+        assert not corpus.is_breached("correct horse battery staple")
+    finally:
+        corpus.close()
+
+
+def test_failed_build_leaves_no_temp_file(tmp_path, monkeypatch):
+    dump = str(tmp_path / "dump.txt")
+    write_dump(dump, ["hunter2"])
+
+    def fail(*iterables):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(breach_checker.heapq, "merge", fail)
+    with pytest.raises(OSError):
+        build_corpus([dump], str(tmp_path / "corpus.bin"))
+    assert os.listdir(tmp_path) == ["dump.txt"]
+
+
+def test_rejects_unknown_hash_type(tmp_path):
+    path = str(tmp_path / "corpus.bin")
+    with open(path, "wb") as f:
+        f.write(BreachCorpus._HEADER.pack(BreachCorpus.MAGIC, b"md5", 0, BreachCorpus._HEADER.size))
+        f.write(b"\0" * BreachCorpus._FANOUT.size)
+
+    with pytest.raises(Exception, match="Unsupported hash type: md5"):
+        BreachCorpus(path)
+
+
+def test_rejects_truncated_file(tmp_path):
+    path = str(tmp_path / "corpus.bin")
+    with open(path, "wb") as f:
+        f.write(BreachCorpus._HEADER.pack(BreachCorpus.MAGIC, b"sha1", 0, BreachCorpus._HEADER.size))
+
+    with pytest.raises(Exception, match="truncated"):
+        BreachCorpus(path)
@@ -0,0 +1,56 @@
+from src.cli.generate import main
+
+
+def read_lines(path):
+    with open(path, "r") as f:
+        return f.read().splitlines()
+
+
+def test_bloom_file_without_against_skips_earlier_batches(tmp_path):
+    # 100 possible passwords: the second batch can only avoid the first
+    # one's if Bloom hits on the reused filter count as repeats
+    bloom = str(tmp_path / "seen.bloom")
+    first = str(tmp_path / "b1.txt")
+    second = str(tmp_path / "b2.txt")
+
+    assert main(["-n", "50", "-t", "99", "--bloom-file", bloom, "-o", first, "-q"]) == 0
+    assert main(["-n", "40", "-t", "99", "--bloom-file", bloom, "-o", second, "-q"]) == 0
+
+    batch1 = read_lines(first)
+    batch2 = read_lines(second)
+    assert len(set(batch1)) == 50
+    assert len(set(batch2)) == 40
+    assert not set(batch1) & set(batch2)
+
+
+def test_bloom_file_with_against_confirms_hits(tmp_path):
+    bloom = str(tmp_path / "seen.bloom")
+    first = str(tmp_path / "b1.txt")
+    second = str(tmp_path / "b2.txt")
+
+    assert main(["-n", "50", "-t", "99", "--bloom-file", bloom, "-o", first, "-q"]) == 0
+    assert main(["-n", "50", "-t", "99", "--bloom-file", bloom, "--against", first,
+                 "-o", second, "-q"]) == 0
+
+    assert sorted(read_lines(first) + read_lines(second)) == [f"{i:02d}" for i in range(100)]
+
+
+def test_parallel_top_ups_share_one_pool(tmp_path, monkeypatch):
+    from src.core import parallel
+
+    pools = []
+    executor_class = parallel.ProcessPoolExecutor
+
+    def counting_executor(*args, **kwargs):
+        pools.append(1)
+        return executor_class(*args, **kwargs)
+
+    monkeypatch.setattr(parallel, "ProcessPoolExecutor", counting_executor)
+    output = str(tmp_path / "out.txt")
+
+    # 100 possible passwords, so most of the 90 come from top-ups
+    assert main(["-n", "90", "-t", "99", "-u", "-w", "2", "-o", output, "-q"]) == 0
+
+    assert len(set(read_lines(output))) == 90
+    # The first batch's pool and one for all top-ups
+    assert len(pools) == 2
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+from cryptography.fernet import Fernet
+
+from src.core.key_rotation import KEY_FILE, build_cipher, load_keys, rotate_keys, write_key
+from src.core.password_history import create_history
+from src.core.sync_journal import add_tombstones, load_tombstones
+from src.core.vault_backends import create_backend
+
+OLD_KEY = Fernet.generate_key()
+TOKEN_BACKENDS = ["json", "binary", "log", "sqlite"]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    write_key(os.path.join(str(tmp_path), KEY_FILE), OLD_KEY)
+    return str(tmp_path)
+
+
+def entry(site, token):
+    return {"site": site, "password": token, "updated_at": 1.0}
+
+
+def old_token(password):
+    return Fernet(OLD_KEY).encrypt(password.encode()).decode()
+
+
+def new_passwords(settings, data_dir):
+    """Every entry decrypted with the key the rotation left, alone"""
+    [key] = load_keys(data_dir)
+    assert key != OLD_KEY
+    backend = create_backend(settings, data_dir, keys=[key])
+    try:
+        return {e["site"]: Fernet(key).decrypt(e["password"].encode()).decode()
+                for e in backend.list_entries("alice")}
+    finally:
+        backend.close()
+
+
+@pytest.mark.parametrize("name", TOKEN_BACKENDS)
+def test_stale_writer_commits_under_new_key(name, data_dir):
+    settings = {"storage_backend": name}
+    writer = create_backend(settings, data_dir, keys=[OLD_KEY])
+    try:
+        writer.put("alice", entry("one.com", old_token("one")))
+        rotate_keys(data_dir, settings)
+        # Made before this writer heard of the rotation
+        writer.put("alice", entry("two.com", old_token("two")))
+    finally:
+        writer.close()
+
+    assert new_passwords(settings, data_dir) == {"one.com": "one", "two.com": "two"}
+
+
+@pytest.mark.parametrize("name", TOKEN_BACKENDS)
+def test_sweep_catches_writes_under_old_key(name, data_dir):
+    settings = {"storage_backend": name}
+    put = create_backend(settings, data_dir, keys=[OLD_KEY])
+    try:
+        put.put("alice", entry("one.com", old_token("one")))
+    finally:
+        put.close()
+
+    def late_write(username, entries, done, total):
+        # A writer that does not check the key files, after alice was rotated
+        backend = create_backend(settings, data_dir)
+        try:
+            backend.put("alice", entry("two.com", old_token("two")))
+        finally:
+            backend.close()
+
+    rotate_keys(data_dir, settings, progress=late_write)
+
+    assert new_passwords(settings, data_dir) == {"one.com": "one", "two.com": "two"}
+
+
+def test_stale_history_and_tombstones_use_new_key(data_dir):
+    settings = {"storage_backend": "json"}
+    old_cipher = build_cipher([OLD_KEY])
+    history = create_history(settings, data_dir, old_cipher)
+    backend = create_backend(settings, data_dir, keys=[OLD_KEY])
+    try:
+        history.append("alice", "one.com", old_token("one"))
+        rotate_keys(data_dir, settings)
+        history.append("alice", "two.com", old_token("two"))
+        add_tombstones(backend, "alice", {"gone.com": 2.0}, old_cipher)
+    finally:
+        history.close()
+        backend.close()
+
+    cipher = build_cipher(load_keys(data_dir))
+    history = create_history(settings, data_dir, cipher)
+    try:
+        for site, password in (("one.com", "one"), ("two.com", "two")):
+            [(token, _)] = history.get("alice", site)
+            assert cipher.decrypt(token.encode()).decode() == password
+    finally:
+        history.close()
+    assert load_tombstones(data_dir, "alice", cipher) == {"gone.com": 2.0}
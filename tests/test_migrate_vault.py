@@ -0,0 +1,6 @@
+from src.cli.migrate_vault import main
+
+
+def test_sealed_backend_without_keys_is_reported(tmp_path, capsys):
+    assert main(["--from", "json", "--to", "sealed", "--data-dir", str(tmp_path)]) == 1
+    assert "Error: Failed to migrate vaults" in capsys.readouterr().err
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from src.core.passphrase_generator import WordlistIndex
+
+
+@pytest.fixture
+def wordlist(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    path = str(tmp_path / "words.txt")
+    with open(path, "w") as f:
+        f.write("".join(f"1111{i % 6 + 1}\tword{i}\n" for i in range(100)))
+    return path
+
+
+def open_words(path):
+    index = WordlistIndex(path)
+    try:
+        return [index[i] for i in range(len(index))]
+    finally:
+        index.close()
+
+
+def test_index_is_cached_outside_the_wordlist_directory(wordlist):
+    words = open_words(wordlist)
+
+    assert words == [f"word{i}" for i in range(100)]
+    assert sorted(os.listdir(os.path.dirname(wordlist))) == ["cache", "words.txt"]
+    assert os.path.exists(WordlistIndex.index_path(wordlist))
+    assert open_words(wordlist) == words
+
+
+@pytest.mark.parametrize("damage", ["truncate", "bad offset"])
+def test_damaged_index_is_rebuilt(wordlist, damage):
+    open_words(wordlist)
+    index_file = WordlistIndex.index_path(wordlist)
+    with open(index_file, "r+b") as f:
+        if damage == "truncate":
+            # Still a whole number of offsets, so only the count catches it
+            f.truncate(os.path.getsize(index_file) - 16 * 10)
+        else:
+            f.seek(-8, os.SEEK_END)
+            f.write((1 << 40).to_bytes(8, "little"))
+
+    assert open_words(wordlist) == [f"word{i}" for i in range(100)]
@@ -0,0 +1,54 @@
+import os
+
+from cryptography.fernet import Fernet
+
+from src.core.key_rotation import KEY_FILE, build_cipher, load_keys, rotate_keys, write_key
+from src.core.password_history import create_history
+
+
+def test_versions_newest_first_without_plaintext_sites(tmp_path):
+    cipher = build_cipher([Fernet.generate_key()])
+    history = create_history({}, str(tmp_path), cipher)
+    try:
+        history.append("alice", "example.com", "token-1")
+        history.append_many("alice", [("example.com", "token-2"), ("other.org", "token-3")])
+
+        assert [token for token, _ in history.get("alice", "example.com")] == ["token-2", "token-1"]
+        assert [token for token, _ in history.get("alice", "other.org")] == ["token-3"]
+        assert history.get("bob", "example.com") == []
+    finally:
+        history.close()
+
+    with open(history.path("alice"), "rb") as f:
+        data = f.read()
+    assert b"example.com" not in data and b"other.org" not in data
+
+    reopened = create_history({}, str(tmp_path), cipher)
+    try:
+        assert [token for token, _ in reopened.get("alice", "example.com")] == ["token-2", "token-1"]
+    finally:
+        reopened.close()
+
+
+def test_rotation_reencrypts_sites(tmp_path):
+    data_dir = str(tmp_path)
+    old_key = Fernet.generate_key()
+    write_key(os.path.join(data_dir, KEY_FILE), old_key)
+    old_cipher = build_cipher([old_key])
+    history = create_history({}, data_dir, old_cipher)
+    try:
+        history.append("alice", "example.com", old_cipher.encrypt(b"secret").decode())
+    finally:
+        history.close()
+
+    rotate_keys(data_dir, {})
+
+    keys = load_keys(data_dir)
+    assert keys != [old_key]
+    cipher = build_cipher(keys)
+    history = create_history({}, data_dir, cipher)
+    try:
+        [(token, _)] = history.get("alice", "example.com")
+        assert cipher.decrypt(token.encode()) == b"secret"
+    finally:
+        history.close()
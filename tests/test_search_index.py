@@ -0,0 +1,52 @@
+from src.core.search_index import TrigramIndex
+
+
+def brute_force(keys, query, limit):
+    """Exact, prefix and substring matches in the order search() ranks them
+
+    Queries shorter than a trigram only match as prefixes.
+    """
+    folded = query.lower()
+
+    def group(key):
+        key = key.lower()
+        return 0 if key == folded else 1 if key.startswith(folded) else 2
+
+    matches = [key for key in keys
+               if (folded in key.lower() if len(folded) >= 3 else key.lower().startswith(folded))]
+    return sorted(matches, key=lambda key: (group(key), key.lower(), key))[:limit]
+
+
+def test_ranks_exact_then_prefix_then_substring():
+    index = TrigramIndex(["mail.example.com", "Example.com", "example.org", "example.com",
+                          "myexample.com", "other.net"])
+
+    assert index.search("example.com")[:4] == ["Example.com", "example.com", "mail.example.com",
+                                               "myexample.com"]
+
+
+def test_common_substrings_return_first_matches_in_order():
+    keys = [f"{prefix}.site{i}.{tld}" for i in range(20000)
+            for prefix, tld in [("app", "com"), ("mail", "org")][i % 2:i % 2 + 1]]
+    keys += ["com.example", "Company.org"]
+    index = TrigramIndex(keys)
+
+    for query in ["com", ".org", "site1", "s", "app.site7"]:
+        assert index.search(query, limit=20) == brute_force(keys, query, 20)
+
+
+def test_remove_and_add_keep_order():
+    index = TrigramIndex(["b.com", "a.com", "c.com"])
+    index.remove("a.com")
+    index.add("A.com")
+    index.add("ab.com")
+
+    assert index.search("a") == ["A.com", "ab.com"]
+    assert index.search("com") == ["A.com", "ab.com", "b.com", "c.com"]
+
+
+def test_finds_typos():
+    index = TrigramIndex(["google.com", "facebook.com", "example.org"])
+
+    assert index.search("gogle.com")[0] == "google.com"
+    assert index.search("facebok") == ["facebook.com"]
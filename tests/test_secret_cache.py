@@ -0,0 +1,28 @@
+from src.core.secret_cache import SecretCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sweep_wipes_expired_entries_without_cache_access():
+    clock = FakeClock()
+    cache = SecretCache(max_size=8, ttl=60, clock=clock)
+    cache.put(("alice", "a.com"), "token-a", "secret-a")
+    clock.now = 30
+    cache.put(("alice", "b.com"), "token-b", "secret-b")
+    buffer = cache._entries[("alice", "a.com")][1]
+
+    clock.now = 61
+    assert cache.sweep() == 1
+    assert buffer == bytearray(len(buffer))
+    assert cache.stats()["size"] == 1
+    assert cache.get(("alice", "b.com"), "token-b") == "secret-b"
+
+    clock.now = 91
+    assert cache.sweep() == 1
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,37 @@
+from src.core.strength_estimator import DICTIONARY, StrengthEstimator
+
+
+def kinds(password):
+    return [kind for kind, _ in StrengthEstimator.estimate(password)["patterns"]]
+
+
+def test_dictionary_prefixes_lead_to_words():
+    assert DICTIONARY["password"] < DICTIONARY["dolphin"]
+    assert DICTIONARY["dolphi"] is None
+    assert "zzzzzz" not in DICTIONARY
+
+
+def test_finds_words_in_any_spelling():
+    plain = StrengthEstimator.estimate("dolphin")["bits"]
+    capitalised = StrengthEstimator.estimate("Dolphin")["bits"]
+    leet = StrengthEstimator.estimate("d0lph1n")["bits"]
+
+    assert kinds("dolphin") == kinds("Dolphin") == kinds("d0lph1n") == ["dictionary"]
+    assert plain < capitalised < plain + 2
+    assert plain < leet < plain + 2
+
+
+def test_common_password_is_very_weak():
+    result = StrengthEstimator.estimate("password")
+    assert result["score"] == 0
+    assert result["patterns"] == [("dictionary", "password")]
+
+
+def test_long_repeats_are_cheap():
+    result = StrengthEstimator.estimate(("passwordpassword1234" * 7)[:128])
+    assert result["score"] == 0
+    assert "repeat" in [kind for kind, _ in result["patterns"]]
+
+
+def test_random_password_is_strong():
+    assert StrengthEstimator.estimate("vQ7#kP2!mZ9x@Lr4")["score"] == 4
@@ -0,0 +1,253 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+from cryptography.fernet import Fernet
+
+from src.core.key_files import KEY_FILE, write_key
+from src.core.vault_backends import BACKENDS, create_backend
+
+KEYS = [Fernet.generate_key()]
+WRITERS = 4
+WRITES_PER_WRITER = 25
+
+
+def open_backend(name, data_dir):
+    return create_backend({}, data_dir, name, keys=KEYS)
+
+
+def entry(site, password="token", **extra):
+    return dict({"site": site, "username": "alice@example.com", "password": password}, **extra)
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def name(request):
+    return request.param
+
+
+@pytest.fixture
+def backend(name, tmp_path):
+    backend = open_backend(name, str(tmp_path))
+    yield backend
+    backend.close()
+
+
+def test_empty_vault(backend):
+    assert backend.get("alice", "example.com") is None
+    assert backend.list_entries("alice") == []
+    assert backend.list_metadata("alice") == []
+    assert backend.usernames() == []
+    assert backend.delete("alice", "example.com") is False
+
+
+def test_put_and_get(backend):
+    backend.put("alice", entry("example.com", "one", updated_at=1.5))
+
+    assert backend.get("alice", "example.com") == entry("example.com", "one", updated_at=1.5)
+    assert backend.get("alice", "other.com") is None
+    assert backend.get("bob", "example.com") is None
+
+
+def test_put_replaces_site(backend):
+    backend.put("alice", entry("example.com", "one"))
+    backend.put("alice", entry("example.com", "two"))
+
+    assert backend.get("alice", "example.com")["password"] == "two"
+    assert len(backend.list_entries("alice")) == 1
+
+
+def test_put_many_and_list(backend):
+    entries = [entry(f"site{i}.com", f"token{i}") for i in range(50)]
+    backend.put_many("alice", entries)
+    backend.put_many("alice", [])
+
+    assert sorted(backend.list_entries("alice"), key=lambda e: e["site"]) == \
+        sorted(entries, key=lambda e: e["site"])
+    metadata = backend.list_metadata("alice")
+    assert sorted(item["site"] for item in metadata) == sorted(e["site"] for e in entries)
+    assert all("password" not in item for item in metadata)
+
+
+def test_list_entries_returns_copies(backend):
+    backend.put("alice", entry("example.com", "one"))
+    backend.list_entries("alice")[0]["password"] = "changed"
+
+    assert backend.get("alice", "example.com")["password"] == "one"
+
+
+def test_delete(backend):
+    backend.put_many("alice", [entry("a.com"), entry("b.com")])
+
+    assert backend.delete("alice", "a.com") is True
+    assert backend.delete("alice", "a.com") is False
+    assert backend.get("alice", "a.com") is None
+    assert [e["site"] for e in backend.list_entries("alice")] == ["b.com"]
+
+
+def test_users_are_separate(backend):
+    backend.put("alice", entry("example.com", "alice-token"))
+    backend.put("bob", entry("example.com", "bob-token"))
+    assert backend.usernames() == ["alice", "bob"]
+
+    backend.delete("alice", "example.com")
+    assert backend.get("alice", "example.com") is None
+    assert backend.get("bob", "example.com")["password"] == "bob-token"
+
+
+def test_reopen_after_close(name, tmp_path):
+    backend = open_backend(name, str(tmp_path))
+    backend.put_many("alice", [entry(f"site{i}.com", f"token{i}") for i in range(20)])
+    backend.put("alice", entry("site0.com", "replaced"))
+    backend.delete("alice", "site1.com")
+    backend.put("bob", entry("example.com"))
+    backend.close()
+
+    backend = open_backend(name, str(tmp_path))
+    try:
+        assert backend.usernames() == ["alice", "bob"]
+        assert len(backend.list_entries("alice")) == 19
+        assert backend.get("alice", "site0.com")["password"] == "replaced"
+        assert backend.get("alice", "site1.com") is None
+        assert backend.get("alice", "site19.com")["password"] == "token19"
+    finally:
+        backend.close()
+
+
+def test_sees_changes_from_another_instance(name, tmp_path):
+    writer = open_backend(name, str(tmp_path))
+    reader = open_backend(name, str(tmp_path))
+    try:
+        writer.put("alice", entry("a.com", "one"))
+        assert reader.get("alice", "a.com")["password"] == "one"
+        reader.put("alice", entry("b.com", "two"))
+        writer.put("alice", entry("a.com", "three"))
+
+        for backend in (writer, reader):
+            assert {e["site"]: e["password"] for e in backend.list_entries("alice")} == \
+                {"a.com": "three", "b.com": "two"}
+    finally:
+        writer.close()
+        reader.close()
+
+
+def _write_entries(name, data_dir, writer):
+    backend = open_backend(name, data_dir)
+    try:
+        for i in range(WRITES_PER_WRITER):
+            backend.put("alice", entry(f"writer{writer}-{i}.com", f"token{writer}-{i}"))
+            backend.put("alice", entry("shared.com", f"token{writer}-{i}"))
+    finally:
+        backend.close()
+
+
+def test_concurrent_writers_lose_no_updates(name, tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_write_entries, args=(name, str(tmp_path), writer))
+                 for writer in range(WRITERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    backend = open_backend(name, str(tmp_path))
+    try:
+        sites = {e["site"] for e in backend.list_entries("alice")}
+        expected = {f"writer{w}-{i}.com" for w in range(WRITERS) for i in range(WRITES_PER_WRITER)}
+        assert sites == expected | {"shared.com"}
+        last_writes = {f"token{w}-{WRITES_PER_WRITER - 1}" for w in range(WRITERS)}
+        assert backend.get("alice", "shared.com")["password"] in last_writes
+    finally:
+        backend.close()
+
+
+def test_log_reader_survives_compaction_after_its_stat(tmp_path, monkeypatch):
+    from src.core import vault_backends
+
+    reader = open_backend("log", str(tmp_path))
+    writer = open_backend("log", str(tmp_path))
+    try:
+        writer.put_many("alice", [entry(f"site{i}.com", "one") for i in range(10)])
+        assert len(reader.list_entries("alice")) == 10
+        for i in range(10):
+            writer.put("alice", entry(f"site{i}.com", "two"))
+        stale = vault_backends._file_signature(writer.path("alice"))
+        writer.compact("alice")
+
+        # The reader stats the log just before the compaction swaps it
+        signatures = [stale]
+        real_signature = vault_backends._file_signature
+        monkeypatch.setattr(vault_backends, "_file_signature",
+                            lambda filename: signatures.pop() if signatures else real_signature(filename))
+
+        assert {e["site"]: e["password"] for e in reader.list_entries("alice")} == \
+            {f"site{i}.com": "two" for i in range(10)}
+    finally:
+        reader.close()
+        writer.close()
+
+
+def _batch_backend(name, data_dir, keys):
+    settings = {"vault_durability": "batch", "group_commit_window_ms": 10}
+    return create_backend(settings, data_dir, name, keys=keys)
+
+
+def test_failed_batch_is_reported_and_retried(tmp_path, monkeypatch):
+    from src.core import vault_backends
+
+    real_write = vault_backends.atomic_write
+    failures = [OSError("disk full")]
+
+    def flaky_write(path, data, fsync=True):
+        if failures:
+            raise failures.pop()
+        real_write(path, data, fsync)
+
+    monkeypatch.setattr(vault_backends, "atomic_write", flaky_write)
+    backend = _batch_backend("json", str(tmp_path), KEYS)
+    try:
+        backend.put("alice", entry("one.com"))
+        deadline = time.monotonic() + 5
+        error = backend.write_error()
+        while error is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+            error = backend.write_error()
+        assert isinstance(error, OSError)
+        assert backend.write_error() is None
+
+        # The next change commits at once, with the pending one
+        backend.put("alice", entry("two.com"))
+        assert backend.coordinator.commits == 1
+    finally:
+        backend.close()
+    reopened = open_backend("json", str(tmp_path))
+    try:
+        assert {e["site"] for e in reopened.list_entries("alice")} == {"one.com", "two.com"}
+    finally:
+        reopened.close()
+
+
+@pytest.mark.parametrize("name", ["json", "binary", "sealed"])
+def test_late_batch_uses_rotated_key(name, tmp_path):
+    data_dir = str(tmp_path)
+    old_key, new_key = Fernet.generate_key(), Fernet.generate_key()
+    write_key(os.path.join(data_dir, KEY_FILE), old_key)
+    backend = _batch_backend(name, data_dir, [old_key])
+    backend.coordinator.window = 3600
+    try:
+        token = "secret" if backend.encrypts else Fernet(old_key).encrypt(b"secret").decode()
+        backend.put("alice", entry("one.com", token))
+        # Another process rotates, and retires the old key, before the batch is due
+        write_key(os.path.join(data_dir, KEY_FILE), new_key)
+    finally:
+        backend.close()
+
+    reopened = create_backend({}, data_dir, name, keys=[new_key])
+    try:
+        stored = reopened.get("alice", "one.com")["password"]
+        if not reopened.encrypts:
+            stored = Fernet(new_key).decrypt(stored.encode()).decode()
+        assert stored == "secret"
+    finally:
+        reopened.close()
@@ -0,0 +1,222 @@
+import os
+
+import pytest
+from cryptography.fernet import Fernet
+
+from src.core.key_rotation import build_cipher, read_key, rotate_keys, write_key
+from src.core.sync_journal import load_tombstones, tombstones_path
+from src.core.vault_backends import BACKENDS, create_backend
+from src.core import vault_sync
+from src.core.vault_sync import SyncSide, add_tombstones, sync_dirs, sync_user
+from src.core.write_coordinator import atomic_write
+
+KEY = Fernet.generate_key()
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def settings(request):
+    return {"storage_backend": request.param}
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    paths = []
+    for name in ("a", "b"):
+        path = str(tmp_path / name)
+        os.makedirs(path)
+        write_key(os.path.join(path, "encryption.key"), KEY)
+        paths.append(path)
+    return paths
+
+
+def entry(site, password, updated_at=1.0):
+    return {"site": site, "password": password, "updated_at": updated_at}
+
+
+def put(settings, data_dir, *entries, keys=(KEY,)):
+    backend = create_backend(settings, data_dir, keys=list(keys) or None)
+    try:
+        backend.put_many("alice", list(entries))
+    finally:
+        backend.close()
+
+
+def delete(settings, data_dir, site, deleted_at):
+    backend = create_backend(settings, data_dir, keys=[KEY])
+    try:
+        backend.delete("alice", site)
+        add_tombstones(backend, "alice", {site: deleted_at}, build_cipher([KEY]))
+    finally:
+        backend.close()
+
+
+def passwords(settings, data_dir):
+    backend = create_backend(settings, data_dir, keys=[KEY])
+    try:
+        return {e["site"]: e["password"] for e in backend.list_entries("alice")}
+    finally:
+        backend.close()
+
+
+def synced(settings, dirs, policy="last-writer-wins"):
+    result = sync_dirs(settings, *dirs, policy)
+    assert passwords(settings, dirs[0]) == passwords(settings, dirs[1])
+    return result["alice"]
+
+
+def test_one_sided_changes_and_deletes(settings, dirs):
+    a, b = dirs
+    put(settings, a, *(entry(f"site{i}.com", f"token{i}") for i in range(200)))
+    assert synced(settings, dirs) == (0, 200)
+    assert synced(settings, dirs) == (0, 0)
+
+    # Older timestamps still win when only one side changed the site
+    put(settings, a, entry("site1.com", "a-token", 0.5))
+    put(settings, b, entry("site2.com", "b-token", 0.5))
+    delete(settings, b, "site3.com", 0.5)
+
+    assert synced(settings, dirs) == (2, 1)
+    state = passwords(settings, a)
+    assert state["site1.com"] == "a-token"
+    assert state["site2.com"] == "b-token"
+    assert "site3.com" not in state
+    assert synced(settings, dirs) == (0, 0)
+
+
+@pytest.mark.parametrize("policy", ["last-writer-wins", "conflict-copy"])
+def test_conflicts(settings, dirs, policy):
+    a, b = dirs
+    put(settings, a, entry("both.com", "one"), entry("gone.com", "one"))
+    synced(settings, dirs, policy)
+
+    put(settings, a, entry("both.com", "a-token", 20.0), entry("gone.com", "a-token", 30.0))
+    put(settings, b, entry("both.com", "b-token", 21.0))
+    delete(settings, b, "gone.com", 25.0)
+    synced(settings, dirs, policy)
+
+    state = passwords(settings, a)
+    assert state["both.com"] == "b-token"
+    assert state["gone.com"] == "a-token"
+    copies = [site for site in state if "(conflict" in site]
+    if policy == "conflict-copy":
+        assert [state[site] for site in copies] == ["a-token"]
+    else:
+        assert copies == []
+
+
+def test_changes_only_read_changed_sites(dirs):
+    settings = {"storage_backend": "sqlite"}
+    a, b = dirs
+    put(settings, a, *(entry(f"site{i}.com", f"token{i}") for i in range(500)))
+    synced(settings, dirs)
+    put(settings, a, entry("site7.com", "changed", 2.0))
+
+    sides = [SyncSide(settings, path, [KEY]) for path in dirs]
+    gets = []
+    try:
+        for side in sides:
+            side.backend.list_entries = None
+            get = side.backend.get
+            side.backend.get = lambda username, site, get=get: gets.append(site) or get(username, site)
+        assert sync_user(*sides, "alice") == (0, 1)
+    finally:
+        for side in sides:
+            side.close()
+    assert set(gets) == {"site7.com"}
+    assert passwords(settings, b)["site7.com"] == "changed"
+
+
+def test_changes_only_touch_changed_buckets(dirs, monkeypatch):
+    settings = {"storage_backend": "sqlite"}
+    a, b = dirs
+    put(settings, a, *(entry(f"site{i}.com", f"token{i}") for i in range(500)))
+    synced(settings, dirs)
+    put(settings, a, entry("site7.com", "changed", 2.0))
+
+    loaded = []
+    load_leaf = SyncSide._load_leaf
+    monkeypatch.setattr(SyncSide, "_load_leaf", lambda self, username, bucket, expected:
+                        loaded.append(bucket) or load_leaf(self, username, bucket, expected))
+    written = []
+    monkeypatch.setattr(vault_sync, "atomic_write", lambda path, data, **kwargs:
+                        written.append(path) or atomic_write(path, data, **kwargs))
+    assert synced(settings, dirs) == (0, 1)
+
+    bucket = SyncSide(settings, a, [KEY]).codec.encode("site7.com")[:3]
+    assert set(loaded) == {bucket}
+    leaves = {os.path.basename(path) for path in written if ".merkle" + os.sep in path}
+    assert leaves == {f"{bucket}.json"}
+
+
+def test_stale_leaves_are_rebuilt(dirs):
+    settings = {"storage_backend": "json"}
+    a, b = dirs
+    put(settings, a, entry("one.com", "one"))
+    synced(settings, dirs)
+    # As if a save stopped after the leaves but before the tree
+    leaf_dir = os.path.join(a, ".alice.merkle")
+    for name in os.listdir(leaf_dir):
+        os.remove(os.path.join(leaf_dir, name))
+    put(settings, b, entry("two.com", "two"))
+
+    assert synced(settings, dirs) == (1, 0)
+    assert synced(settings, dirs) == (0, 0)
+
+
+def test_unjournaled_writes_are_found(settings, dirs):
+    if settings["storage_backend"] == "sealed":
+        pytest.skip("sealed vaults cannot be written without the keys")
+    a, b = dirs
+    put(settings, a, entry("one.com", "one"))
+    synced(settings, dirs)
+    # Written without keys, so without a journal entry
+    put(settings, b, entry("two.com", "two"), keys=())
+
+    assert synced(settings, dirs) == (1, 0)
+    assert passwords(settings, a)["two.com"] == "two"
+
+
+def test_sync_files_do_not_name_sites(settings, dirs):
+    a, b = dirs
+    put(settings, a, entry("secret-site.com", "one"), entry("deleted-secret.com", "one"))
+    synced(settings, dirs)
+    put(settings, a, entry("other-secret.com", "two"))
+    delete(settings, a, "deleted-secret.com", 2.0)
+    synced(settings, dirs)
+
+    for path in dirs:
+        for directory, _, names in os.walk(path):
+            for name in names:
+                name = os.path.relpath(os.path.join(directory, name), path)
+                if name.startswith(".") and not name.endswith(".lock") or name.endswith("_tombstones.json"):
+                    with open(os.path.join(path, name), "rb") as f:
+                        assert b"secret" not in f.read()
+
+
+def test_plain_tombstones_are_still_read(tmp_path):
+    data_dir = str(tmp_path)
+    with open(tombstones_path(data_dir, "alice"), "w") as f:
+        f.write('{"old.com": 1.5}')
+    cipher = build_cipher([KEY])
+    backend = create_backend({}, data_dir, keys=[KEY])
+    try:
+        add_tombstones(backend, "alice", {"new.com": 2.5}, cipher)
+    finally:
+        backend.close()
+
+    assert load_tombstones(data_dir, "alice", cipher) == {"old.com": 1.5, "new.com": 2.5}
+    with open(tombstones_path(data_dir, "alice"), "rb") as f:
+        assert b".com" not in f.read()
+
+
+def test_key_rotation_reencrypts_tombstones(dirs):
+    settings = {"storage_backend": "json"}
+    a, _ = dirs
+    put(settings, a, entry("gone.com", "one"))
+    delete(settings, a, "gone.com", 2.0)
+
+    rotate_keys(a, settings)
+
+    new_key = read_key(os.path.join(a, "encryption.key"))
+    assert new_key != KEY
+    assert load_tombstones(a, "alice", build_cipher([new_key])) == {"gone.com": 2.0}